@@ -160,6 +160,35 @@ async function startBackendServer() {
     await waitForServer(BACKEND_PORT, BACKEND_HOST);
     console.log('Django server is ready!');
 
+    // Start the background job worker (lab reports and other queued work)
+    const workerProcess = spawn(
+      pythonPath,
+      ['manage.py', 'run_worker'],
+      {
+        cwd: backendPath,
+        env: {
+          ...process.env,
+          PYTHONUNBUFFERED: '1',
+          DJANGO_SETTINGS_MODULE: 'vior_health_backend.settings',
+        },
+        shell: true,
+      }
+    );
+
+    workerProcess.stdout.on('data', (data) => {
+      console.log(`[Worker] ${data.toString().trim()}`);
+    });
+
+    workerProcess.stderr.on('data', (data) => {
+      console.error(`[Worker Error] ${data.toString().trim()}`);
+    });
+
+    workerProcess.on('close', (code) => {
+      console.log(`Job worker exited with code ${code}`);
+    });
+
+    serverProcess.workerProcess = workerProcess;
+
     return serverProcess;
   } catch (error) {
     console.error('Error starting backend server:', error);
@@ -175,6 +204,13 @@ async function stopBackendServer(serverProcess) {
     return; // Don't stop if we're using an existing server
   }
 
+  // The worker finishes its current jobs on SIGTERM; unfinished ones are
+  // picked up again on the next start.
+  const workerProcess = serverProcess.workerProcess;
+  if (workerProcess && !workerProcess.killed) {
+    workerProcess.kill('SIGTERM');
+  }
+
   return new Promise((resolve) => {
     if (serverProcess.killed) {
       resolve();
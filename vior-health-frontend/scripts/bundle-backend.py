@@ -66,7 +66,8 @@ def main():
             '.git',
             'node_modules',
             '*.sqlite3',
-            'db.sqlite3'
+            'db.sqlite3',
+            'backups'
         )
     )
     print(f"Backend copied to {backend_bundle_dir}")
@@ -7,7 +7,7 @@ import Modal from '../common/Modal';
 import ThermalReceipt from './ThermalReceipt';
 import { Eye, Download, Search, Filter, X, Printer } from 'lucide-react';
 import { salesAPI, analyticsAPI } from '../../services/api';
-import { getPharmacySettings } from '../../services/pharmacySettings';
+import { getReceiptSettings } from '../../services/pharmacySettings';
 import { toast } from 'react-toastify';
 
 const SalesHistory = () => {
@@ -34,7 +34,7 @@ const SalesHistory = () => {
 
   const fetchPharmacySettings = async () => {
     try {
-      const data = await getPharmacySettings();
+      const data = await getReceiptSettings();
       console.log('Pharmacy settings loaded:', data);
       setPharmacySettings(data);
     } catch (error) {
@@ -23,6 +23,10 @@ export const laboratoryAPI = {
   reviewTest: (id) => api.post(`${BASE_URL}/tests/${id}/review_test/`),
   markAsPaid: (id, paymentMethod = 'cash') => api.post(`${BASE_URL}/tests/${id}/mark_as_paid/`, { payment_method: paymentMethod }),
   
+  // Lab Reports (PDF; 202 while still being generated)
+  getReport: (id) => api.get(`${BASE_URL}/tests/${id}/report/`, { responseType: 'blob' }),
+  generateReports: (startDate, endDate, force = false) => api.post(`${BASE_URL}/tests/generate_reports/`, { start_date: startDate, end_date: endDate, force }),
+  
   // Lab Test Stats
   getLabStats: () => api.get(`${BASE_URL}/tests/stats/`),
   
@@ -6,6 +6,12 @@ export const getPharmacySettings = async () => {
   return response.data;
 };
 
+// Get the receipt header/footer fields (public, cached on the server)
+export const getReceiptSettings = async () => {
+  const response = await api.get('/accounts/receipt-settings/');
+  return response.data;
+};
+
 // Update pharmacy settings
 export const updatePharmacySettings = async (data) => {
   const response = await api.patch('/accounts/pharmacy-settings/1/', data);
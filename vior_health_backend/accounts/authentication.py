@@ -0,0 +1,125 @@
+"""
+JWT authentication without a user query per request.
+
+Tokens issued by ``/api/accounts/login/`` carry the user's username, role,
+``is_staff``, ``is_active`` and ``token_version`` as claims.
+``ClaimsJWTAuthentication`` builds ``request.user`` from them (a
+``ClaimsUser``), so ``request.user.role in [...]`` checks cost nothing. Other
+fields load on first use.
+
+Revocation: changing a user's password, role, staff or active flag bumps
+``User.token_version`` and every older token is refused. Each process keeps
+the current version per user in ``token_versions``. An entry is dropped when
+the user is saved or deleted here, and re-read after
+``AUTH_CLAIMS_RECHECK_SECONDS`` otherwise, which bounds how long another
+process may still accept a revoked token. Refreshing always checks the
+database.
+
+Tokens without these claims (issued before, or by ``RefreshToken.for_user``)
+still work and load the user as before.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import ClaimsUser, User
+
+CLAIMS = ('username', 'role', 'is_staff', 'is_active', 'token_version')
+
+
+def add_claims(token, user):
+    for name in CLAIMS:
+        token[name] = getattr(user, name)
+    return token
+
+
+def tokens_for(user):
+    """A refresh token carrying ``user``'s claims; ``.access_token`` inherits them."""
+    return add_claims(RefreshToken.for_user(user), user)
+
+
+class TokenVersions:
+    """Current ``token_version`` per user id (``None`` if inactive or deleted), cached per process."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, fresh=False):
+        now = time.monotonic()
+        if not fresh:
+            with self._lock:
+                entry = self._entries.get(user_id)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(user_id)
+                    return entry[0]
+
+        row = User._base_manager.filter(pk=user_id).values_list('token_version', 'is_active').first()
+        version = row[0] if row and row[1] else None
+        with self._lock:
+            self._entries[user_id] = (version, now + settings.AUTH_CLAIMS_RECHECK_SECONDS)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > settings.AUTH_CLAIMS_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return version
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_versions = TokenVersions()
+
+
+def _user_id(token):
+    try:
+        # simplejwt stores the id as a string.
+        return User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])
+    except (KeyError, ValidationError) as e:
+        raise InvalidToken('Token contained no recognizable user identification') from e
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that trusts the user claims of current tokens."""
+
+    def get_user(self, validated_token):
+        if 'token_version' not in validated_token:
+            return super().get_user(validated_token)
+
+        user_id = _user_id(validated_token)
+        if token_versions.get(user_id) != validated_token['token_version']:
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        claims = {'id': user_id, **{name: validated_token[name] for name in CLAIMS}}
+        # from_db() takes the values in field order.
+        fields = [field.attname for field in ClaimsUser._meta.concrete_fields if field.attname in claims]
+        return ClaimsUser.from_db(DEFAULT_DB_ALIAS, fields, [claims[name] for name in fields])
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuses refresh tokens issued before the user's last revocation."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if 'token_version' in refresh:
+            if token_versions.get(_user_id(refresh), fresh=True) != refresh['token_version']:
+                raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return super().validate(attrs)
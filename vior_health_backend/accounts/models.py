@@ -1,4 +1,6 @@
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings as django_settings
+from django.core.cache import cache
 from django.db import models
 
 class User(AbstractUser):
@@ -15,6 +17,9 @@ class User(AbstractUser):
     address = models.TextField(blank=True)
     profile_image = models.ImageField(upload_to='profiles/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Bumped when the password, role, staff or active flag changes; access
+    # tokens carry it, so older tokens stop working (accounts.authentication).
+    token_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -25,6 +30,38 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} - {self.get_role_display()}"
 
+    CREDENTIAL_FIELDS = ('password', 'role', 'is_staff', 'is_active')
+
+    def _credentials_changed(self):
+        loaded = [name for name in self.CREDENTIAL_FIELDS if name not in self.get_deferred_fields()]
+        stored = type(self)._base_manager.filter(pk=self.pk).values(*loaded).first()
+        return stored is not None and any(stored[name] != getattr(self, name) for name in loaded)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        may_change = update_fields is None or set(update_fields) & set(self.CREDENTIAL_FIELDS)
+        if not self._state.adding and may_change and self._credentials_changed():
+            self.token_version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+
+
+class ClaimsUser(User):
+    """
+    A ``User`` built from access-token claims by ``ClaimsJWTAuthentication``.
+    Only the claimed fields are loaded; touching any other field loads the
+    rest of the row in one query.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
 
 class PharmacySettings(models.Model):
     """
@@ -72,8 +109,30 @@ class PharmacySettings(models.Model):
     def __str__(self):
         return self.pharmacy_name
     
+    CACHE_KEY = 'pharmacy-settings'
+
     @classmethod
-    def get_settings(cls):
-        """Get or create the pharmacy settings (singleton pattern)"""
-        settings, created = cls.objects.get_or_create(pk=1)
+    def get_settings(cls, cached=True):
+        """
+        Return the pharmacy settings singleton.
+
+        Reads are served from the cache. ``accounts.signals`` clears it when
+        the row is saved or deleted, but only in the process that saved, so
+        entries also expire after ``PHARMACY_SETTINGS_CACHE_TTL`` seconds.
+        Pass ``cached=False`` to load the row from the database, e.g. before
+        updating it.
+        """
+        if cached:
+            settings = cache.get(cls.CACHE_KEY)
+            if settings is not None:
+                return settings
+
+        settings = cls.objects.filter(pk=1).first()
+        if settings is None:
+            settings, _ = cls.objects.get_or_create(pk=1)
+        cache.set(cls.CACHE_KEY, settings, timeout=django_settings.PHARMACY_SETTINGS_CACHE_TTL)
         return settings
+
+    @classmethod
+    def clear_cache(cls):
+        cache.delete(cls.CACHE_KEY)
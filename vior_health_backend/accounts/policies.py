@@ -0,0 +1,121 @@
+"""
+Who may do what, in one place.
+
+``PERMISSIONS`` lists, per resource and action, the roles allowed. ``SCOPES``
+says which rows of a resource each role sees, and ``SCOPE_FIELDS`` how a
+scope is filtered in SQL. ``STAFF`` stands for any user with ``is_staff``
+(staff count as admins for expenses). In ``SCOPES``, a user's role is looked
+up first, then ``STAFF``, then ``'*'``.
+
+Both tables are compiled at import into dicts keyed by ``(role, is_staff)``.
+A check is then one dict lookup and needs no per-request caching. Views use
+``PolicyPermission`` for action checks and ``scoped()`` for row filtering.
+"""
+from django.db.models import Q
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+
+from .models import User
+
+STAFF = 'staff'
+ALL = 'all'
+
+PERMISSIONS = {
+    'accounts': {
+        'manage': {'admin', 'manager'},  # users and pharmacy settings
+    },
+    'test_types': {
+        'manage': {'admin', 'manager'},
+        'view_inactive': {'admin', 'manager'},
+    },
+    'lab_tests': {
+        'review': {'pharmacist', 'manager', 'admin'},
+        'generate_reports': {'pharmacist', 'manager', 'admin'},
+    },
+    'sales': {
+        'refund': {'pharmacist', 'manager', 'admin'},  # void or refund
+    },
+    'expenses': {
+        'manage_any': {'admin', STAFF},  # edit or delete anyone's, approved or not
+        'approve': {'admin', STAFF},
+    },
+}
+
+SCOPES = {
+    'lab_tests': {
+        'lab_technician': 'assigned', 'pharmacist': ALL, 'manager': ALL, 'admin': ALL, '*': 'requested',
+    },
+    'expenses': {'admin': ALL, STAFF: ALL, '*': 'own'},
+    'jobs': {'admin': ALL, 'manager': ALL, '*': 'own'},
+}
+
+SCOPE_FIELDS = {
+    'lab_tests': {'assigned': 'assigned_to', 'requested': 'requested_by'},
+    'expenses': {'own': 'created_by'},
+    'jobs': {'own': 'created_by'},
+}
+
+
+def _compile():
+    decisions, scopes = {}, {}
+    for role, _ in User.ROLE_CHOICES:
+        for is_staff in (False, True):
+            principals = {role, STAFF} if is_staff else {role}
+            for resource, actions in PERMISSIONS.items():
+                for action, allowed in actions.items():
+                    decisions[role, is_staff, resource, action] = bool(principals & allowed)
+            for resource, table in SCOPES.items():
+                scope = table.get(role) or (table.get(STAFF) if is_staff else None) or table['*']
+                scopes[role, is_staff, resource] = scope
+    return decisions, scopes
+
+
+_DECISIONS, _SCOPES = _compile()
+
+
+def allows(user, resource, action):
+    """Whether ``user``'s role may perform ``action`` on ``resource``."""
+    key = (user.role, bool(user.is_staff), resource, action)
+    if key not in _DECISIONS and action not in PERMISSIONS[resource]:
+        raise KeyError(f'No policy for {resource}.{action}')
+    return _DECISIONS.get(key, False)
+
+
+def scope_for(user, resource):
+    """The name of the rows of ``resource`` that ``user`` sees (``ALL`` or a ``SCOPE_FIELDS`` key)."""
+    return _SCOPES.get((user.role, bool(user.is_staff), resource), SCOPES[resource]['*'])
+
+
+def scope_filter(user, resource, via=''):
+    """``Q`` for the rows ``user`` sees; ``via`` prefixes the lookup, e.g. ``'lab_test__'``."""
+    scope = scope_for(user, resource)
+    if scope == ALL:
+        return Q()
+    return Q(**{f'{via}{SCOPE_FIELDS[resource][scope]}': user})
+
+
+def scoped(queryset, user, resource, via=''):
+    return queryset.filter(scope_filter(user, resource, via))
+
+
+def scope_key(user, resource):
+    """Cache key part for data scoped by ``resource`` (see ``analytics.cache``)."""
+    scope = scope_for(user, resource)
+    return ALL if scope == ALL else f'{scope}:{user.pk}'
+
+
+class PolicyPermission(BasePermission):
+    """
+    Checks view actions against ``PERMISSIONS``. The view lists the guarded
+    actions as ``policy_actions = {view_action: (resource, action, message)}``;
+    a denial is a 403 with ``{'error': message}``. Other actions pass.
+    """
+
+    def has_permission(self, request, view):
+        rule = getattr(view, 'policy_actions', {}).get(view.action)
+        if rule is None:
+            return True
+        resource, action, message = rule
+        if not allows(request.user, resource, action):
+            raise PermissionDenied({'error': message})
+        return True
@@ -33,3 +33,32 @@ class PharmacySettingsSerializer(serializers.ModelSerializer):
             'updated_by_username'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'updated_by', 'updated_by_username']
+
+
+class ReceiptSettingsSerializer(serializers.ModelSerializer):
+    """Fields printed on receipts, safe to expose without authentication."""
+
+    class Meta:
+        model = PharmacySettings
+        fields = [
+            'pharmacy_name',
+            'business_registration_number',
+            'tax_id',
+            'phone',
+            'email',
+            'website',
+            'address_line1',
+            'address_line2',
+            'city',
+            'state_province',
+            'postal_code',
+            'country',
+            'receipt_header',
+            'receipt_footer',
+            'show_logo_on_receipt',
+            'business_hours',
+            'currency_symbol',
+            'currency_code',
+            'updated_at',
+        ]
+        read_only_fields = fields
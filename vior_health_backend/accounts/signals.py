@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ClaimsUser, PharmacySettings, User
+
+
+@receiver(post_save, sender=PharmacySettings)
+@receiver(post_delete, sender=PharmacySettings)
+def clear_pharmacy_settings_cache(sender, **kwargs):
+    # Clear after commit so a concurrent reader cannot re-cache the old row.
+    transaction.on_commit(PharmacySettings.clear_cache)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=ClaimsUser)
+@receiver(post_delete, sender=User)
+def forget_token_version(sender, instance, **kwargs):
+    from .authentication import token_versions
+
+    # After commit, so a concurrent request cannot re-cache the old version.
+    transaction.on_commit(lambda: token_versions.forget(instance.pk))
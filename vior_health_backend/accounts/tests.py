@@ -1,3 +1,170 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .authentication import ClaimsJWTAuthentication, token_versions
+from .models import ClaimsUser, PharmacySettings, User
+from .policies import allows, scope_filter, scope_key
+
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='admin-pass-1', role='admin')
+        cls.tech = User.objects.create_user(
+            'tech', password='tech-pass-1', role='lab_technician', email='tech@example.com',
+        )
+
+    def setUp(self):
+        token_versions.clear()
+        self.client = APIClient()
+
+    def login(self, username, password):
+        response = self.client.post('/api/accounts/login/', {'username': username, 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_as(self, access, path='/api/laboratory/tests/stats/'):
+        return self.client.get(path, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_user_comes_from_claims(self):
+        tokens = self.login('tech', 'tech-pass-1')
+        token = AccessToken(tokens['access'])
+        self.assertEqual((token['role'], token['token_version']), ('lab_technician', 0))
+
+        authentication = ClaimsJWTAuthentication()
+        authentication.get_user(token)  # Reads the token version once per recheck period
+        with self.assertNumQueries(0):
+            user = authentication.get_user(token)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertEqual((user.pk, user.role, user.is_active), (self.tech.pk, 'lab_technician', True))
+        # Any other field loads the rest of the row in one query.
+        with self.assertNumQueries(1):
+            self.assertEqual((user.email, user.phone), ('tech@example.com', ''))
+
+    def test_password_change_revokes_earlier_tokens(self):
+        old = self.login('tech', 'tech-pass-1')
+        self.assertEqual(self.get_as(old['access']).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/accounts/users/change_password/',
+                {'old_password': 'tech-pass-1', 'new_password': 'tech-pass-2-long'},
+                HTTP_AUTHORIZATION=f"Bearer {old['access']}",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get_as(old['access']).status_code, 401)
+        refresh = self.client.post('/api/accounts/token/refresh/', {'refresh': old['refresh']})
+        self.assertEqual(refresh.status_code, 401)
+        self.assertEqual(self.get_as(response.data['access']).status_code, 200)
+
+    def test_role_change_and_deactivation_revoke_tokens(self):
+        admin = self.login('admin', 'admin-pass-1')
+        tech = self.login('tech', 'tech-pass-1')
+        self.assertEqual(self.get_as(tech['access']).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/accounts/users/{self.tech.pk}/', {'role': 'cashier'},
+                HTTP_AUTHORIZATION=f"Bearer {admin['access']}",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_as(tech['access']).status_code, 401)
+
+        tech = self.login('tech', 'tech-pass-1')
+        self.assertEqual(AccessToken(tech['access'])['role'], 'cashier')
+        user = User.objects.get(pk=self.tech.pk)
+        user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.get_as(tech['access']).status_code, 401)
+
+    def test_unrelated_saves_keep_tokens(self):
+        tech = self.login('tech', 'tech-pass-1')
+        user = User.objects.get(pk=self.tech.pk)
+        user.phone = '0700 000 000'
+        user.save()
+        user.save(update_fields=['last_login'])
+        self.assertEqual(User.objects.get(pk=self.tech.pk).token_version, 0)
+        self.assertEqual(self.get_as(tech['access']).status_code, 200)
+
+    def test_tokens_without_claims_load_the_user(self):
+        token = RefreshToken.for_user(self.tech).access_token
+        user = ClaimsJWTAuthentication().get_user(token)
+        self.assertEqual(type(user), User)
+
+        self.tech.is_active = False
+        self.tech.save()
+        with self.assertRaises(AuthenticationFailed):
+            ClaimsJWTAuthentication().get_user(token)
+
+
+class PolicyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            role: User.objects.create_user(role, password='pass-1234', role=role)
+            for role, _ in User.ROLE_CHOICES
+        }
+        cls.staff_cashier = User.objects.create_user('staff', password='pass-1234', role='cashier', is_staff=True)
+
+    def test_compiled_table_matches_role_rules(self):
+        for role, user in self.users.items():
+            self.assertEqual(allows(user, 'accounts', 'manage'), role in ['admin', 'manager'])
+            self.assertEqual(allows(user, 'lab_tests', 'review'), role in ['pharmacist', 'manager', 'admin'])
+            self.assertEqual(allows(user, 'expenses', 'approve'), role == 'admin')
+        self.assertTrue(allows(self.staff_cashier, 'expenses', 'approve'))
+        self.assertFalse(allows(self.staff_cashier, 'accounts', 'manage'))
+        with self.assertRaises(KeyError):
+            allows(self.users['admin'], 'expenses', 'aprove')
+
+    def test_scopes(self):
+        tech = self.users['lab_technician']
+        self.assertEqual(scope_key(tech, 'lab_tests'), f'assigned:{tech.pk}')
+        self.assertEqual(scope_key(self.users['pharmacist'], 'lab_tests'), 'all')
+        self.assertEqual(scope_key(self.users['cashier'], 'lab_tests'), f"requested:{self.users['cashier'].pk}")
+        self.assertEqual(scope_key(self.staff_cashier, 'expenses'), 'all')
+        self.assertEqual(scope_filter(tech, 'lab_tests', via='lab_test__'), Q(lab_test__assigned_to=tech))
+        self.assertEqual(scope_filter(self.users['manager'], 'jobs'), Q())
+
+    def test_denial_is_error_response(self):
+        client = APIClient()
+        client.force_authenticate(self.users['cashier'])
+        response = client.post('/api/laboratory/test-types/', {'name': 'CBC'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data, {'error': 'Only admin and manager can create test types'})
+
+
+class PharmacySettingsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='admin-pass-1', role='admin')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_save_clears_the_cache(self):
+        PharmacySettings.get_settings()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/accounts/receipt-settings/').status_code, 200)
+
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/accounts/pharmacy-settings/1/', {'pharmacy_name': 'Mji Pharmacy'})
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/accounts/receipt-settings/').data['pharmacy_name'], 'Mji Pharmacy')
+
+    @override_settings(PHARMACY_SETTINGS_CACHE_TTL=30)
+    def test_entries_expire(self):
+        # Other processes never see this process's invalidation; the TTL bounds their staleness.
+        with mock.patch('accounts.models.cache.set') as cache_set:
+            PharmacySettings.get_settings()
+        self.assertEqual(cache_set.call_args.kwargs['timeout'], 30)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import UserViewSet, RegisterView, PharmacySettingsViewSet
+from .views import UserViewSet, RegisterView, PharmacySettingsViewSet, ReceiptSettingsView
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -9,6 +9,7 @@ router.register(r'pharmacy-settings', PharmacySettingsViewSet, basename='pharmac
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('receipt-settings/', ReceiptSettingsView.as_view(), name='receipt-settings'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
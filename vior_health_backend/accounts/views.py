@@ -1,11 +1,14 @@
 from rest_framework import viewsets, status, generics
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, BasePermission
 from django.contrib.auth import update_session_auth_hash
+from .authentication import tokens_for
 from .models import User, PharmacySettings
+from .policies import allows
 from .serializers import UserSerializer, UserRegistrationSerializer, ChangePasswordSerializer
-from .serializers_settings import PharmacySettingsSerializer
+from .serializers_settings import PharmacySettingsSerializer, ReceiptSettingsSerializer
 
 
 class IsAdminOrManager(BasePermission):
@@ -13,7 +16,7 @@ class IsAdminOrManager(BasePermission):
     Custom permission to only allow admins and managers to access.
     """
     def has_permission(self, request, view):
-        return request.user and request.user.is_authenticated and request.user.role in ['admin', 'manager']
+        return request.user and request.user.is_authenticated and allows(request.user, 'accounts', 'manage')
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -52,7 +55,13 @@ class UserViewSet(viewsets.ModelViewSet):
             user.set_password(serializer.validated_data['new_password'])
             user.save()
             update_session_auth_hash(request, user)
-            return Response({'message': 'Password updated successfully.'}, status=status.HTTP_200_OK)
+            # The change revoked every earlier token, this one included.
+            refresh = tokens_for(user)
+            return Response({
+                'message': 'Password updated successfully.',
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+            }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -76,7 +85,7 @@ class PharmacySettingsViewSet(viewsets.ModelViewSet):
     
     def get_object(self):
         """Always return or create the singleton pharmacy settings"""
-        return PharmacySettings.get_settings()
+        return PharmacySettings.get_settings(cached=False)
     
     def list(self, request, *args, **kwargs):
         """Return the singleton pharmacy settings"""
@@ -96,3 +105,17 @@ class PharmacySettingsViewSet(viewsets.ModelViewSet):
         """Partial update of pharmacy settings"""
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
+
+
+class ReceiptSettingsView(APIView):
+    """
+    Public, read-only receipt header/footer data for POS terminals and
+    receipt printers. Served from the settings cache, so it skips both
+    authentication and the database.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        serializer = ReceiptSettingsSerializer(PharmacySettings.get_settings())
+        return Response(serializer.data)
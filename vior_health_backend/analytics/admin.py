@@ -1,4 +1,16 @@
 from django.contrib import admin
+from .models import DailySalesRollup, StockAlertSnapshot
 
-# Register your models here.
-# Analytics models will be added later for reporting
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'revenue', 'sales_count', 'items_sold', 'updated_at')
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+
+@admin.register(StockAlertSnapshot)
+class StockAlertSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'kind', 'product', 'quantity', 'reorder_level', 'expiry_date')
+    list_filter = ('kind', 'date')
+    search_fields = ('product__name',)
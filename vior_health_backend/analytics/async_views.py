@@ -0,0 +1,67 @@
+"""
+Async versions of the analytics endpoints, served when ``ASYNC_VIEWS`` is on
+and the app runs under an ASGI server (see README, "Async run profile").
+
+They build the same payloads from the same queries as ``analytics.views``;
+the difference is that independent queries run concurrently.
+"""
+from django.http import JsonResponse
+
+from vior_health_backend.asyncviews import async_api_view, gather_queries, run_sync
+from vior_health_backend.routers import report_grade
+
+from .cache import cached_endpoint
+from .views import (
+    ALERT_DATE_ERROR, alert_date, dashboard_payload, dashboard_queries, inventory_payload, inventory_queries,
+    recent_activities_payload, recent_activity_queries, sales_chart_data,
+    stock_alerts_data, top_products_data,
+)
+
+
+@async_api_view
+@report_grade
+@cached_endpoint('dashboard_stats', depends_on=(
+    'sales.Sale', 'inventory.Product', 'prescriptions.Prescription', 'analytics.DailySalesRollup',
+))
+async def dashboard_stats(request):
+    return dashboard_payload(await gather_queries(**dashboard_queries()))
+
+
+@async_api_view
+@report_grade
+@cached_endpoint('sales_chart', depends_on=('sales.Sale', 'analytics.DailySalesRollup'))
+async def sales_chart(request):
+    days = int(request.query_params.get('days', 7))
+    return await run_sync(sales_chart_data, days)
+
+
+@async_api_view
+@report_grade
+@cached_endpoint('top_products', depends_on=('sales.Sale',))
+async def top_products(request):
+    limit = int(request.query_params.get('limit', 10))
+    return await run_sync(top_products_data, limit)
+
+
+@async_api_view
+@report_grade
+@cached_endpoint('inventory_summary', depends_on=('inventory.Product',))
+async def inventory_summary(request):
+    return inventory_payload(await gather_queries(**inventory_queries()))
+
+
+@async_api_view
+async def stock_alerts(request):
+    """Latest low-stock / expiry snapshot (or the one for ?date=), optionally filtered by ?kind="""
+    try:
+        date = alert_date(request.query_params.get('date'))
+    except ValueError:
+        return JsonResponse({'error': ALERT_DATE_ERROR}, status=400)
+    return await run_sync(stock_alerts_data, request.query_params.get('kind'), date)
+
+
+@async_api_view
+@report_grade
+async def recent_activities(request):
+    limit = int(request.query_params.get('limit', 10))
+    return recent_activities_payload(await gather_queries(**recent_activity_queries(limit)), limit)
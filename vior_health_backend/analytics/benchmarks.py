@@ -0,0 +1,216 @@
+"""
+Endpoint benchmark harness.
+
+Runs the hot API endpoints through the Django test client against whatever
+database is configured (normally one filled by ``seed_benchmark``) and
+records p50/p95 latency and query counts per scenario. Write scenarios run
+inside a transaction that is rolled back, so the dataset is not modified.
+
+Used by ``manage.py benchmark_endpoints`` and the ``benchmark``-tagged tests.
+"""
+import json
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from accounts.authentication import tokens_for
+from accounts.models import User
+from inventory.models import Product
+from prescriptions.models import Prescription
+
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK', 'BEGIN', 'COMMIT')
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+# Upper bounds on SQL queries per request. The harness fails a scenario that
+# exceeds its budget even when no baseline has been recorded yet.
+QUERY_BUDGETS = {
+    'dashboard_stats': 20,
+    'sales_chart': 5,
+    'top_products': 5,
+    'product_search': 5,
+    'create_sale': 20,
+    'dispense': 25,
+    'lab_tests_list': 5,
+    'expense_summary': 10,
+}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    payload: Optional[Callable[[], dict]] = None
+    writes: bool = False
+
+
+def _checkout_cart():
+    products = list(
+        Product.objects.filter(is_active=True, quantity__gte=100)
+        .order_by('id').values_list('id', flat=True)[:3]
+    )
+    if not products:
+        return None
+    return {
+        'items': [{'product': product_id, 'quantity': 1} for product_id in products],
+        'payment_method': 'cash',
+        'amount_paid': '1000000.00',
+    }
+
+
+def _dispensable_prescription():
+    return (
+        Prescription.objects.filter(status='pending')
+        .exclude(items__quantity__gt=F('items__product__quantity'))
+        .order_by('id').values_list('id', flat=True).first()
+    )
+
+
+def default_scenarios():
+    scenarios = [
+        Scenario('dashboard_stats', 'get', '/api/analytics/dashboard-stats/'),
+        Scenario('sales_chart', 'get', '/api/analytics/sales-chart/?days=30'),
+        Scenario('top_products', 'get', '/api/analytics/top-products/'),
+        Scenario('product_search', 'get', '/api/inventory/products/?search=para'),
+        Scenario('create_sale', 'post', '/api/sales/sales/create_sale/', payload=_checkout_cart, writes=True),
+        Scenario('lab_tests_list', 'get', '/api/laboratory/tests/'),
+        Scenario('expense_summary', 'get', '/api/expenses/expenses/summary/'),
+    ]
+    prescription_id = _dispensable_prescription()
+    if prescription_id:
+        scenarios.insert(5, Scenario(
+            'dispense', 'post', f'/api/prescriptions/prescriptions/{prescription_id}/dispense/',
+            payload=lambda: {'create_sale': True, 'payment_method': 'cash'}, writes=True,
+        ))
+    return scenarios
+
+
+def benchmark_user():
+    user = User.objects.filter(role='admin', is_active=True).order_by('id').first()
+    if user is None:
+        raise RuntimeError('An active admin user is required to run benchmarks')
+    return user
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_scenario(client, scenario, iterations=20, warmup=3, warm_cache=False):
+    payload = scenario.payload() if scenario.payload else None
+    if scenario.payload and payload is None:
+        return None
+
+    timings, queries = [], []
+    for i in range(warmup + iterations):
+        if not warm_cache:
+            # Measure the computation, not a dashboard cache hit.
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            # Write scenarios are rolled back to leave the dataset unchanged.
+            with transaction.atomic():
+                started = time.perf_counter()
+                if scenario.method == 'get':
+                    response = client.get(scenario.path)
+                else:
+                    response = client.post(scenario.path, payload, content_type='application/json')
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{scenario.name}: {scenario.method.upper()} {scenario.path} '
+                f'returned {response.status_code}: {response.content[:200]!r}'
+            )
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            # Count only the endpoint's own SQL, not the harness savepoints.
+            queries.append(sum(
+                1 for query in captured.captured_queries
+                if not query['sql'].upper().startswith(TRANSACTION_CONTROL)
+            ))
+
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(_percentile(timings, 95), 2),
+        'queries': max(queries),
+        'iterations': iterations,
+    }
+
+
+def run_benchmarks(iterations=20, warmup=3, only=None, warm_cache=False):
+    user = benchmark_user()
+    token = str(tokens_for(user).access_token)
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    results = {}
+    for scenario in default_scenarios():
+        if only and scenario.name not in only:
+            continue
+        result = run_scenario(client, scenario, iterations=iterations, warmup=warmup, warm_cache=warm_cache)
+        if result is not None:
+            results[scenario.name] = result
+    return results
+
+
+def compare(results, baseline=None, latency_tolerance=0.25, query_tolerance=0):
+    """
+    Return a list of human-readable regressions.
+
+    A scenario regresses when its query count exceeds ``QUERY_BUDGETS`` or the
+    baseline by more than ``query_tolerance`` queries, or when its p95 latency
+    exceeds the baseline by more than ``latency_tolerance`` (a fraction).
+    """
+    baseline = baseline or {}
+    regressions = []
+    for name, result in results.items():
+        budget = QUERY_BUDGETS.get(name)
+        if budget is not None and result['queries'] > budget:
+            regressions.append(f'{name}: {result["queries"]} queries exceeds budget of {budget}')
+
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result['queries'] > previous['queries'] + query_tolerance:
+            regressions.append(
+                f'{name}: {result["queries"]} queries, baseline {previous["queries"]}'
+            )
+        limit = previous['p95_ms'] * (1 + latency_tolerance)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                f'{name}: p95 {result["p95_ms"]}ms, baseline {previous["p95_ms"]}ms '
+                f'(limit {limit:.2f}ms)'
+            )
+    return regressions
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path) as fh:
+        return json.load(fh).get('scenarios', {})
+
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as fh:
+        json.dump({
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'database': connection.vendor,
+            'scenarios': results,
+        }, fh, indent=2, sort_keys=True)
+        fh.write('\n')
@@ -0,0 +1,119 @@
+"""
+Response cache for dashboard and statistics endpoints.
+
+Cached payloads are keyed by endpoint, query parameters and the caller's data
+scope, plus a *generation* number for every model the endpoint reads. Saving
+or deleting one of those models bumps its generation (see
+``analytics.signals``), so the next request recomputes once and every other
+workstation gets the fresh copy. ``DASHBOARD_CACHE_TTL`` is a backstop for
+writes that bypass signals.
+
+The cache backend is whatever ``CACHES['default']`` is: the in-process LRU by
+default, or a file/database cache shared by all workers (see settings).
+"""
+import hashlib
+import uuid
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.response import Response
+
+from vior_health_backend.asyncviews import run_sync
+from vior_health_backend.metrics import CACHE_REQUESTS
+
+GENERATION_PREFIX = 'cache-gen:'
+
+
+def _generation_key(label):
+    return f'{GENERATION_PREFIX}{label}'
+
+
+def invalidate(*labels):
+    """Start a new generation for each model label, e.g. ``invalidate('sales.Sale')``."""
+    # A fresh unique token rather than incr(): incr() on file/db backends
+    # re-sets the key with the default timeout, and an expired generation
+    # would fall back to 0 and could revive entries keyed under it.
+    token = uuid.uuid4().hex[:12]
+    cache.set_many({_generation_key(label): token for label in labels}, timeout=None)
+
+
+def _find_request(args):
+    for arg in args:
+        if hasattr(arg, 'query_params'):
+            return arg
+    raise TypeError('cached_endpoint needs the DRF request as a positional argument')
+
+
+def global_scope(request):
+    return 'all'
+
+
+def _lookup(name, depends_on, scope, request):
+    """The cache key for this request and what is stored under it (or ``None``)."""
+    generation_keys = [_generation_key(label) for label in depends_on]
+    generations = cache.get_many(generation_keys)
+    params = hashlib.sha1(request.query_params.urlencode().encode()).hexdigest()[:16]
+    key = ':'.join([
+        'endpoint', name, scope(request), params,
+        # Date-bound stats ('today', 'this month') roll over at midnight.
+        timezone.localdate().isoformat(),
+        *(str(generations.get(k, 0)) for k in generation_keys),
+    ])
+    data = cache.get(key)
+    CACHE_REQUESTS.inc(cache='endpoint', result='miss' if data is None else 'hit')
+    return key, data
+
+
+def _ttl(timeout):
+    return timeout if timeout is not None else getattr(settings, 'DASHBOARD_CACHE_TTL', 60)
+
+
+def cached_endpoint(name, depends_on, scope=global_scope, timeout=None):
+    """
+    Cache a GET endpoint's ``Response.data``.
+
+    ``depends_on`` lists the model labels whose writes invalidate the entry.
+    ``scope(request)`` returns the part of the key that captures what this
+    caller may see (``'all'`` when the payload is identical for everyone).
+
+    Coroutine views (see ``vior_health_backend.asyncviews``) return plain
+    data; that is cached and returned the same way, with the cache calls
+    made off the event loop.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(*args, **kwargs):
+                request = _find_request(args)
+                if request.method != 'GET':
+                    return await view_func(*args, **kwargs)
+
+                key, data = await run_sync(_lookup, name, depends_on, scope, request)
+                if data is not None:
+                    return data
+                data = await view_func(*args, **kwargs)
+                if not isinstance(data, HttpResponse):
+                    await run_sync(cache.set, key, data, _ttl(timeout))
+                return data
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            request = _find_request(args)
+            if request.method != 'GET':
+                return view_func(*args, **kwargs)
+
+            key, data = _lookup(name, depends_on, scope, request)
+            if data is not None:
+                return Response(data)
+
+            response = view_func(*args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, _ttl(timeout))
+            return response
+        return wrapper
+    return decorator
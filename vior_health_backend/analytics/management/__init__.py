@@ -0,0 +1 @@
+# Placeholder for management commands
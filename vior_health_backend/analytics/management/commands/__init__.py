@@ -0,0 +1 @@
+# Placeholder for commands
@@ -0,0 +1,63 @@
+import json
+import logging
+import warnings
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot API endpoints (p50/p95 latency and query counts) against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', default='', help='Comma-separated scenario names')
+        parser.add_argument('--baseline', default=str(benchmarks.DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true', help='Record these results as the new baseline')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown as a fraction of the baseline (default 0.25)')
+        parser.add_argument('--query-tolerance', type=int, default=0,
+                            help='Allowed extra queries per request over the baseline (default 0)')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the response cache between requests (default: clear it so computation is measured)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON')
+
+    def handle(self, *args, **options):
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+        if options['verbosity'] < 2:
+            # Over-budget request logs and runtime warnings drown the table.
+            logging.getLogger('vior_health.requests').setLevel(logging.ERROR)
+            warnings.simplefilter('ignore', RuntimeWarning)
+        try:
+            results = benchmarks.run_benchmarks(
+                iterations=options['iterations'], warmup=options['warmup'], only=only,
+                warm_cache=options['warm_cache'],
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+        else:
+            self.stdout.write(f'{"scenario":<18} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8}')
+            for name, result in results.items():
+                self.stdout.write(
+                    f'{name:<18} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} {result["queries"]:>8}'
+                )
+
+        if options['save_baseline']:
+            benchmarks.save_baseline(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'\nBaseline written to {options["baseline"]}'))
+            return
+
+        regressions = benchmarks.compare(
+            results,
+            benchmarks.load_baseline(options['baseline']),
+            latency_tolerance=options['latency_tolerance'],
+            query_tolerance=options['query_tolerance'],
+        )
+        if regressions:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('\nNo regressions against baseline'))
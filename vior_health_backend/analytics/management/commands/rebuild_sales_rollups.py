@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from analytics.rollups import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily sales rollups (default: every closed day)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD), defaults to the first sale')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD), defaults to yesterday')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        if (options['start'] and start is None) or (options['end'] and end is None):
+            raise CommandError('Dates must be YYYY-MM-DD')
+
+        days = rebuild_sales_rollups(start_date=start, end_date=end)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {days} days'))
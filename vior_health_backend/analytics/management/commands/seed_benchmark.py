@@ -0,0 +1,385 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from expenses.models import Expense, ExpenseCategory
+from inventory.models import Category, Supplier, Product
+from laboratory.models import TestType, LabTest, LabMeasurement
+from prescriptions.models import Prescription, PrescriptionItem
+from sales.models import Customer, Sale, SaleItem
+
+CENT = Decimal('0.01')
+
+DRUG_NAMES = [
+    'Paracetamol', 'Amoxicillin', 'Ibuprofen', 'Metformin', 'Amlodipine', 'Omeprazole',
+    'Ciprofloxacin', 'Azithromycin', 'Artemether', 'Lumefantrine', 'Cetirizine', 'Losartan',
+    'Atorvastatin', 'Doxycycline', 'Metronidazole', 'Salbutamol', 'Prednisolone', 'Diclofenac',
+    'Fluconazole', 'Hydrochlorothiazide', 'Ferrous Sulphate', 'Folic Acid', 'Zinc Sulphate',
+    'Oral Rehydration Salts', 'Cotrimoxazole', 'Albendazole', 'Insulin Glargine', 'Nifedipine',
+]
+STRENGTHS = ['100mg', '250mg', '500mg', '5mg', '10mg', '20mg', '40mg', '5ml', '100ml']
+UNIT_TYPES = ['tablet', 'capsule', 'bottle', 'box', 'sachet', 'strip', 'tube', 'vial']
+CATEGORY_NAMES = [
+    'Analgesics', 'Antibiotics', 'Antimalarials', 'Antidiabetics', 'Cardiovascular',
+    'Gastrointestinal', 'Respiratory', 'Supplements', 'Dermatology', 'Antifungals',
+]
+FIRST_NAMES = [
+    'Amina', 'Baraka', 'Neema', 'Juma', 'Rehema', 'Hassan', 'Zawadi', 'Omari', 'Fatuma',
+    'Daudi', 'Halima', 'Said', 'Upendo', 'Musa', 'Grace', 'Peter', 'Mary', 'John',
+]
+LAST_NAMES = [
+    'Mushi', 'Mwakyusa', 'Kimaro', 'Massawe', 'Mrema', 'Njau', 'Temba', 'Lyimo', 'Shayo',
+    'Mollel', 'Swai', 'Kweka', 'Minja', 'Urassa', 'Mbwambo', 'Chuwa',
+]
+DOCTORS = ['Dr. Mushi', 'Dr. Kimaro', 'Dr. Lyimo', 'Dr. Njau', 'Dr. Swai', 'Dr. Temba']
+EXPENSE_CATEGORIES = [
+    ('Utilities', 'Electricity bill'), ('Salaries', 'Staff salaries'), ('Rent', 'Monthly rent'),
+    ('Supplies', 'Packaging and receipt paper'), ('Transportation', 'Delivery fuel'),
+    ('Maintenance', 'Fridge servicing'), ('Other', 'Sundry expenses'),
+]
+MEASUREMENTS = [
+    ('Glucose', 'mg/dL', '70-110', 70, 110),
+    ('Hemoglobin', 'g/dL', '12-17', 12, 17),
+    ('Systolic BP', 'mmHg', '90-120', 90, 120),
+    ('Diastolic BP', 'mmHg', '60-80', 60, 80),
+    ('Total Cholesterol', 'mg/dL', '125-200', 125, 200),
+    ('WBC', 'x10^9/L', '4-11', 4, 11),
+]
+BENCH_USERS = [
+    ('bench_admin', 'admin'), ('bench_manager', 'manager'),
+    ('bench_pharmacist_1', 'pharmacist'), ('bench_pharmacist_2', 'pharmacist'),
+    ('bench_cashier_1', 'cashier'), ('bench_cashier_2', 'cashier'), ('bench_cashier_3', 'cashier'),
+    ('bench_lab_1', 'lab_technician'), ('bench_lab_2', 'lab_technician'),
+]
+BENCH_PASSWORD = 'bench12345'
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the historical created_at/updated_at we assign."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Seed a deterministic benchmark dataset (products, sales, prescriptions, lab tests, expenses)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--customers', type=int, default=1000)
+        parser.add_argument('--sales', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=90, help='Spread records over this many days')
+        parser.add_argument('--prescriptions', type=int, default=None, help='Defaults to sales / 10')
+        parser.add_argument('--lab-tests', type=int, default=None, help='Defaults to sales / 20')
+        parser.add_argument('--expenses', type=int, default=None, help='Defaults to 5 per day')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--end-date', default=None, help='Last day of the dataset (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if Sale.objects.filter(invoice_number__startswith='BENCH-').exists():
+            raise CommandError(
+                'Benchmark data already present. Seed into a fresh database, '
+                'e.g. DB_NAME=bench.sqlite3 python manage.py migrate'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = max(options['days'], 1)
+        end_date = (
+            datetime.strptime(options['end_date'], '%Y-%m-%d').date()
+            if options['end_date'] else timezone.localdate()
+        )
+        self.start_date = end_date - timedelta(days=self.days - 1)
+        self.tz = timezone.get_current_timezone()
+
+        n_sales = options['sales']
+        n_prescriptions = options['prescriptions'] if options['prescriptions'] is not None else n_sales // 10
+        n_lab_tests = options['lab_tests'] if options['lab_tests'] is not None else n_sales // 20
+        n_expenses = options['expenses'] if options['expenses'] is not None else self.days * 5
+
+        started = time.perf_counter()
+        self.users = self.seed_users()
+        self.products = self.step('products', self.seed_products, options['products'])
+        self.customers = self.step('customers', self.seed_customers, options['customers'])
+        self.step('sales', self.seed_sales, n_sales)
+        self.step('prescriptions', self.seed_prescriptions, n_prescriptions)
+        self.step('lab tests', self.seed_lab_tests, n_lab_tests)
+        self.step('expenses', self.seed_expenses, n_expenses)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nBenchmark dataset seeded in {time.perf_counter() - started:.1f}s '
+            f'(users password: {BENCH_PASSWORD})'
+        ))
+
+    def step(self, label, func, count):
+        started = time.perf_counter()
+        result = func(count)
+        self.stdout.write(f'  {label:<14} {count:>10,}  {time.perf_counter() - started:7.1f}s')
+        return result
+
+    def random_moment(self):
+        day = self.start_date + timedelta(days=self.rng.randrange(self.days))
+        # Trading hours, 08:00-20:00
+        seconds = self.rng.randrange(8 * 3600, 20 * 3600)
+        moment = datetime.combine(day, dt_time()) + timedelta(seconds=seconds)
+        return timezone.make_aware(moment, self.tz)
+
+    def money(self, low, high):
+        return Decimal(self.rng.randrange(low * 100, high * 100)) * CENT
+
+    def bulk(self, model, objects):
+        with transaction.atomic():
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def seed_users(self):
+        users = {}
+        password = make_password(BENCH_PASSWORD)  # hash once, not per user
+        for username, role in BENCH_USERS:
+            user, _ = User.objects.get_or_create(
+                username=username,
+                defaults={'password': password, 'role': role, 'email': f'{username}@bench.viorhealth.local'},
+            )
+            users.setdefault(role, []).append(user)
+        return users
+
+    def seed_products(self, count):
+        categories = [
+            Category.objects.get_or_create(name=name)[0] for name in CATEGORY_NAMES
+        ]
+        supplier, _ = Supplier.objects.get_or_create(
+            name='Benchmark Medical Supplies',
+            defaults={
+                'contact_person': 'Bench Supplier', 'email': 'supplier@bench.viorhealth.local',
+                'phone': '+255700000000', 'address': 'Dar es Salaam',
+            },
+        )
+        today = timezone.localdate()
+        products = []
+        for i in range(count):
+            cost = self.money(200, 20000)
+            products.append(Product(
+                name=f'{self.rng.choice(DRUG_NAMES)} {self.rng.choice(STRENGTHS)} #{i}',
+                generic_name=self.rng.choice(DRUG_NAMES),
+                category=self.rng.choice(categories),
+                supplier=supplier,
+                sku=f'BENCH-{i:07d}',
+                barcode=f'BENCH{i:010d}',
+                unit_type=self.rng.choice(UNIT_TYPES),
+                unit_price=(cost * Decimal(self.rng.choice(['1.2', '1.3', '1.5']))).quantize(CENT),
+                cost_price=cost,
+                # Generous stock so checkout benchmarks do not run dry
+                quantity=self.rng.choice([0, 5, 50, 5000, 100000, 100000, 100000]),
+                reorder_level=self.rng.choice([10, 20, 50]),
+                expiry_date=today + timedelta(days=self.rng.randrange(-30, 720)),
+                batch_number=f'B{self.rng.randrange(100000):05d}',
+                is_prescription_required=self.rng.random() < 0.3,
+                created_by=self.users['admin'][0],
+            ))
+        return self.bulk(Product, products)
+
+    def seed_customers(self, count):
+        customers = []
+        for i in range(count):
+            name = f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+            customers.append(Customer(
+                name=name,
+                phone=f'+2557{self.rng.randrange(10 ** 8):08d}',
+                email=f'customer{i}@bench.viorhealth.local',
+            ))
+        return self.bulk(Customer, customers)
+
+    def seed_sales(self, count):
+        cashiers = self.users['cashier'] + self.users['pharmacist']
+        methods = ['cash', 'cash', 'cash', 'mobile', 'mobile', 'card', 'insurance']
+        statuses = ['completed'] * 97 + ['cancelled', 'refunded', 'pending']
+        rng = self.rng
+
+        with explicit_timestamps(Sale):
+            for offset in range(0, count, self.batch_size):
+                sales, lines = [], []
+                for i in range(offset, min(offset + self.batch_size, count)):
+                    items = []
+                    subtotal = Decimal('0.00')
+                    for product in rng.sample(self.products, k=min(rng.randint(1, 5), len(self.products))):
+                        quantity = rng.randint(1, 4)
+                        total = product.unit_price * quantity
+                        subtotal += total
+                        items.append((product, quantity, total))
+                    created_at = self.random_moment()
+                    sales.append(Sale(
+                        invoice_number=f'BENCH-{i:08d}',
+                        customer=rng.choice(self.customers) if self.customers and rng.random() < 0.4 else None,
+                        subtotal=subtotal,
+                        total=subtotal,
+                        payment_method=rng.choice(methods),
+                        amount_paid=subtotal,
+                        status=rng.choice(statuses),
+                        cashier=rng.choice(cashiers),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    ))
+                    lines.append(items)
+
+                with transaction.atomic():
+                    Sale.objects.bulk_create(sales)
+                    SaleItem.objects.bulk_create([
+                        SaleItem(sale=sale, product=product, quantity=quantity,
+                                 unit_price=product.unit_price, total=total)
+                        for sale, items in zip(sales, lines)
+                        for product, quantity, total in items
+                    ], batch_size=self.batch_size)
+
+    def seed_prescriptions(self, count):
+        if not self.customers:
+            return
+        creators = self.users['pharmacist']
+        statuses = ['dispensed'] * 15 + ['pending'] * 4 + ['cancelled']
+        rng = self.rng
+
+        with explicit_timestamps(Prescription):
+            for offset in range(0, count, self.batch_size):
+                prescriptions, lines = [], []
+                for i in range(offset, min(offset + self.batch_size, count)):
+                    created_at = self.random_moment()
+                    status = rng.choice(statuses)
+                    prescriptions.append(Prescription(
+                        prescription_number=f'BENCHRX-{i:08d}',
+                        customer=rng.choice(self.customers),
+                        doctor_name=rng.choice(DOCTORS),
+                        diagnosis=rng.choice(['Malaria', 'URTI', 'Hypertension', 'Diabetes', 'UTI']),
+                        prescription_date=created_at.date(),
+                        status=status,
+                        dispensed_by=rng.choice(creators) if status == 'dispensed' else None,
+                        dispensed_at=created_at + timedelta(minutes=rng.randint(5, 90)) if status == 'dispensed' else None,
+                        created_by=rng.choice(creators),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    ))
+                    lines.append(rng.sample(self.products, k=min(rng.randint(1, 3), len(self.products))))
+
+                with transaction.atomic():
+                    Prescription.objects.bulk_create(prescriptions)
+                    PrescriptionItem.objects.bulk_create([
+                        PrescriptionItem(
+                            prescription=prescription, product=product,
+                            dosage='1 tablet', frequency=rng.choice(['OD', 'BD', 'TDS']),
+                            duration=f'{rng.choice([3, 5, 7, 14, 30])} days',
+                            quantity=rng.randint(1, 30),
+                        )
+                        for prescription, products in zip(prescriptions, lines)
+                        for product in products
+                    ], batch_size=self.batch_size)
+
+    def seed_lab_tests(self, count):
+        if not TestType.objects.exists():
+            call_command('seed_test_types', stdout=StringIO())
+        test_types = list(TestType.objects.filter(is_active=True))
+        requesters = self.users['pharmacist'] + self.users['manager']
+        technicians = self.users['lab_technician']
+        reviewers = self.users['pharmacist']
+        statuses = ['reviewed'] * 5 + ['completed'] * 3 + ['in_progress', 'pending']
+        rng = self.rng
+
+        with explicit_timestamps(LabTest, LabMeasurement):
+            for offset in range(0, count, self.batch_size):
+                tests = []
+                for i in range(offset, min(offset + self.batch_size, count)):
+                    test_type = rng.choice(test_types)
+                    requested_at = self.random_moment()
+                    status = rng.choice(statuses)
+                    started_at = requested_at + timedelta(minutes=rng.randint(2, 60)) if status != 'pending' else None
+                    completed_at = (
+                        started_at + timedelta(minutes=rng.randint(5, 120))
+                        if status in ('completed', 'reviewed') else None
+                    )
+                    reviewed_at = completed_at + timedelta(minutes=rng.randint(5, 240)) if status == 'reviewed' else None
+                    customer = rng.choice(self.customers) if self.customers else None
+                    tests.append(LabTest(
+                        test_number=f'BENCHLAB-{i:08d}',
+                        test_type=test_type,
+                        test_name=test_type.name,
+                        customer=customer,
+                        patient_name=customer.name if customer else 'Walk-in Patient',
+                        patient_age=rng.randint(1, 90),
+                        patient_gender=rng.choice(['male', 'female']),
+                        cost=test_type.cost,
+                        paid=status != 'pending',
+                        paid_at=requested_at if status != 'pending' else None,
+                        payment_method='cash' if status != 'pending' else None,
+                        requested_by=rng.choice(requesters),
+                        requested_at=requested_at,
+                        assigned_to=rng.choice(technicians),
+                        status=status,
+                        started_at=started_at,
+                        completed_at=completed_at,
+                        results='See measurements' if completed_at else None,
+                        reviewed_by=rng.choice(reviewers) if reviewed_at else None,
+                        reviewed_at=reviewed_at,
+                        created_at=requested_at,
+                        updated_at=reviewed_at or completed_at or started_at or requested_at,
+                    ))
+
+                with transaction.atomic():
+                    LabTest.objects.bulk_create(tests)
+                    measurements = []
+                    for test in tests:
+                        if not test.completed_at:
+                            continue
+                        for name, unit, reference, low, high in rng.sample(MEASUREMENTS, k=rng.randint(1, 4)):
+                            value = rng.uniform(low * 0.8, high * 1.2)
+                            measurements.append(LabMeasurement(
+                                lab_test=test, parameter_name=name, value=f'{value:.1f}', unit=unit,
+                                reference_range=reference, is_normal=low <= value <= high,
+                                measured_by=test.assigned_to, measured_at=test.completed_at,
+                                created_at=test.completed_at, updated_at=test.completed_at,
+                            ))
+                    LabMeasurement.objects.bulk_create(measurements, batch_size=self.batch_size)
+
+    def seed_expenses(self, count):
+        for name, description in EXPENSE_CATEGORIES:
+            ExpenseCategory.objects.get_or_create(name=name)
+        creators = self.users['manager'] + self.users['admin']
+        rng = self.rng
+
+        expenses = []
+        with explicit_timestamps(Expense):
+            for i in range(count):
+                category, description = rng.choice(EXPENSE_CATEGORIES)
+                created_at = self.random_moment()
+                approved = rng.random() < 0.7
+                expenses.append(Expense(
+                    category=category,
+                    description=description,
+                    amount=self.money(5000, 500000),
+                    expense_date=created_at.date(),
+                    payment_method=rng.choice(['cash', 'bank_transfer', 'mobile_money']),
+                    reference_number=f'BENCHEXP-{i:08d}',
+                    is_approved=approved,
+                    approved_by=self.users['admin'][0] if approved else None,
+                    approved_at=created_at if approved else None,
+                    created_by=rng.choice(creators),
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            self.bulk(Expense, expenses)
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('inventory', '0002_product_dosage_form_product_unit_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('discount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('items_sold', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'daily_sales_rollups',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlertSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('kind', models.CharField(choices=[('low_stock', 'Low Stock'), ('expiring', 'Expiring Soon'), ('expired', 'Expired')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reorder_level', models.IntegerField(default=0)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.product')),
+            ],
+            options={
+                'db_table': 'stock_alert_snapshots',
+                'ordering': ['-date', 'kind', 'product__name'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'kind', 'product'), name='unique_stock_alert_per_day')],
+            },
+        ),
+    ]
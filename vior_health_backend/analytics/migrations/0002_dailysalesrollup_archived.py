@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysalesrollup',
+            name='archived',
+            field=models.BooleanField(default=False, help_text="The day's sales were archived; totals are frozen"),
+        ),
+    ]
@@ -1,3 +1,53 @@
 from django.db import models
+from inventory.models import Product
 
-# Create your models here.
+
+class DailySalesRollup(models.Model):
+    """
+    Completed sales totals for one closed day, rebuilt by the scheduled
+    ``analytics.rebuild_sales_rollups`` task
+    """
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales_count = models.IntegerField(default=0)
+    items_sold = models.IntegerField(default=0)
+    archived = models.BooleanField(default=False, help_text="The day's sales were archived; totals are frozen")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_sales_rollups'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue} ({self.sales_count} sales)"
+
+
+class StockAlertSnapshot(models.Model):
+    """
+    Products that were low on stock or close to expiry on a given day
+    """
+    KIND_CHOICES = (
+        ('low_stock', 'Low Stock'),
+        ('expiring', 'Expiring Soon'),
+        ('expired', 'Expired'),
+    )
+
+    date = models.DateField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alerts')
+    quantity = models.IntegerField()
+    reorder_level = models.IntegerField(default=0)
+    expiry_date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'stock_alert_snapshots'
+        ordering = ['-date', 'kind', 'product__name']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'kind', 'product'], name='unique_stock_alert_per_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.kind}: {self.product_id}"
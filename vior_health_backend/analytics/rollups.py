@@ -0,0 +1,148 @@
+"""
+Daily sales rollups and stock alert snapshots.
+
+``DailySalesRollup`` holds one row per closed day (every day before today),
+so charts over long ranges read a handful of rows instead of aggregating the
+sales table. Today, and any day without a rollup row, is still aggregated
+live, which keeps the numbers exact between rebuilds.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventory.models import Product
+from sales.models import Sale, SaleItem
+
+from .cache import invalidate
+from .models import DailySalesRollup, StockAlertSnapshot
+
+ROLLUP_FIELDS = ['revenue', 'tax', 'discount', 'sales_count', 'items_sold']
+
+
+def _completed_sales(start_date, end_date):
+    return Sale.objects.filter(created_at__date__range=[start_date, end_date], status='completed')
+
+
+def rebuild_sales_rollups(start_date=None, end_date=None):
+    """
+    Recompute rollups for ``start_date``..``end_date`` (default: from the first
+    sale to yesterday). Days without sales get a zero row so they count as
+    covered; archived days are left alone. Returns the number of days written.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    end_date = min(end_date or yesterday, yesterday)
+    if start_date is None:
+        first = Sale.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            return 0
+        start_date = timezone.localtime(first).date()
+    if start_date > end_date:
+        return 0
+
+    sales = {
+        row['date']: row for row in
+        _completed_sales(start_date, end_date).annotate(date=TruncDate('created_at'))
+        .values('date').annotate(
+            revenue=Sum('total'), tax=Sum('tax'), discount=Sum('discount'), sales_count=Count('id'),
+        )
+    }
+    items = dict(
+        SaleItem.objects.filter(
+            sale__created_at__date__range=[start_date, end_date], sale__status='completed',
+        ).annotate(date=TruncDate('sale__created_at')).values('date')
+        .annotate(quantity=Sum(F('quantity') - F('refunded_quantity'))).values_list('date', 'quantity')
+    )
+
+    # Archived days are frozen: their sales are no longer in the sales table.
+    archived = set(DailySalesRollup.objects.filter(
+        date__range=[start_date, end_date], archived=True,
+    ).values_list('date', flat=True))
+
+    rollups = []
+    for offset in range((end_date - start_date).days + 1):
+        day = start_date + timedelta(days=offset)
+        if day in archived:
+            continue
+        row = sales.get(day, {})
+        rollups.append(DailySalesRollup(
+            date=day,
+            revenue=row.get('revenue') or 0,
+            tax=row.get('tax') or 0,
+            discount=row.get('discount') or 0,
+            sales_count=row.get('sales_count') or 0,
+            items_sold=items.get(day) or 0,
+            updated_at=timezone.now(),
+        ))
+
+    with transaction.atomic():
+        DailySalesRollup.objects.bulk_create(
+            rollups, batch_size=500, update_conflicts=True,
+            unique_fields=['date'], update_fields=ROLLUP_FIELDS + ['updated_at'],
+        )
+        transaction.on_commit(lambda: invalidate('analytics.DailySalesRollup'))
+    return len(rollups)
+
+
+def daily_sales(start_date, end_date):
+    """
+    ``{date: (total, count)}`` for days with completed sales, reading rollups
+    for closed days and aggregating the sales table for the rest.
+    """
+    today = timezone.localdate()
+    result = {}
+    covered = set()
+    for rollup in DailySalesRollup.objects.filter(
+        date__range=[start_date, min(end_date, today - timedelta(days=1))],
+    ).values('date', 'revenue', 'sales_count'):
+        covered.add(rollup['date'])
+        if rollup['sales_count']:
+            result[rollup['date']] = (rollup['revenue'], rollup['sales_count'])
+
+    live_from = start_date
+    if covered and len(covered) == (max(covered) - start_date).days + 1:
+        # Rollups cover every day from start_date on, so only the days after
+        # the last one (normally just today) need the sales table.
+        live_from = max(covered) + timedelta(days=1)
+    live = _completed_sales(live_from, end_date)
+    for row in live.annotate(date=TruncDate('created_at')).values('date').annotate(
+        total=Sum('total'), count=Count('id'),
+    ):
+        if row['date'] not in covered:
+            result[row['date']] = (row['total'], row['count'])
+    return dict(sorted(result.items()))
+
+
+def snapshot_low_stock(date=None):
+    """Record every active product at or below its reorder level."""
+    date = date or timezone.localdate()
+    products = Product.objects.filter(is_active=True, quantity__lte=F('reorder_level'))
+    return _snapshot(date, 'low_stock', products)
+
+
+def snapshot_expiring_stock(within_days=90, date=None):
+    """Record stocked products that have expired or expire within ``within_days``."""
+    date = date or timezone.localdate()
+    stocked = Product.objects.filter(is_active=True, quantity__gt=0, expiry_date__isnull=False)
+    expired = _snapshot(date, 'expired', stocked.filter(expiry_date__lt=date))
+    expiring = _snapshot(date, 'expiring', stocked.filter(
+        expiry_date__gte=date, expiry_date__lte=date + timedelta(days=within_days),
+    ))
+    return {'expired': expired, 'expiring': expiring}
+
+
+def _snapshot(date, kind, products):
+    alerts = [
+        StockAlertSnapshot(
+            date=date, kind=kind, product_id=product['id'], quantity=product['quantity'],
+            reorder_level=product['reorder_level'], expiry_date=product['expiry_date'],
+        )
+        for product in products.values('id', 'quantity', 'reorder_level', 'expiry_date')
+    ]
+    # Re-running on the same day replaces that day's snapshot.
+    with transaction.atomic():
+        StockAlertSnapshot.objects.filter(date=date, kind=kind).delete()
+        StockAlertSnapshot.objects.bulk_create(alerts, batch_size=500)
+    return len(alerts)
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from expenses.models import Expense
+from inventory.models import Product
+from laboratory.models import LabTest
+from prescriptions.models import Prescription
+from sales.models import Sale, SaleItem
+
+from .cache import invalidate
+
+# Model -> cache generation it bumps. Sale items belong to their sale.
+INVALIDATES = {
+    Sale: 'sales.Sale',
+    SaleItem: 'sales.Sale',
+    Product: 'inventory.Product',
+    Prescription: 'prescriptions.Prescription',
+    LabTest: 'laboratory.LabTest',
+    Expense: 'expenses.Expense',
+}
+
+
+def _invalidate(sender, **kwargs):
+    label = INVALIDATES[sender]
+    # After commit: invalidating earlier would let a concurrent reader cache
+    # the pre-commit state under the new generation.
+    transaction.on_commit(lambda: invalidate(label))
+
+
+for model in INVALIDATES:
+    post_save.connect(_invalidate, sender=model, dispatch_uid=f'cache-invalidate-save-{model._meta.label}')
+    post_delete.connect(_invalidate, sender=model, dispatch_uid=f'cache-invalidate-delete-{model._meta.label}')
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from jobs.queue import task
+
+from . import rollups
+
+
+@task('analytics.rebuild_sales_rollups')
+def rebuild_sales_rollups(days=None):
+    """Rebuild the last ``days`` closed days, or all history when ``days`` is None."""
+    start_date = None
+    if days is not None:
+        start_date = timezone.localdate() - timedelta(days=days)
+    return {'days': rollups.rebuild_sales_rollups(start_date=start_date)}
+
+
+@task('analytics.snapshot_low_stock')
+def snapshot_low_stock():
+    return {'low_stock': rollups.snapshot_low_stock()}
+
+
+@task('analytics.snapshot_expiring_stock')
+def snapshot_expiring_stock(within_days=90):
+    return rollups.snapshot_expiring_stock(within_days=within_days)
@@ -1,3 +1,363 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings, tag
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import User
+from analytics import async_views, benchmarks
+from expenses.models import Expense
+from inventory.models import Category, Product
+from laboratory import async_views as lab_async_views
+from laboratory.models import LabTest, TestType
+from laboratory.panels import order_tests
+from prescriptions.models import Prescription
+from sales import async_views as sales_async_views
+from sales.checkout import sync_sales
+from sales.models import Customer, Sale, SaleItem
+from sales.refunds import refund_sale
+
+from .models import DailySalesRollup, StockAlertSnapshot
+from .rollups import rebuild_sales_rollups, snapshot_expiring_stock, snapshot_low_stock
+from .signals import INVALIDATES
+
+
+@tag('benchmark')
+class EndpointBenchmarkTests(TestCase):
+    """Query budgets for the hot endpoints. Run alone with --tag benchmark."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark', products=50, customers=50, sales=300, days=30,
+            end_date='2026-01-31', stdout=StringIO(),
+        )
+
+    def test_hot_endpoints_stay_within_query_budgets(self):
+        results = benchmarks.run_benchmarks(iterations=2, warmup=1)
+
+        self.assertEqual(set(results), set(benchmarks.QUERY_BUDGETS))
+        self.assertEqual(benchmarks.compare(results), [])
+
+    def test_write_scenarios_are_rolled_back(self):
+        from sales.models import Sale
+
+        before = Sale.objects.count()
+        benchmarks.run_benchmarks(iterations=2, warmup=0, only={'create_sale', 'dispense'})
+        self.assertEqual(Sale.objects.count(), before)
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('manager', password='x', role='manager')
+        category = Category.objects.create(name='General')
+        today = timezone.localdate()
+        cls.product = Product.objects.create(
+            name='Amoxicillin', category=category, sku='A-1', barcode='A-1', unit_price=Decimal('100.00'),
+            cost_price=Decimal('50.00'), quantity=5, reorder_level=10,
+            expiry_date=today + timedelta(days=30),
+        )
+        Product.objects.create(
+            name='Expired syrup', category=category, sku='E-1', barcode='E-1', unit_price=Decimal('100.00'),
+            cost_price=Decimal('50.00'), quantity=20, expiry_date=today - timedelta(days=1),
+        )
+        for days_ago, total in ((0, '300.00'), (1, '100.00'), (1, '250.00'), (3, '80.00')):
+            cls._sale(days_ago, Decimal(total))
+        cls._sale(1, Decimal('999.00'), status='cancelled')
+
+    @classmethod
+    def _sale(cls, days_ago, total, status='completed'):
+        sale = Sale.objects.create(
+            invoice_number=f'INV-{Sale.objects.count() + 1}', subtotal=total, total=total,
+            payment_method='cash', amount_paid=total, cashier=cls.user, status=status,
+        )
+        SaleItem.objects.create(sale=sale, product=cls.product, quantity=2, unit_price=total / 2,
+                                total=total)
+        Sale.objects.filter(pk=sale.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rollups_match_live_aggregation(self):
+        live = self.client.get('/api/analytics/sales-chart/', {'days': 7}).data
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_sales_rollups(), 3)
+        yesterday = DailySalesRollup.objects.get(date=timezone.localdate() - timedelta(days=1))
+        self.assertEqual((yesterday.revenue, yesterday.sales_count, yesterday.items_sold),
+                         (Decimal('350.00'), 2, 4))
+
+        with self.assertNumQueries(2):
+            from_rollups = self.client.get('/api/analytics/sales-chart/', {'days': 7}).data
+        self.assertEqual(from_rollups, live)
+        self.assertEqual([day['count'] for day in live], [1, 2, 1])
+
+    def test_stock_alert_snapshots(self):
+        self.assertEqual(snapshot_low_stock(), 1)
+        self.assertEqual(snapshot_expiring_stock(within_days=60), {'expired': 1, 'expiring': 1})
+        # Re-running replaces the day's snapshot.
+        snapshot_low_stock()
+        self.assertEqual(StockAlertSnapshot.objects.count(), 3)
+
+        response = self.client.get('/api/analytics/stock-alerts/', {'kind': 'low_stock'})
+        self.assertEqual(response.data['date'], timezone.localdate())
+        self.assertEqual([a['product_name'] for a in response.data['alerts']], ['Amoxicillin'])
+
+        response = self.client.get('/api/analytics/stock-alerts/', {'date': timezone.localdate().isoformat()})
+        self.assertEqual(len(response.data['alerts']), 3)
+        for value in ('yesterday', '2026-02-30'):
+            with self.subTest(date=value):
+                response = self.client.get('/api/analytics/stock-alerts/', {'date': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+
+class CacheInvalidationTests(TestCase):
+    """Cached payloads after writes, including writes that send no signals."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('cache-admin', password='x', role='admin')
+        cls.tech = User.objects.create_user('cache-tech', password='x', role='lab_technician')
+        cls.cashier = User.objects.create_user('cache-cashier', password='x', role='cashier')
+        cls.product = Product.objects.create(
+            name='Amoxicillin', category=Category.objects.create(name='General'), sku='A-1', barcode='A-1',
+            unit_price=Decimal('100.00'), cost_price=Decimal('50.00'), quantity=50,
+        )
+        cls.customer = Customer.objects.create(name='Jane Doe', phone='0700000000')
+        cls.test_type = TestType.objects.create(name='Blood Sugar Test', code='blood_sugar')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def get(self, path, user=None):
+        self.client.force_authenticate(user or self.admin)
+        return self.client.get(path).data
+
+    def write(self, func, *args, **kwargs):
+        # TestCase never commits, and invalidation waits for the commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    def sale(self, total='100.00'):
+        return Sale.objects.create(
+            invoice_number=f'INV-C{Sale.objects.count()}', subtotal=Decimal(total), total=Decimal(total),
+            payment_method='cash', amount_paid=Decimal(total), cashier=self.cashier,
+        )
+
+    def lab_test(self, **fields):
+        return LabTest.objects.create(
+            test_type=self.test_type, test_name=self.test_type.name, patient_name='Jane Doe',
+            requested_by=self.admin, **fields,
+        )
+
+    def test_save_and_delete_of_each_model_invalidate(self):
+        cases = {
+            Sale: ('/api/analytics/dashboard-stats/', lambda data: data['today_transactions'], self.sale),
+            SaleItem: ('/api/analytics/top-products/', len, lambda: SaleItem.objects.create(
+                sale=self.sale(), product=self.product, quantity=1, unit_price=Decimal('100.00'), total=Decimal('100.00'),
+            )),
+            Product: ('/api/analytics/inventory-summary/', lambda data: data['total_products'], lambda: Product.objects.create(
+                name='Zinc', category=self.product.category, sku='Z-1', barcode='Z-1',
+                unit_price=Decimal('50.00'), cost_price=Decimal('20.00'), quantity=10,
+            )),
+            Prescription: ('/api/analytics/dashboard-stats/', lambda data: data['pending_prescriptions'], lambda: Prescription.objects.create(
+                prescription_number='RX-C1', customer=self.customer, doctor_name='Dr. Who',
+                prescription_date=timezone.localdate(), created_by=self.admin,
+            )),
+            LabTest: ('/api/laboratory/tests/stats/', lambda data: data['total'], self.lab_test),
+            Expense: ('/api/expenses/expenses/summary/', lambda data: data['total_expenses'], lambda: Expense.objects.create(
+                category='Rent', description='Rent', amount=Decimal('500.00'),
+                expense_date=timezone.localdate(), created_by=self.admin,
+            )),
+        }
+        self.assertEqual(set(cases), set(INVALIDATES))
+
+        for model, (path, value, create) in cases.items():
+            with self.subTest(model=model.__name__):
+                before = value(self.get(path))
+                instance = self.write(create)
+                created = value(self.get(path))
+                self.assertNotEqual(created, before)
+                self.write(instance.delete)
+                self.assertEqual(value(self.get(path)), before)
+
+    def test_scoped_payloads_are_kept_apart(self):
+        self.lab_test(assigned_to=self.tech)
+        self.lab_test()
+        self.assertEqual(self.get('/api/laboratory/tests/stats/')['total'], 2)
+        self.assertEqual(self.get('/api/laboratory/tests/stats/', self.tech)['total'], 1)
+        self.assertEqual(self.get('/api/laboratory/tests/stats/', self.cashier)['total'], 0)
+
+        Expense.objects.create(
+            category='Rent', description='Rent', amount=Decimal('500.00'),
+            expense_date=timezone.localdate(), created_by=self.admin,
+        )
+        Expense.objects.create(
+            category='Fuel', description='Fuel', amount=Decimal('20.00'),
+            expense_date=timezone.localdate(), created_by=self.cashier,
+        )
+        self.assertEqual(self.get('/api/expenses/expenses/summary/')['total_expenses'], 520.0)
+        self.assertEqual(self.get('/api/expenses/expenses/summary/', self.cashier)['total_expenses'], 20.0)
+        self.assertEqual(self.get('/api/expenses/expenses/summary/', self.tech)['total_expenses'], 0.0)
+
+    def test_bulk_and_f_expression_writes_invalidate(self):
+        dashboard = '/api/analytics/dashboard-stats/'
+        inventory = '/api/analytics/inventory-summary/'
+        self.assertEqual(self.get(dashboard)['today_transactions'], 0)
+        stock_value = self.get(inventory)['total_value']
+
+        # Offline sync: bulk_create for sales and items, F() for stock.
+        self.write(sync_sales, [{
+            'client_id': 'till-1', 'recorded_at': timezone.now(), 'payment_method': 'cash',
+            'amount_paid': Decimal('1000.00'), 'items': [{'product': self.product.pk, 'quantity': 2}],
+        }], self.cashier, 'allow_negative')
+        self.assertEqual(self.get(dashboard)['today_transactions'], 1)
+        self.assertEqual(self.get(inventory)['total_value'], stock_value - 100)
+
+        # Refunds: F() updates of the sale, its items and stock.
+        self.write(refund_sale, Sale.objects.get(), self.admin)
+        self.assertEqual(self.get(dashboard)['today_transactions'], 0)
+        self.assertEqual(self.get(inventory)['total_value'], stock_value)
+
+        # Panel orders: bulk_create of lab tests.
+        self.assertEqual(self.get('/api/laboratory/tests/stats/')['total'], 0)
+        self.write(order_tests, [self.test_type], {'patient_name': 'Jane Doe'}, self.admin)
+        self.assertEqual(self.get('/api/laboratory/tests/stats/')['total'], 1)
+
+
+@override_settings(REQUEST_QUERY_BUDGET=0)
+class RequestProfilingLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('profiled', password='x', role='manager'))
+
+    def test_over_budget_request_is_one_warning_line_with_its_sql(self):
+        with self.assertLogs('vior_health.requests', 'INFO') as logs:
+            self.client.get('/api/analytics/inventory-summary/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'WARNING')
+        self.assertNotIn('\n', record.getMessage())
+        line = json.loads(record.getMessage())
+        self.assertEqual((line['path'], line['over_budget']), ('/api/analytics/inventory-summary/', True))
+        self.assertIn('SELECT', line['slowest_sql'][0]['sql'])
+        self.assertIn('repeated_sql', line)
+
+    @override_settings(REQUEST_QUERY_BUDGET=50)
+    def test_requests_within_budget_are_logged_at_info(self):
+        with self.assertLogs('vior_health.requests', 'INFO') as logs:
+            self.client.get('/api/analytics/inventory-summary/')
+        [record] = logs.records
+        self.assertEqual(record.levelname, 'INFO')
+        self.assertNotIn('slowest_sql', json.loads(record.getMessage()))
+
+
+class AsyncViewMixin:
+    """Sample data and helpers for comparing the async endpoints with the sync ones."""
+
+    def create_data(self):
+        self.user = User.objects.create_user('async-manager', password='x', role='manager')
+        category = Category.objects.create(name='General')
+        product = Product.objects.create(
+            name='Amoxicillin', category=category, sku='A-1', barcode='A-1', unit_price=Decimal('100.00'),
+            cost_price=Decimal('50.00'), quantity=5, reorder_level=10,
+        )
+        for number, (total, method) in enumerate((('300.00', 'cash'), ('120.00', 'card'), ('80.00', 'cash'))):
+            total = Decimal(total)
+            sale = Sale.objects.create(
+                invoice_number=f'INV-A{number}', subtotal=total, total=total,
+                payment_method=method, amount_paid=total, cashier=self.user,
+            )
+            SaleItem.objects.create(sale=sale, product=product, quantity=1, unit_price=total, total=total)
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def get(self, path, params=None, token=None):
+        return AsyncRequestFactory().get(
+            path, params or {}, headers={'Authorization': f'Bearer {token or self.token}'},
+        )
+
+    def sync_json(self, path, params=None):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(path, params or {}).json()
+
+    async def assert_same_as_sync(self, view, path, params=None):
+        response = await view(self.get(path, params))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), await sync_to_async(self.sync_json)(path, params))
+
+
+@override_settings(ASYNC_PARALLEL_QUERIES=False)
+class AsyncViewTests(AsyncViewMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_data()
+
+    async def test_async_views_match_sync_views(self):
+        for view, path, params in [
+            (async_views.dashboard_stats, '/api/analytics/dashboard-stats/', None),
+            (async_views.sales_chart, '/api/analytics/sales-chart/', {'days': 3}),
+            (async_views.top_products, '/api/analytics/top-products/', None),
+            (async_views.inventory_summary, '/api/analytics/inventory-summary/', None),
+            (async_views.stock_alerts, '/api/analytics/stock-alerts/', None),
+            (async_views.recent_activities, '/api/analytics/recent-activities/', None),
+            (sales_async_views.statistics, '/api/sales/sales/statistics/', {'days': 7}),
+            (lab_async_views.stats, '/api/laboratory/tests/stats/', None),
+        ]:
+            with self.subTest(path=path):
+                await cache.aclear()
+                await self.assert_same_as_sync(view, path, params)
+
+    async def test_async_stock_alerts_rejects_a_bad_date(self):
+        response = await async_views.stock_alerts(self.get('/api/analytics/stock-alerts/', {'date': '31/01/2026'}))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', json.loads(response.content))
+
+    async def test_async_view_is_cached(self):
+        first = await async_views.dashboard_stats(self.get('/api/analytics/dashboard-stats/'))
+        self.assertEqual(json.loads(first.content)['today_transactions'], 3)
+        with mock.patch('analytics.async_views.gather_queries') as gather_queries:
+            cached = await async_views.dashboard_stats(self.get('/api/analytics/dashboard-stats/'))
+        gather_queries.assert_not_called()
+        self.assertEqual(cached.content, first.content)
+
+    async def test_async_view_needs_a_valid_token(self):
+        response = await async_views.dashboard_stats(self.get('/api/analytics/dashboard-stats/', token='nope'))
+        self.assertEqual(response.status_code, 401)
+        request = AsyncRequestFactory().get('/api/analytics/dashboard-stats/')
+        self.assertEqual((await async_views.dashboard_stats(request)).status_code, 401)
+
+    async def test_sync_views_are_profiled_under_asgi(self):
+        response = await self.async_client.get(
+            '/api/sales/sales/statistics/', headers={'Authorization': f'Bearer {self.token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+
+class ParallelQueryTests(AsyncViewMixin, TransactionTestCase):
+    """Queries on the worker pool need committed data, hence TransactionTestCase."""
+
+    def setUp(self):
+        cache.clear()
+        self.create_data()
+
+    async def test_parallel_queries_match_sync_views(self):
+        await self.assert_same_as_sync(async_views.dashboard_stats, '/api/analytics/dashboard-stats/')
+        await self.assert_same_as_sync(
+            sales_async_views.statistics, '/api/sales/sales/statistics/', {'days': 7},
+        )
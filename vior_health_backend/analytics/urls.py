@@ -1,13 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from .views import (
-    dashboard_stats, sales_chart, top_products, 
-    inventory_summary, recent_activities
-)
+
+from . import async_views, views
+
+# ASYNC_VIEWS serves the async versions (ASGI only, see README).
+endpoints = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('dashboard-stats/', dashboard_stats, name='dashboard_stats'),
-    path('sales-chart/', sales_chart, name='sales_chart'),
-    path('top-products/', top_products, name='top_products'),
-    path('inventory-summary/', inventory_summary, name='inventory_summary'),
-    path('recent-activities/', recent_activities, name='recent_activities'),
+    path('dashboard-stats/', endpoints.dashboard_stats, name='dashboard_stats'),
+    path('sales-chart/', endpoints.sales_chart, name='sales_chart'),
+    path('top-products/', endpoints.top_products, name='top_products'),
+    path('inventory-summary/', endpoints.inventory_summary, name='inventory_summary'),
+    path('stock-alerts/', endpoints.stock_alerts, name='stock_alerts'),
+    path('recent-activities/', endpoints.recent_activities, name='recent_activities'),
 ]
@@ -1,211 +1,331 @@
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Sum, Count, F, Q
+from django.utils.dateparse import parse_date
+from django.db.models import Sum, Count, F, Max, Q
 from django.db.models.functions import TruncDate
 from datetime import datetime, timedelta
-from sales.models import Sale, SaleItem
+from sales.models import ArchivedSaleItem, Sale, SaleItem
+from sales.refunds import refunded_share
 from inventory.models import Product, StockMovement
 from prescriptions.models import Prescription
+from vior_health_backend.routers import report_grade
+from .cache import cached_endpoint
+from .models import DailySalesRollup, StockAlertSnapshot
+from .rollups import daily_sales
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@report_grade
+@cached_endpoint('dashboard_stats', depends_on=(
+    'sales.Sale', 'inventory.Product', 'prescriptions.Prescription', 'analytics.DailySalesRollup',
+))
 def dashboard_stats(request):
+    results = {name: query() for name, query in dashboard_queries().items()}
+    return Response(dashboard_payload(results))
+
+
+def _all_time_totals():
+    """Frozen rollups for archived days plus live sales after them."""
+    archived = DailySalesRollup.objects.filter(archived=True).aggregate(
+        revenue=Sum('revenue'), count=Sum('sales_count'), last_day=Max('date')
+    )
+    live_sales = Sale.objects.filter(status='completed')
+    if archived['last_day']:
+        live_sales = live_sales.filter(created_at__date__gt=archived['last_day'])
+    live_totals = live_sales.aggregate(revenue=Sum('total'), count=Count('id'))
+    return {
+        'revenue': (live_totals['revenue'] or 0) + (archived['revenue'] or 0),
+        'count': live_totals['count'] + (archived['count'] or 0),
+    }
+
+
+def dashboard_queries():
+    """
+    The independent queries behind ``dashboard_stats``, by name. The sync
+    view runs them in turn, the async one (``analytics.async_views``) at once.
+    """
     today = datetime.now().date()
     week_start = today - timedelta(days=today.weekday())  # Start of week (Monday)
     month_start = today.replace(day=1)  # Start of month
     thirty_days_ago = today - timedelta(days=30)
     last_month_start = (month_start - timedelta(days=1)).replace(day=1)
     last_month_end = month_start - timedelta(days=1)
-    
-    # Sales statistics - Today
-    today_sales = Sale.objects.filter(created_at__date=today, status='completed')
-    today_revenue = today_sales.aggregate(Sum('total'))['total__sum'] or 0
-    today_transactions = today_sales.count()
-    
-    # Sales statistics - This Week
-    week_sales = Sale.objects.filter(created_at__date__gte=week_start, status='completed')
-    week_revenue = week_sales.aggregate(Sum('total'))['total__sum'] or 0
-    
-    # Sales statistics - This Month
-    month_sales = Sale.objects.filter(created_at__date__gte=month_start, status='completed')
-    month_revenue = month_sales.aggregate(Sum('total'))['total__sum'] or 0
-    month_transactions = month_sales.count()
-    
-    # Sales statistics - Last Month (for comparison)
-    last_month_sales = Sale.objects.filter(
-        created_at__date__gte=last_month_start,
-        created_at__date__lte=last_month_end,
-        status='completed'
-    )
-    last_month_revenue = last_month_sales.aggregate(Sum('total'))['total__sum'] or 0
-    last_month_transactions = last_month_sales.count()
-    
+
+    completed = Sale.objects.filter(status='completed')
+    totals = {'revenue': Sum('total'), 'count': Count('id')}
+    return {
+        'today': lambda: completed.filter(created_at__date=today).aggregate(**totals),
+        'week': lambda: completed.filter(created_at__date__gte=week_start).aggregate(**totals),
+        'month': lambda: completed.filter(created_at__date__gte=month_start).aggregate(**totals),
+        # Last month, for the growth figures
+        'last_month': lambda: completed.filter(
+            created_at__date__gte=last_month_start,
+            created_at__date__lte=last_month_end,
+        ).aggregate(**totals),
+        'last_30_days': lambda: completed.filter(created_at__date__gte=thirty_days_ago).aggregate(**totals),
+        'all_time': _all_time_totals,
+        'products': lambda: Product.objects.filter(is_active=True).aggregate(
+            count=Count('id'),
+            # Same test as Product.is_low_stock
+            low_stock=Count('id', filter=Q(quantity__lte=F('reorder_level'))),
+        ),
+        'pending_prescriptions': lambda: Prescription.objects.filter(status='pending').count(),
+        'dispensed_today': lambda: Prescription.objects.filter(
+            status='dispensed',
+            dispensed_at__date=today
+        ).count(),
+    }
+
+
+def dashboard_payload(results):
+    today_revenue = results['today']['revenue'] or 0
+    today_transactions = results['today']['count']
+    month_revenue = results['month']['revenue'] or 0
+    month_transactions = results['month']['count']
+    last_month_revenue = results['last_month']['revenue'] or 0
+    last_month_transactions = results['last_month']['count']
+
     # Calculate growth percentages
     revenue_growth = 0
     if last_month_revenue > 0:
         revenue_growth = ((month_revenue - last_month_revenue) / last_month_revenue) * 100
-    
+
     sales_growth = 0
     if last_month_transactions > 0:
         sales_growth = ((month_transactions - last_month_transactions) / last_month_transactions) * 100
-    
+
     # Average transaction (last 30 days)
-    last_30_days_sales = Sale.objects.filter(created_at__date__gte=thirty_days_ago, status='completed')
-    last_30_days_revenue = last_30_days_sales.aggregate(Sum('total'))['total__sum'] or 0
-    last_30_days_count = last_30_days_sales.count()
+    last_30_days_revenue = results['last_30_days']['revenue'] or 0
+    last_30_days_count = results['last_30_days']['count']
     average_transaction = last_30_days_revenue / last_30_days_count if last_30_days_count > 0 else 0
-    
-    # All time totals
-    total_revenue = Sale.objects.filter(status='completed').aggregate(Sum('total'))['total__sum'] or 0
-    total_sales = Sale.objects.filter(status='completed').count()
-    
-    # Product statistics
-    total_products = Product.objects.filter(is_active=True).count()
-    low_stock_products = [p for p in Product.objects.filter(is_active=True) if p.is_low_stock]
-    low_stock_count = len(low_stock_products)
-    
-    # Prescription statistics
-    pending_prescriptions = Prescription.objects.filter(status='pending').count()
-    prescriptions_dispensed_today = Prescription.objects.filter(
-        status='dispensed',
-        dispensed_at__date=today
-    ).count()
-    
-    return Response({
+
+    return {
         'today_revenue': float(today_revenue),
         'today_transactions': today_transactions,
         'today_sales': today_transactions,  # For pharmacist dashboard
-        'week_revenue': float(week_revenue),
+        'week_revenue': float(results['week']['revenue'] or 0),
         'month_revenue': float(month_revenue),
         'month_transactions': month_transactions,
         'average_transaction': float(average_transaction),
-        'total_revenue': float(total_revenue),
-        'total_sales': total_sales,
-        'products_count': total_products,
-        'low_stock_count': low_stock_count,
-        'pending_prescriptions': pending_prescriptions,
-        'prescriptions_dispensed_today': prescriptions_dispensed_today,  # For pharmacist dashboard
+        'total_revenue': float(results['all_time']['revenue']),
+        'total_sales': results['all_time']['count'],
+        'products_count': results['products']['count'],
+        'low_stock_count': results['products']['low_stock'],
+        'pending_prescriptions': results['pending_prescriptions'],
+        'prescriptions_dispensed_today': results['dispensed_today'],  # For pharmacist dashboard
         'revenue_growth': f"{'+' if revenue_growth >= 0 else ''}{revenue_growth:.1f}%",
         'sales_growth': f"{'+' if sales_growth >= 0 else ''}{sales_growth:.1f}%",
-    })
+    }
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@report_grade
+@cached_endpoint('sales_chart', depends_on=('sales.Sale', 'analytics.DailySalesRollup'))
 def sales_chart(request):
     days = int(request.query_params.get('days', 7))
+    return Response(sales_chart_data(days))
+
+
+def sales_chart_data(days):
     end_date = datetime.now().date()
     start_date = end_date - timedelta(days=days)
     
-    # Get sales data grouped by date
-    sales_data = Sale.objects.filter(
-        created_at__date__range=[start_date, end_date],
-        status='completed'
-    ).annotate(
-        date=TruncDate('created_at')
-    ).values('date').annotate(
-        total=Sum('total'),
-        count=Count('id')
-    ).order_by('date')
+    # Closed days come from the nightly rollups, the rest from the sales table
+    sales_data = daily_sales(start_date, end_date)
     
     # Convert to list and format dates
     result = []
-    for item in sales_data:
+    for date, (total, count) in sales_data.items():
         result.append({
-            'date': item['date'].strftime('%Y-%m-%d'),
-            'total': float(item['total'] or 0),
-            'count': item['count']
+            'date': date.strftime('%Y-%m-%d'),
+            'total': float(total or 0),
+            'count': count
         })
-    
-    return Response(result)
+    return result
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@report_grade
+@cached_endpoint('top_products', depends_on=('sales.Sale',))
 def top_products(request):
     limit = int(request.query_params.get('limit', 10))
-    
-    top_products = SaleItem.objects.values(
-        'product__id',
-        'product__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum('total')
-    ).order_by('-total_revenue')[:limit]
-    
-    return Response(list(top_products))
+    return Response(top_products_data(limit))
+
+
+def top_products_data(limit):
+    """
+    Best sellers by revenue over completed sales, net of refunded units and
+    money. Archived sale items count too, so all-time totals survive archiving.
+    """
+    totals = {}
+    for items in (SaleItem.objects.all(), ArchivedSaleItem.objects.all()):
+        _add_product_sales(totals, items.filter(sale__status='completed'))
+    return sorted(totals.values(), key=lambda row: row['total_revenue'], reverse=True)[:limit]
+
+
+def _add_product_sales(totals, items):
+    """Add units and revenue of ``items`` to ``totals`` (by product id)."""
+    for row in items.values('product__id', 'product__name').annotate(
+        total_quantity=Sum(F('quantity') - F('refunded_quantity')),
+        total_revenue=Sum('total'),
+    ).order_by():
+        entry = totals.setdefault(row['product__id'], {**row, 'total_quantity': 0, 'total_revenue': 0})
+        entry['total_quantity'] += row['total_quantity']
+        entry['total_revenue'] += row['total_revenue']
+    # Partly refunded lines are rare; take off exactly what was paid back.
+    for item in items.filter(refunded_quantity__gt=0).only('product_id', 'total', 'quantity', 'refunded_quantity'):
+        totals[item.product_id]['total_revenue'] -= refunded_share(item)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@report_grade
+@cached_endpoint('inventory_summary', depends_on=('inventory.Product',))
 def inventory_summary(request):
-    total_products = Product.objects.filter(is_active=True).count()
-    total_value = Product.objects.filter(is_active=True).aggregate(
-        total=Sum(F('quantity') * F('cost_price'))
-    )['total'] or 0
-    
-    low_stock = [p for p in Product.objects.filter(is_active=True) if p.is_low_stock]
-    low_stock_count = len(low_stock)
+    results = {name: query() for name, query in inventory_queries().items()}
+    return Response(inventory_payload(results))
+
+
+def inventory_queries():
+    active = Product.objects.filter(is_active=True)
+    return {
+        'totals': lambda: active.aggregate(
+            count=Count('id'),
+            value=Sum(F('quantity') * F('cost_price')),
+            # Same test as Product.is_low_stock
+            low_stock=Count('id', filter=Q(quantity__lte=F('reorder_level'))),
+        ),
+        'out_of_stock': lambda: active.filter(quantity=0).count(),
+    }
+
+
+def inventory_payload(results):
+    totals = results['totals']
+    return {
+        'total_products': totals['count'],
+        'total_value': totals['value'] or 0,
+        'low_stock_count': totals['low_stock'],
+        'out_of_stock': results['out_of_stock']
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def stock_alerts(request):
+    """Latest low-stock / expiry snapshot (or the one for ?date=), optionally filtered by ?kind="""
+    try:
+        date = alert_date(request.query_params.get('date'))
+    except ValueError:
+        return Response({'error': ALERT_DATE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(stock_alerts_data(request.query_params.get('kind'), date))
+
+
+ALERT_DATE_ERROR = 'date must be a valid YYYY-MM-DD date'
+
+
+def alert_date(value):
+    """The ``?date=`` of ``stock_alerts``: ``None`` when absent, ``ValueError`` when malformed."""
+    if not value:
+        return None
+    date = parse_date(value)  # Raises ValueError for e.g. 2026-02-30
+    if date is None:
+        raise ValueError(value)
+    return date
+
+
+def stock_alerts_data(kind, date):
+    alerts = StockAlertSnapshot.objects.select_related('product')
+    if kind:
+        alerts = alerts.filter(kind=kind)
     
-    out_of_stock = Product.objects.filter(is_active=True, quantity=0).count()
+    if not date:
+        date = alerts.order_by('-date').values_list('date', flat=True).first()
     
-    return Response({
-        'total_products': total_products,
-        'total_value': total_value,
-        'low_stock_count': low_stock_count,
-        'out_of_stock': out_of_stock
-    })
+    return {
+        'date': date,
+        'alerts': [
+            {
+                'kind': alert.kind,
+                'product_id': alert.product_id,
+                'product_name': alert.product.name,
+                'quantity': alert.quantity,
+                'reorder_level': alert.reorder_level,
+                'expiry_date': alert.expiry_date,
+            }
+            for alert in alerts.filter(date=date)
+        ] if date else [],
+    }
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@report_grade
 def recent_activities(request):
     limit = int(request.query_params.get('limit', 10))
-    
-    # Recent sales
+    results = {name: query() for name, query in recent_activity_queries(limit).items()}
+    return Response(recent_activities_payload(results, limit))
+
+
+def _recent_sales(limit):
     recent_sales = Sale.objects.select_related('customer', 'cashier').order_by('-created_at')[:limit]
-    
-    # Recent stock movements
-    recent_movements = StockMovement.objects.select_related('product', 'created_by').order_by('-created_at')[:limit]
-    
-    # Recent prescriptions
-    recent_prescriptions = Prescription.objects.select_related('customer', 'created_by').order_by('-created_at')[:limit]
-    
-    activities = []
-    
-    for sale in recent_sales:
-        activities.append({
+    return [
+        {
             'type': 'sale',
             'id': sale.id,
             'description': f"Sale {sale.invoice_number}",
             'amount': sale.total,
             'user': sale.cashier.username,
             'created_at': sale.created_at
-        })
-    
-    for movement in recent_movements:
-        activities.append({
+        }
+        for sale in recent_sales
+    ]
+
+
+def _recent_movements(limit):
+    recent_movements = StockMovement.objects.select_related('product', 'created_by').order_by('-created_at')[:limit]
+    return [
+        {
             'type': 'stock_movement',
             'id': movement.id,
             'description': f"{movement.movement_type.upper()} - {movement.product.name}",
             'quantity': movement.quantity,
             'user': movement.created_by.username,
             'created_at': movement.created_at
-        })
-    
-    for prescription in recent_prescriptions:
-        activities.append({
+        }
+        for movement in recent_movements
+    ]
+
+
+def _recent_prescriptions(limit):
+    recent_prescriptions = Prescription.objects.select_related('customer', 'created_by').order_by('-created_at')[:limit]
+    return [
+        {
             'type': 'prescription',
             'id': prescription.id,
             'description': f"Prescription {prescription.prescription_number}",
             'status': prescription.status,
             'user': prescription.created_by.username,
             'created_at': prescription.created_at
-        })
-    
+        }
+        for prescription in recent_prescriptions
+    ]
+
+
+def recent_activity_queries(limit):
+    return {
+        'sales': lambda: _recent_sales(limit),
+        'movements': lambda: _recent_movements(limit),
+        'prescriptions': lambda: _recent_prescriptions(limit),
+    }
+
+
+def recent_activities_payload(results, limit):
+    activities = [*results['sales'], *results['movements'], *results['prescriptions']]
     # Sort by created_at
     activities.sort(key=lambda x: x['created_at'], reverse=True)
-    
-    return Response(activities[:limit])
+    return activities[:limit]
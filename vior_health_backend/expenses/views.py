@@ -6,8 +6,16 @@ from django.db.models import Sum, Count
 from django.db.models.functions import TruncMonth, TruncDate
 from django.utils import timezone
 from datetime import datetime, timedelta
+from accounts.policies import PolicyPermission, allows, scope_key, scoped
 from .models import Expense, ExpenseCategory
 from .serializers import ExpenseSerializer, ExpenseCategorySerializer
+from vior_health_backend.routers import report_grade
+from analytics.cache import cached_endpoint
+
+
+def expense_scope(request):
+    """Admins and staff see every expense, everyone else only their own."""
+    return scope_key(request.user, 'expenses')
 
 
 class ExpenseCategoryViewSet(viewsets.ModelViewSet):
@@ -22,17 +30,18 @@ class ExpenseCategoryViewSet(viewsets.ModelViewSet):
 class ExpenseViewSet(viewsets.ModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, PolicyPermission]
+    policy_actions = {
+        'approve': ('expenses', 'approve', 'Only administrators can approve expenses'),
+        'unapprove': ('expenses', 'approve', 'Only administrators can unapprove expenses'),
+    }
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['category', 'description', 'reference_number']
     ordering_fields = ['expense_date', 'amount', 'created_at']
 
     def get_queryset(self):
-        queryset = Expense.objects.all()
-        
         # Non-admin users can only see their own expenses
-        if not self.request.user.is_staff and self.request.user.role != 'admin':
-            queryset = queryset.filter(created_by=self.request.user)
+        queryset = scoped(Expense.objects.all(), self.request.user, 'expenses')
         
         # Filter by category
         category = self.request.query_params.get('category', None)
@@ -60,7 +69,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Admin can edit any expense
-        if user.is_staff or user.role == 'admin':
+        if allows(user, 'expenses', 'manage_any'):
             return super().update(request, *args, **kwargs)
         
         # Non-admin can only edit their own unapproved expenses
@@ -84,7 +93,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Admin can delete any expense
-        if user.is_staff or user.role == 'admin':
+        if allows(user, 'expenses', 'manage_any'):
             return super().destroy(request, *args, **kwargs)
         
         # Non-admin can only delete their own unapproved expenses
@@ -106,13 +115,6 @@ class ExpenseViewSet(viewsets.ModelViewSet):
     def approve(self, request, pk=None):
         """Approve an expense (admin only)"""
         user = request.user
-        
-        if not (user.is_staff or user.role == 'admin'):
-            return Response(
-                {'error': 'Only administrators can approve expenses'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         expense = self.get_object()
         expense.is_approved = True
         expense.approved_by = user
@@ -125,14 +127,6 @@ class ExpenseViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def unapprove(self, request, pk=None):
         """Unapprove an expense (admin only)"""
-        user = request.user
-        
-        if not (user.is_staff or user.role == 'admin'):
-            return Response(
-                {'error': 'Only administrators can unapprove expenses'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         expense = self.get_object()
         expense.is_approved = False
         expense.approved_by = None
@@ -143,6 +137,8 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @report_grade
+    @cached_endpoint('expense_summary', depends_on=('expenses.Expense',), scope=expense_scope)
     def summary(self, request):
         """Get expense summary statistics"""
         today = datetime.now().date()
@@ -150,9 +146,7 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         year_start = today.replace(month=1, day=1)
         
         # Filter by user if not admin
-        queryset = Expense.objects.all()
-        if not request.user.is_staff and request.user.role != 'admin':
-            queryset = queryset.filter(created_by=request.user)
+        queryset = scoped(Expense.objects.all(), request.user, 'expenses')
         
         # Total expenses
         total_expenses = queryset.aggregate(total=Sum('amount'))['total'] or 0
@@ -195,17 +189,14 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @report_grade
     def by_category(self, request):
-        
-        # Filter by user if not admin
-        if not request.user.is_staff and request.user.role != 'admin':
-            queryset = queryset.filter(created_by=request.user)
-        
         """Get expenses grouped by category"""
         start_date = request.query_params.get('start_date', None)
         end_date = request.query_params.get('end_date', None)
         
-        queryset = Expense.objects.all()
+        # Filter by user if not admin
+        queryset = scoped(Expense.objects.all(), request.user, 'expenses')
         if start_date:
             queryset = queryset.filter(expense_date__gte=start_date)
         if end_date:
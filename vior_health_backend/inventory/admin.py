@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Supplier, Product, StockMovement
+from .models import ArchivedStockMovement, Category, Supplier, Product, StockMovement
 
 
 @admin.register(Category)
@@ -51,3 +51,14 @@ class StockMovementAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'reference_number')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
+
+
+@admin.register(ArchivedStockMovement)
+class ArchivedStockMovementAdmin(admin.ModelAdmin):
+    list_display = ('product', 'movement_type', 'quantity', 'reference_number', 'created_at', 'archived_at')
+    list_filter = ('movement_type',)
+    search_fields = ('product__name', 'reference_number')
+    ordering = ('-created_at',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
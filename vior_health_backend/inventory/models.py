@@ -109,3 +109,26 @@ class StockMovement(models.Model):
     
     def __str__(self):
         return f"{self.product.name} - {self.get_movement_type_display()} - {self.quantity}"
+
+
+class ArchivedStockMovement(models.Model):
+    """
+    Stock movement moved out of the hot ``stock_movements`` table by
+    ``manage.py archive_sales``. Keeps the original id
+    """
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MOVEMENT_TYPES)
+    quantity = models.IntegerField()
+    reference_number = models.CharField(max_length=50, blank=True)
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_movements_archive'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.product.name} - {self.get_movement_type_display()} - {self.quantity}"
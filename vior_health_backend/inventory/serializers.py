@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Category, Supplier, Product, StockMovement
+from .models import ArchivedStockMovement, Category, Supplier, Product, StockMovement
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -40,12 +40,16 @@ class ProductSerializer(serializers.ModelSerializer):
 class StockMovementSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+    archived = serializers.SerializerMethodField()
 
     class Meta:
         model = StockMovement
         fields = '__all__'
         read_only_fields = ['created_at']
 
+    def get_archived(self, obj):
+        return isinstance(obj, ArchivedStockMovement)
+
 
 class ProductStockUpdateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(required=True)
@@ -3,11 +3,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
-from .models import Category, Supplier, Product, StockMovement
+from .models import ArchivedStockMovement, Category, Supplier, Product, StockMovement
 from .serializers import (
     CategorySerializer, SupplierSerializer, ProductSerializer, 
     StockMovementSerializer, ProductStockUpdateSerializer
 )
+from sales.idempotency import idempotent
+from vior_health_backend.archive import IncludeArchivedMixin
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -62,6 +64,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def update_stock(self, request, pk=None):
         product = self.get_object()
         serializer = ProductStockUpdateSerializer(data=request.data)
@@ -100,13 +103,13 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
+class StockMovementViewSet(IncludeArchivedMixin, viewsets.ReadOnlyModelViewSet):
     queryset = StockMovement.objects.select_related('product', 'created_by').all()
+    archive_queryset = ArchivedStockMovement.objects.select_related('product', 'created_by')
     serializer_class = StockMovementSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    def filter_rows(self, queryset):
         product_id = self.request.query_params.get('product', None)
         if product_id:
             queryset = queryset.filter(product_id=product_id)
@@ -0,0 +1,37 @@
+from django.contrib import admin
+from .models import Job, JobLock, ScheduledTask
+from .queue import enqueue
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'task', 'created_at']
+    search_fields = ['task', 'unique_key']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at']
+
+
+@admin.register(JobLock)
+class JobLockAdmin(admin.ModelAdmin):
+    list_display = ['name', 'owner', 'expires_at']
+
+
+@admin.register(ScheduledTask)
+class ScheduledTaskAdmin(admin.ModelAdmin):
+    list_display = ['name', 'task', 'cron', 'enabled', 'next_run_at', 'last_run_at', 'last_job']
+    list_filter = ['enabled', 'task']
+    search_fields = ['name', 'task']
+    readonly_fields = ['next_run_at', 'last_run_at', 'last_job', 'created_at', 'updated_at']
+    actions = ['run_now']
+
+    def save_model(self, request, obj, form, change):
+        if {'cron', 'enabled'} & set(form.changed_data):
+            obj.next_run_at = None  # recomputed from the new schedule on save
+        super().save_model(request, obj, form, change)
+
+    @admin.action(description='Run selected tasks now')
+    def run_now(self, request, queryset):
+        for scheduled in queryset:
+            enqueue(scheduled.task, args=scheduled.args, kwargs=scheduled.kwargs,
+                    priority=scheduled.priority, created_by=request.user, unique=True)
+        self.message_user(request, f'Queued {queryset.count()} tasks.')
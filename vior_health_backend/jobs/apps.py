@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        from .scheduler import ensure_default_schedules
+
+        # Task functions register themselves when each app's tasks.py is imported.
+        autodiscover_modules('tasks')
+        post_migrate.connect(ensure_default_schedules, sender=self)
@@ -0,0 +1,200 @@
+"""
+Online SQLite backups.
+
+``create_backup`` copies the live database with SQLite's backup API in steps
+of ``BACKUP_PAGES_PER_STEP`` pages. The source connection holds one read
+transaction for the whole copy. In WAL mode that pins a consistent snapshot
+while tills keep writing, so the copy never restarts because of a concurrent
+commit, and writers are never blocked. The copy is checked with
+``PRAGMA integrity_check``, gzipped and stored as
+``BACKUP_DIR/<prefix>-YYYYmmdd-HHMMSS.sqlite3.gz``.
+
+``prune_backups`` keeps the newest ``BACKUP_KEEP_LAST`` files, plus the newest
+file of each of the last ``BACKUP_KEEP_DAILY`` days, ``BACKUP_KEEP_WEEKLY``
+weeks and ``BACKUP_KEEP_MONTHLY`` months.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.sqlite3.gz'
+TIMESTAMP = '%Y%m%d-%H%M%S'
+
+
+class BackupError(Exception):
+    pass
+
+
+def database_path():
+    db = settings.DATABASES['default']
+    if db['ENGINE'] != 'django.db.backends.sqlite3':
+        raise BackupError('Online backups are only supported for SQLite; use pg_dump for PostgreSQL')
+    return Path(db['NAME'])
+
+
+def backup_dir():
+    return Path(settings.BACKUP_DIR or database_path().parent / 'backups')
+
+
+def _prefix(database):
+    return f'{Path(database or database_path()).stem}-'
+
+
+def integrity_check(path):
+    conn = sqlite3.connect(path)
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    except sqlite3.DatabaseError as e:
+        problems = [str(e)]
+    finally:
+        conn.close()
+    if problems != ['ok']:
+        raise BackupError(f'{path} failed integrity_check: {"; ".join(problems[:5])}')
+
+
+def _copy(source, target, pages, progress=None):
+    """Backup API copy from the ``source`` connection into a new database file."""
+    destination = sqlite3.connect(target)
+    try:
+        source.backup(
+            destination, pages=pages, sleep=settings.BACKUP_STEP_SLEEP,
+            progress=progress and (lambda status, remaining, total: progress(total - remaining, total)),
+        )
+    finally:
+        destination.close()
+
+
+def _gzip(source, target):
+    digest = hashlib.sha256()
+    with open(source, 'rb') as raw, gzip.open(target, 'wb', compresslevel=6) as packed:
+        for chunk in iter(lambda: raw.read(1024 * 1024), b''):
+            digest.update(chunk)
+            packed.write(chunk)
+    return digest.hexdigest()
+
+
+def create_backup(directory=None, pages=None, progress=None, database=None):
+    """
+    Back up the live database. Returns ``(path, sha256 of the uncompressed copy)``.
+    ``progress(copied_pages, total_pages)`` is called after every step.
+    """
+    source_path = Path(database or database_path())
+    directory = Path(directory or backup_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime(TIMESTAMP)
+    target = directory / f'{_prefix(source_path)}{stamp}{SUFFIX}'
+    partial = directory / f'.{target.name}.partial'
+    copy = directory / f'.{target.stem}.copy'
+
+    started = time.monotonic()
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    try:
+        # Read transaction for the whole copy: a fixed snapshot under WAL.
+        source.execute('BEGIN')
+        source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        _copy(source, copy, pages or settings.BACKUP_PAGES_PER_STEP, progress)
+        source.execute('COMMIT')
+    finally:
+        source.close()
+
+    try:
+        integrity_check(copy)
+        sha256 = _gzip(copy, partial)
+        os.replace(partial, target)
+    finally:
+        for leftover in (copy, partial):
+            leftover.unlink(missing_ok=True)
+
+    logger.info('Backed up %s to %s in %.1fs', source_path, target, time.monotonic() - started)
+    return target, sha256
+
+
+def list_backups(directory=None, database=None):
+    """``[(taken_at, path)]`` for this database's backups, newest first."""
+    directory = Path(directory or backup_dir())
+    prefix = _prefix(database)
+    backups = []
+    for path in directory.glob(f'{prefix}*{SUFFIX}'):
+        try:
+            taken_at = datetime.strptime(path.name[len(prefix):-len(SUFFIX)], TIMESTAMP)
+        except ValueError:
+            continue
+        backups.append((taken_at, path))
+    return sorted(backups, reverse=True)
+
+
+def backups_to_keep(taken, keep_last, keep_daily, keep_weekly, keep_monthly):
+    """Which of the ``taken`` datetimes (newest first) the retention rules keep."""
+    keep = set(taken[:keep_last])
+    for count, period in (
+        (keep_daily, lambda t: t.date()),
+        (keep_weekly, lambda t: t.isocalendar()[:2]),
+        (keep_monthly, lambda t: (t.year, t.month)),
+    ):
+        seen = []
+        for taken_at in taken:
+            key = period(taken_at)
+            if key not in seen:
+                seen.append(key)
+                if len(seen) > count:
+                    break
+                keep.add(taken_at)
+    return keep
+
+
+def prune_backups(directory=None, database=None):
+    """Delete backups outside the retention rules. Returns the deleted paths."""
+    backups = list_backups(directory, database)
+    keep = backups_to_keep(
+        [taken_at for taken_at, _ in backups],
+        settings.BACKUP_KEEP_LAST, settings.BACKUP_KEEP_DAILY,
+        settings.BACKUP_KEEP_WEEKLY, settings.BACKUP_KEEP_MONTHLY,
+    )
+    deleted = []
+    for taken_at, path in backups:
+        if taken_at not in keep:
+            path.unlink(missing_ok=True)
+            deleted.append(path)
+    return deleted
+
+
+def restore_backup(path, database=None):
+    """
+    Replace the live database's contents with ``path`` (a ``.gz`` backup or a
+    plain SQLite file), after checking its integrity. The copy goes through
+    the backup API into the open database, so WAL and -shm files stay valid.
+    """
+    path = Path(path)
+    target_path = Path(database or database_path())
+    unpacked = target_path.with_name(f'.{target_path.name}.restore')
+    try:
+        if path.suffix == '.gz':
+            with gzip.open(path, 'rb') as packed, open(unpacked, 'wb') as raw:
+                shutil.copyfileobj(packed, raw, 1024 * 1024)
+        else:
+            shutil.copyfile(path, unpacked)
+        integrity_check(unpacked)
+
+        if database is None:
+            connections['default'].close()
+        source = sqlite3.connect(unpacked)
+        destination = sqlite3.connect(target_path, timeout=30)
+        try:
+            source.backup(destination)
+        finally:
+            destination.close()
+            source.close()
+    finally:
+        unpacked.unlink(missing_ok=True)
+    integrity_check(target_path)
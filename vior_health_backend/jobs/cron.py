@@ -0,0 +1,123 @@
+"""
+Five-field cron expressions: ``minute hour day-of-month month day-of-week``.
+
+Fields accept ``*``, numbers, ranges (``1-5``), steps (``*/15``, ``0-30/10``),
+lists (``1,15``) and month/weekday names. Sunday is 0 or 7. As in cron, when
+both day fields are restricted a day matches if either does. The aliases
+``@hourly``, ``@daily``/``@midnight``, ``@weekly``, ``@monthly`` and
+``@yearly`` are also accepted. Times are evaluated in ``TIME_ZONE``.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+}
+
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+WEEKDAYS = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+# (low, high, names) per field
+FIELDS = (
+    (0, 59, None),
+    (0, 23, None),
+    (1, 31, None),
+    (1, 12, MONTHS),
+    (0, 7, WEEKDAYS),
+)
+
+# Give up looking for a matching time after this many days (e.g. "0 0 30 2 *").
+SEARCH_DAYS = 366 * 5
+
+
+class CronError(ValueError):
+    pass
+
+
+def _value(token, low, high, names):
+    if names and token.lower() in names:
+        return names.index(token.lower()) + low
+    try:
+        value = int(token)
+    except ValueError:
+        raise CronError(f'Invalid value {token!r}')
+    if not low <= value <= high:
+        raise CronError(f'{value} is outside {low}-{high}')
+    return value
+
+
+def _parse_field(text, low, high, names):
+    values = set()
+    for part in text.split(','):
+        step = 1
+        if '/' in part:
+            part, step_text = part.split('/', 1)
+            step = _value(step_text, 1, high - low + 1, None)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_text, end_text = part.split('-', 1)
+            start, end = _value(start_text, low, high, names), _value(end_text, low, high, names)
+            if start > end:
+                raise CronError(f'Invalid range {part!r}')
+        else:
+            start = _value(part, low, high, names)
+            end = high if step > 1 else start
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip().lower(), expression).split()
+        if len(fields) != 5:
+            raise CronError('Expected 5 fields: minute hour day-of-month month day-of-week')
+        parsed = [_parse_field(text, *spec) for text, spec in zip(fields, FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = [sorted(v) for v in parsed]
+        # Cron counts Sunday as 0 (or 7); Python's weekday() has Monday = 0.
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def _day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_month = day.day in self.days
+        in_week = day.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, after):
+        """First matching time strictly after ``after`` (an aware datetime)."""
+        tz = timezone.get_current_timezone()
+        start = timezone.localtime(after, tz).replace(tzinfo=None, second=0, microsecond=0)
+        start += timedelta(minutes=1)
+
+        day = start.replace(hour=0, minute=0)
+        for _ in range(SEARCH_DAYS):
+            if self._day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = day.replace(hour=hour, minute=minute)
+                        if candidate >= start:
+                            return timezone.make_aware(candidate, tz)
+            day += timedelta(days=1)
+        raise CronError(f'{self.expression!r} never matches')
+
+
+def validate(expression):
+    CronSchedule(expression).next_after(timezone.now())
+
+
+def next_run(expression, after=None):
+    return CronSchedule(expression).next_after(after or timezone.now())
+
@@ -0,0 +1,54 @@
+"""
+Lease locks stored in the ``job_locks`` table.
+
+A lock is a row naming its owner and an expiry time. Acquiring succeeds when
+the row does not exist, has expired, or already belongs to the caller, so a
+crashed holder blocks others for at most ``ttl`` seconds.
+"""
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import JobLock
+
+
+def acquire(name, owner, ttl=30):
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    taken = JobLock.objects.filter(name=name).filter(
+        Q(expires_at__lte=now) | Q(owner=owner)
+    ).update(owner=owner, expires_at=expires_at)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            JobLock.objects.create(name=name, owner=owner, expires_at=expires_at)
+    except IntegrityError:
+        return False
+    return True
+
+
+def release(name, owner):
+    JobLock.objects.filter(name=name, owner=owner).delete()
+
+
+@contextmanager
+def lock(name, owner, ttl=30, wait=0.0, poll=0.05):
+    """
+    Hold ``name`` for the duration of the block, waiting up to ``wait``
+    seconds for it. Yields whether the lock was acquired.
+    """
+    deadline = time.monotonic() + wait
+    acquired = acquire(name, owner, ttl)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(poll)
+        acquired = acquire(name, owner, ttl)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            release(name, owner)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.backup import BackupError, create_backup, prune_backups
+
+
+class Command(BaseCommand):
+    help = 'Back up the SQLite database while the application keeps running'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Backup directory (default: BACKUP_DIR)')
+        parser.add_argument('--pages', type=int, help='Pages copied per step (default: BACKUP_PAGES_PER_STEP)')
+        parser.add_argument('--no-prune', action='store_true', help='Keep all existing backups')
+
+    def handle(self, *args, **options):
+        def progress(copied, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'\r{copied}/{total} pages', ending='')
+
+        try:
+            path, sha256 = create_backup(directory=options['dir'], pages=options['pages'], progress=progress)
+        except (BackupError, OSError) as e:
+            raise CommandError(str(e))
+        if options['verbosity'] > 1:
+            self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Backed up to {path} ({path.stat().st_size / 1024 / 1024:.1f} MB, sha256 {sha256[:12]})'
+        ))
+
+        if not options['no_prune']:
+            for deleted in prune_backups(directory=options['dir']):
+                self.stdout.write(f'Removed {deleted.name}')
@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.backup import BackupError, create_backup, database_path, list_backups, restore_backup
+
+
+class Command(BaseCommand):
+    help = 'Restore the SQLite database from a backup made with manage.py backup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help='Backup file (.sqlite3.gz or .sqlite3)')
+        parser.add_argument('--latest', action='store_true', help='Restore the newest backup in BACKUP_DIR')
+        parser.add_argument('--dir', help='Backup directory used by --latest and the safety backup')
+        parser.add_argument('--no-safety-backup', action='store_true',
+                            help='Do not back up the current database first')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+
+    def handle(self, *args, **options):
+        try:
+            path = options['path']
+            if options['latest']:
+                backups = list_backups(options['dir'])
+                if not backups:
+                    raise CommandError('No backups found')
+                path = backups[0][1]
+            if not path:
+                raise CommandError('Give a backup file or --latest')
+
+            target = database_path()
+            if options['interactive']:
+                answer = input(
+                    f'This replaces all data in {target} with {path}. '
+                    'Stop the server and worker first. Type "yes" to continue: '
+                )
+                if answer != 'yes':
+                    raise CommandError('Restore cancelled')
+
+            if not options['no_safety_backup']:
+                safety, _ = create_backup(directory=options['dir'])
+                self.stdout.write(f'Current database saved to {safety}')
+
+            restore_backup(path)
+        except (BackupError, OSError) as e:
+            raise CommandError(str(e))
+
+        # Cached dashboards and settings describe the old data.
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(f'Restored {target} from {path}'))
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import registered_tasks
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+                            help='Jobs run in parallel')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Run jobs in threads (default) or separate processes')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help='Seconds between polls when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no jobs are due instead of waiting for more')
+        parser.add_argument('--no-scheduler', action='store_true',
+                            help='Do not queue periodic tasks from this worker')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrency=options['concurrency'],
+            mode=options['mode'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+            scheduler=not options['no_scheduler'],
+        )
+        self.stdout.write(
+            f'Worker {worker.worker_id}: {options["mode"]} x{options["concurrency"]}, '
+            f'tasks: {", ".join(registered_tasks()) or "none"}'
+        )
+        processed = worker.run()
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
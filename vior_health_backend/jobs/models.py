@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    A unit of background work, executed by ``manage.py run_worker``
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    )
+
+    task = models.CharField(max_length=100, help_text="Registered task name")
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    unique_key = models.CharField(max_length=255, blank=True, db_index=True,
+                                  help_text="Set for jobs that must not be queued twice")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0, help_text="Higher runs first")
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not run before this time")
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+
+    # Lease held by the worker running the job, refreshed while it runs
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    last_error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class JobLock(models.Model):
+    """
+    Named lease lock. Used where the database has no row-level locking
+    (SQLite) and for work only one worker may do at a time
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'job_locks'
+
+    def __str__(self):
+        return f"{self.name} ({self.owner})"
+
+
+class ScheduledTask(models.Model):
+    """
+    A task queued on a cron schedule by the worker's scheduler
+    """
+    name = models.CharField(max_length=100, unique=True)
+    task = models.CharField(max_length=100, help_text="Registered task name")
+    args = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    kwargs = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    cron = models.CharField(max_length=100, help_text="minute hour day-of-month month day-of-week, in TIME_ZONE")
+    priority = models.IntegerField(default=-5)
+    enabled = models.BooleanField(default=True)
+
+    next_run_at = models.DateTimeField(null=True, blank=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'scheduled_tasks'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.cron})"
+
+    def clean(self):
+        from .cron import CronError, validate
+        from .queue import registered_tasks
+
+        try:
+            validate(self.cron)
+        except CronError as e:
+            raise ValidationError({'cron': str(e)})
+        if self.task not in registered_tasks():
+            raise ValidationError({'task': f'Unknown task {self.task!r}'})
+
+    def save(self, *args, **kwargs):
+        if self.enabled and self.next_run_at is None:
+            from .cron import next_run
+            self.next_run_at = next_run(self.cron)
+        super().save(*args, **kwargs)
@@ -0,0 +1,16 @@
+"""
+Entry points for ``run_worker --mode process``.
+
+A spawned child unpickles these before Django is set up, so this module must
+not import models at import time.
+"""
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def execute_job(job_id):
+    from .queue import execute_job
+    return execute_job(job_id)
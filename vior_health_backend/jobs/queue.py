@@ -0,0 +1,223 @@
+"""
+Database-backed job queue.
+
+Tasks are plain functions registered with ``@task`` in an app's ``tasks.py``.
+``enqueue`` stores a ``Job`` row in the caller's transaction, so a job only
+becomes visible to workers once the data it refers to is committed.
+
+Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it (PostgreSQL). SQLite has no row locks, so claims are
+serialised through the ``job_locks`` table instead and guarded by a
+compare-and-set on the job status.
+"""
+import json
+import logging
+import random
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from vior_health_backend.metrics import JOB_DURATION, JOBS
+
+from . import locks
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_LOCK = 'jobs.claim'
+
+_tasks = {}
+
+
+def task(name=None, max_attempts=None):
+    """Register a function as a job task under ``name`` (default: module.function)."""
+    def decorator(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        _tasks[func.task_name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _tasks[name]
+
+
+def registered_tasks():
+    return sorted(_tasks)
+
+
+def enqueue(task, args=(), kwargs=None, priority=0, delay=0, max_attempts=None,
+            created_by=None, unique=False):
+    """
+    Queue ``task`` (a registered function or its name) and return the Job.
+
+    With ``unique=True`` an identical job that has not started yet is returned
+    instead of adding a duplicate. A running one does not count, as it may
+    have read data from before the change that triggered this call.
+    """
+    name = task if isinstance(task, str) else task.task_name
+    func = get_task(name)
+    args, kwargs = list(args), kwargs or {}
+
+    unique_key = ''
+    if unique:
+        unique_key = f'{name}:' + json.dumps([args, kwargs], cls=DjangoJSONEncoder, sort_keys=True)
+        unique_key = unique_key[:255]
+        existing = Job.objects.filter(unique_key=unique_key, status='queued').first()
+        if existing:
+            return existing
+
+    job = Job.objects.create(
+        task=name,
+        args=args,
+        kwargs=kwargs,
+        unique_key=unique_key,
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or func.max_attempts or settings.JOB_MAX_ATTEMPTS,
+        created_by=created_by,
+    )
+    if settings.JOBS_RUN_INLINE and not delay:
+        # No worker (tests, single-process installs): run after commit instead.
+        transaction.on_commit(lambda: _run_inline(job.pk))
+    return job
+
+
+def _run_inline(job_id):
+    now = timezone.now()
+    claimed = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by='inline', locked_at=now, started_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        run_job(job_id)
+
+
+def claim_jobs(worker_id, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker_id`` and return their ids."""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id')
+    claim = {
+        'status': 'running', 'locked_by': worker_id, 'locked_at': now, 'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(pk__in=ids).update(**claim)
+        return ids
+
+    if not locks.acquire(CLAIM_LOCK, worker_id, ttl=30):
+        return []
+    try:
+        ids = list(due.values_list('id', flat=True)[:limit])
+        # Compare-and-set on status: a job cancelled in between is skipped.
+        Job.objects.filter(pk__in=ids, status='queued').update(**claim)
+        return list(
+            Job.objects.filter(pk__in=ids, status='running', locked_by=worker_id, locked_at=now)
+            .values_list('id', flat=True)
+        )
+    finally:
+        locks.release(CLAIM_LOCK, worker_id)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: base, 2x base, 4x base ... capped."""
+    base = settings.JOB_RETRY_BACKOFF
+    delay = min(settings.JOB_RETRY_BACKOFF_MAX, base * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _jsonable(value):
+    try:
+        json.dumps(value, cls=DjangoJSONEncoder)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def run_job(job_id):
+    """Execute a claimed job and record the outcome (success, retry or failure)."""
+    job = Job.objects.get(pk=job_id)
+    owned = Job.objects.filter(pk=job_id, status='running', locked_by=job.locked_by)
+    func = _tasks.get(job.task)
+    if func is None:
+        owned.update(status='failed', finished_at=timezone.now(), locked_by='', locked_at=None,
+                     last_error=f'Unknown task {job.task!r}')
+        JOBS.inc(task=job.task, status='failed')
+        return False
+
+    started = time.perf_counter()
+    try:
+        result = func(*job.args, **job.kwargs)
+    except Exception as e:
+        JOB_DURATION.observe(time.perf_counter() - started, task=job.task)
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            owned.update(status='queued', run_at=now + timedelta(seconds=delay),
+                         locked_by='', locked_at=None, last_error=error)
+            JOBS.inc(task=job.task, status='retried')
+            logger.warning('Job %s (%s) failed, retrying in %.0fs: %s', job_id, job.task, delay, e)
+        else:
+            owned.update(status='failed', finished_at=now, locked_by='', locked_at=None, last_error=error)
+            JOBS.inc(task=job.task, status='failed')
+            logger.error('Job %s (%s) failed permanently: %s', job_id, job.task, e)
+        return False
+
+    JOB_DURATION.observe(time.perf_counter() - started, task=job.task)
+    owned.update(status='succeeded', result=_jsonable(result), finished_at=timezone.now(),
+                 locked_by='', locked_at=None, last_error='')
+    JOBS.inc(task=job.task, status='succeeded')
+    return True
+
+
+def execute_job(job_id):
+    """Pool entry point: run one job with request-style connection handling."""
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def heartbeat(worker_id, job_ids):
+    """Extend the lease on jobs this worker is still running."""
+    if job_ids:
+        Job.objects.filter(pk__in=list(job_ids), locked_by=worker_id, status='running').update(
+            locked_at=timezone.now(),
+        )
+
+
+def release_job(job_id, worker_id, error):
+    """Return a job whose execution was lost (e.g. a crashed pool process) to the queue."""
+    job = Job.objects.filter(pk=job_id, locked_by=worker_id, status='running')
+    now = timezone.now()
+    job.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None, last_error=error,
+    )
+    job.update(status='queued', run_at=now, locked_by='', locked_at=None, last_error=error)
+
+
+def requeue_stale(lease_seconds=None):
+    """Return jobs whose worker stopped heart-beating to the queue (or fail them)."""
+    lease_seconds = lease_seconds or settings.JOB_LEASE_SECONDS
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=lease_seconds))
+    error = 'Worker stopped responding while running this job'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None, last_error=error,
+    )
+    requeued = stale.update(status='queued', run_at=now, locked_by='', locked_at=None, last_error=error)
+    return requeued, failed
@@ -0,0 +1,86 @@
+"""
+Periodic tasks.
+
+``ScheduledTask`` rows pair a registered task with a cron expression. Every
+``run_worker`` process checks for due schedules every
+``JOB_SCHEDULER_INTERVAL`` seconds and turns them into ordinary jobs.
+
+With several workers running, each schedule still fires once: the check runs
+under the ``jobs.scheduler`` lease lock, and each schedule is advanced with a
+compare-and-set on ``next_run_at`` in the same transaction that queues its
+job. A schedule missed while no worker was running fires once on start-up,
+not once per missed slot.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import locks
+from .cron import CronError, next_run
+from .models import ScheduledTask
+from .queue import enqueue, registered_tasks
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LOCK = 'jobs.scheduler'
+
+DEFAULT_SCHEDULES = {
+    'sales-rollups': {
+        'task': 'analytics.rebuild_sales_rollups', 'cron': '10 0 * * *', 'kwargs': {'days': 7},
+    },
+    'low-stock-snapshot': {'task': 'analytics.snapshot_low_stock', 'cron': '0 6 * * *'},
+    'expiry-scan': {
+        'task': 'analytics.snapshot_expiring_stock', 'cron': '5 6 * * *', 'kwargs': {'within_days': 90},
+    },
+    'optimize-database': {'task': 'jobs.optimize_database', 'cron': '30 2 * * *'},
+    'vacuum-database': {'task': 'jobs.vacuum_database', 'cron': '0 3 * * 0'},
+    'backup-database': {'task': 'jobs.backup_database', 'cron': '0 */6 * * *'},
+    # Off by default: archived rows only show with ?include_archived=true.
+    'archive-sales': {'task': 'sales.archive', 'cron': '30 3 2 * *', 'enabled': False},
+    'purge-jobs': {'task': 'jobs.purge_jobs', 'cron': '45 2 * * *', 'kwargs': {'older_than_days': 30}},
+    'purge-idempotency-keys': {'task': 'sales.purge_idempotency_keys', 'cron': '50 2 * * *'},
+}
+
+
+def ensure_default_schedules(using='default', **kwargs):
+    """Create any missing default schedule. Existing (possibly edited) rows are left alone."""
+    for name, spec in DEFAULT_SCHEDULES.items():
+        if not ScheduledTask.objects.using(using).filter(name=name).exists():
+            ScheduledTask(name=name, **spec).save(using=using)
+
+
+def run_due_tasks(owner, now=None):
+    """Queue a job for every schedule that is due. Returns the queued jobs."""
+    now = now or timezone.now()
+    if not locks.acquire(SCHEDULER_LOCK, owner, ttl=60):
+        return []
+    try:
+        queued = []
+        for scheduled in ScheduledTask.objects.filter(enabled=True, next_run_at__lte=now):
+            try:
+                following = next_run(scheduled.cron, now)
+            except CronError as e:
+                logger.error('Schedule %s has an invalid cron expression: %s', scheduled.name, e)
+                continue
+
+            with transaction.atomic():
+                advanced = ScheduledTask.objects.filter(
+                    pk=scheduled.pk, next_run_at=scheduled.next_run_at,
+                ).update(next_run_at=following, last_run_at=now)
+                if not advanced:
+                    continue
+                if scheduled.task not in registered_tasks():
+                    logger.error('Schedule %s refers to unknown task %s', scheduled.name, scheduled.task)
+                    continue
+                # unique: a run still waiting in the queue is not queued again.
+                job = enqueue(
+                    scheduled.task, args=scheduled.args, kwargs=scheduled.kwargs,
+                    priority=scheduled.priority, unique=True,
+                )
+                ScheduledTask.objects.filter(pk=scheduled.pk).update(last_job=job)
+            logger.info('Queued %s as job %s', scheduled.name, job.pk)
+            queued.append(job)
+        return queued
+    finally:
+        locks.release(SCHEDULER_LOCK, owner)
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.username', read_only=True)
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'task', 'args', 'kwargs', 'status', 'priority', 'run_at',
+            'attempts', 'max_attempts', 'result', 'last_error',
+            'created_by', 'created_by_name', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
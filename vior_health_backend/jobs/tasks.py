@@ -0,0 +1,62 @@
+"""
+Database maintenance tasks, run on the default schedules (see ``jobs.scheduler``).
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from . import backup
+from .models import Job, JobLock
+from .queue import task
+
+
+@task('jobs.optimize_database', max_attempts=1)
+def optimize_database():
+    """Refresh planner statistics: ``PRAGMA optimize`` on SQLite, ``ANALYZE`` elsewhere."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Analyzes only tables whose statistics are missing or stale.
+            cursor.execute('PRAGMA analysis_limit = 1000')
+            cursor.execute('PRAGMA optimize')
+        else:
+            cursor.execute('ANALYZE')
+    return {'vendor': connection.vendor}
+
+
+@task('jobs.vacuum_database', max_attempts=1)
+def vacuum_database():
+    """
+    Rebuild the database file to reclaim space left by deleted rows. Blocks
+    writers while it runs, so it is scheduled for a quiet hour.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('VACUUM')
+            cursor.execute('ANALYZE')
+            # Hand the pages copied through the WAL back to the filesystem.
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        elif connection.vendor == 'postgresql':
+            cursor.execute('VACUUM (ANALYZE)')
+    return {'vendor': connection.vendor}
+
+
+@task('jobs.purge_jobs')
+def purge_jobs(older_than_days=30):
+    """Delete finished jobs and expired locks older than ``older_than_days``."""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = Job.objects.filter(
+        status__in=['succeeded', 'failed', 'cancelled'], finished_at__lt=cutoff,
+    ).delete()
+    JobLock.objects.filter(expires_at__lt=cutoff).delete()
+    return {'deleted': deleted}
+
+
+@task('jobs.backup_database', max_attempts=2)
+def backup_database():
+    """Online backup of the SQLite database, then rotation of old backups."""
+    if connection.vendor != 'sqlite':
+        return {'skipped': f'{connection.vendor} databases are backed up with their own tools'}
+    path, sha256 = backup.create_backup()
+    pruned = backup.prune_backups()
+    return {'path': str(path), 'size': path.stat().st_size, 'sha256': sha256, 'pruned': len(pruned)}
@@ -0,0 +1,297 @@
+import gzip
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+
+from . import backup, locks
+from .cron import CronError, CronSchedule
+from .models import Job, ScheduledTask
+from .queue import claim_jobs, enqueue, requeue_stale, run_job, task
+from .scheduler import DEFAULT_SCHEDULES, SCHEDULER_LOCK, run_due_tasks
+from .worker import Worker
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value):
+    calls.append(value)
+    return {'value': value}
+
+
+@task('jobs.tests.flaky', max_attempts=2)
+def flaky():
+    raise ValueError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_marks_jobs_running_in_priority_order(self):
+        low = enqueue(record, args=[1])
+        high = enqueue(record, args=[2], priority=5)
+        enqueue(record, args=[3], delay=60)
+
+        self.assertEqual(claim_jobs('w1', limit=5), [high.pk, low.pk])
+        self.assertEqual(claim_jobs('w2', limit=5), [])
+        high.refresh_from_db()
+        self.assertEqual((high.status, high.locked_by, high.attempts), ('running', 'w1', 1))
+
+    def test_claim_waits_for_lock_holder(self):
+        enqueue(record, args=[1])
+        self.assertTrue(locks.acquire('jobs.claim', 'other-worker'))
+        self.assertEqual(claim_jobs('w1'), [])
+        locks.release('jobs.claim', 'other-worker')
+        self.assertEqual(len(claim_jobs('w1')), 1)
+
+    def test_run_job_success(self):
+        job = enqueue(record, args=['x'])
+        claim_jobs('w1')
+        self.assertTrue(run_job(job.pk))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result, {'value': 'x'})
+        self.assertEqual(calls, ['x'])
+
+    @override_settings(JOB_RETRY_BACKOFF=10)
+    def test_failed_job_retries_with_backoff_then_fails(self):
+        job = enqueue(flaky)
+        claim_jobs('w1')
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            run_job(job.pk)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('ValueError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=7))
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        claim_jobs('w1')
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_unique_jobs_are_not_queued_twice(self):
+        first = enqueue(record, args=[1], unique=True)
+        self.assertEqual(enqueue(record, args=[1], unique=True).pk, first.pk)
+        self.assertNotEqual(enqueue(record, args=[2], unique=True).pk, first.pk)
+
+        claim_jobs('w1', limit=5)
+        self.assertNotEqual(enqueue(record, args=[1], unique=True).pk, first.pk)
+
+    def test_stale_jobs_are_requeued(self):
+        job = enqueue(record, args=[1])
+        claim_jobs('w1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(lease_seconds=60), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('queued', ''))
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_run_inline_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = enqueue(record, args=['inline'])
+            self.assertEqual(calls, [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(calls, ['inline'])
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CronTests(TestCase):
+    def next_after(self, expression, *start):
+        return timezone.localtime(CronSchedule(expression).next_after(local(*start)))
+
+    def test_next_after(self):
+        self.assertEqual(self.next_after('*/15 * * * *', 2026, 3, 4, 10, 7), local(2026, 3, 4, 10, 15))
+        self.assertEqual(self.next_after('10 0 * * *', 2026, 3, 4, 0, 10), local(2026, 3, 5, 0, 10))
+        self.assertEqual(self.next_after('0 9-17/4 * * mon-fri', 2026, 3, 6, 18, 0), local(2026, 3, 9, 9, 0))
+        self.assertEqual(self.next_after('@monthly', 2026, 12, 15, 0, 0), local(2027, 1, 1, 0, 0))
+        self.assertEqual(self.next_after('0 3 * * 7', 2026, 3, 4, 0, 0), local(2026, 3, 8, 3, 0))
+        # Both day fields restricted: either may match.
+        self.assertEqual(self.next_after('0 0 13 * 5', 2026, 3, 1, 0, 0), local(2026, 3, 6, 0, 0))
+        self.assertEqual(self.next_after('0 0 29 2 *', 2026, 3, 1, 0, 0), local(2028, 2, 29, 0, 0))
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '5-1 * * * *', '* * * foo *', '0 0 30 2 *'):
+            with self.assertRaises(CronError, msg=expression):
+                CronSchedule(expression).next_after(timezone.now())
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_default_schedules_created_on_migrate(self):
+        self.assertEqual(
+            set(ScheduledTask.objects.values_list('name', flat=True)), set(DEFAULT_SCHEDULES),
+        )
+        self.assertFalse(ScheduledTask.objects.filter(enabled=True, next_run_at__isnull=True).exists())
+
+    def test_due_schedule_is_queued_once(self):
+        ScheduledTask.objects.all().delete()
+        now = timezone.now()
+        scheduled = ScheduledTask.objects.create(
+            name='record', task='jobs.tests.record', args=[1], cron='*/5 * * * *',
+            next_run_at=now - timedelta(hours=2),
+        )
+
+        self.assertTrue(locks.acquire(SCHEDULER_LOCK, 'other-worker'))
+        self.assertEqual(run_due_tasks('w1', now=now), [])
+        locks.release(SCHEDULER_LOCK, 'other-worker')
+
+        # Missed slots fire once, then the schedule moves past now.
+        jobs = run_due_tasks('w1', now=now)
+        self.assertEqual(run_due_tasks('w2', now=now), [])
+        self.assertEqual([job.task for job in jobs], ['jobs.tests.record'])
+        scheduled.refresh_from_db()
+        self.assertEqual(scheduled.last_job_id, jobs[0].pk)
+        self.assertGreater(scheduled.next_run_at, now)
+        self.assertLessEqual(scheduled.next_run_at, now + timedelta(minutes=5))
+
+        # A run still waiting in the queue is not queued a second time.
+        later = scheduled.next_run_at
+        self.assertEqual(run_due_tasks('w1', now=later)[0].pk, jobs[0].pk)
+        self.assertEqual(Job.objects.filter(task='jobs.tests.record').count(), 1)
+
+
+class BackupTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.database = self.dir / 'live.sqlite3'
+        conn = self.connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE sales (id INTEGER PRIMARY KEY, total TEXT)')
+        conn.executemany('INSERT INTO sales (total) VALUES (?)', [(str(i) * 500,) for i in range(200)])
+        conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.database, isolation_level=None)
+
+    def count(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT count(*) FROM sales').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_backup_is_a_consistent_snapshot_while_writes_continue(self):
+        writer = self.connect()
+        progress = []
+
+        def write_between_steps(copied, total):
+            progress.append(copied)
+            writer.execute("INSERT INTO sales (total) VALUES ('new')")
+
+        path, sha256 = backup.create_backup(
+            directory=self.dir / 'backups', pages=2, progress=write_between_steps, database=self.database,
+        )
+        writer.close()
+
+        # A restarted copy would show progress going backwards.
+        self.assertGreater(len(progress), 10)
+        self.assertEqual(progress, sorted(progress))
+        restored = self.dir / 'copy.sqlite3'
+        with gzip.open(path) as packed, open(restored, 'wb') as raw:
+            shutil.copyfileobj(packed, raw)
+        self.assertEqual(self.count(restored), 200)
+        self.assertEqual(len(sha256), 64)
+        self.assertEqual(self.count(self.database), 200 + len(progress))
+
+    def test_restore(self):
+        path, _ = backup.create_backup(directory=self.dir, database=self.database)
+        self.connect().execute('DELETE FROM sales')
+
+        backup.restore_backup(path, database=self.database)
+        self.assertEqual(self.count(self.database), 200)
+
+        broken = self.dir / 'broken.sqlite3'
+        broken.write_bytes(b'not a database' * 100)
+        with self.assertRaises(backup.BackupError):
+            backup.restore_backup(broken, database=self.database)
+        self.assertEqual(self.count(self.database), 200)
+
+    def test_retention(self):
+        # Every 6 hours for 60 days, newest first.
+        newest = datetime(2026, 3, 31, 18)
+        taken = [newest - timedelta(hours=6 * i) for i in range(240)]
+        keep = backup.backups_to_keep(taken, keep_last=4, keep_daily=7, keep_weekly=4, keep_monthly=3)
+
+        self.assertTrue(set(taken[:4]) <= keep)
+        # Newest per day for 7 days, then per week and month.
+        self.assertIn(datetime(2026, 3, 25, 18), keep)
+        self.assertNotIn(datetime(2026, 3, 25, 12), keep)
+        self.assertIn(datetime(2026, 3, 22, 18), keep)  # Sunday, end of ISO week 12
+        self.assertIn(datetime(2026, 2, 28, 18), keep)
+        self.assertEqual(min(keep), datetime(2026, 1, 31, 18))
+        self.assertEqual(len(keep), 14)
+
+
+class JobEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='x', role='manager')
+        cls.cashier = User.objects.create_user('cashier', password='x', role='cashier')
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_users_only_see_their_own_jobs(self):
+        own = enqueue(record, args=[1], created_by=self.cashier)
+        enqueue(record, args=[2], created_by=self.manager)
+
+        self.client.force_authenticate(self.cashier)
+        response = self.client.get('/api/jobs/jobs/')
+        self.assertEqual([job['id'] for job in response.data['results']], [own.pk])
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/jobs/jobs/stats/')
+        self.assertEqual(response.data['queued'], 2)
+
+    def test_cancel_and_retry(self):
+        job = enqueue(record, args=[1], created_by=self.cashier)
+        self.client.force_authenticate(self.cashier)
+
+        response = self.client.post(f'/api/jobs/jobs/{job.pk}/cancel/')
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(claim_jobs('w1'), [])
+
+        response = self.client.post(f'/api/jobs/jobs/{job.pk}/retry/')
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(claim_jobs('w1'), [job.pk])
+
+        response = self.client.post(f'/api/jobs/jobs/{job.pk}/cancel/')
+        self.assertEqual(response.status_code, 400)
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_burst_worker_runs_all_due_jobs(self):
+        jobs = [enqueue(record, args=[i]) for i in range(5)]
+        enqueue(record, args=['later'], delay=3600)
+
+        processed = Worker(concurrency=2, mode='thread', poll_interval=0.05, burst=True).run()
+
+        self.assertEqual(processed, 5)
+        self.assertEqual(sorted(calls), list(range(5)))
+        self.assertEqual(
+            Job.objects.filter(pk__in=[job.pk for job in jobs], status='succeeded').count(), 5,
+        )
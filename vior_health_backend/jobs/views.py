@@ -0,0 +1,76 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from django.db.models import Count
+from django.utils import timezone
+from accounts.policies import scoped
+from .models import Job
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Status of background jobs. Admins and managers see every job, other
+    users the jobs they started.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Job.objects.select_related('created_by')
+
+        queryset = scoped(queryset, user, 'jobs')
+
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+
+        task = self.request.query_params.get('task')
+        if task:
+            queryset = queryset.filter(task=task)
+
+        return queryset
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        """Queue a failed or cancelled job again with a fresh set of attempts"""
+        job = self.get_object()
+
+        if job.status not in ['failed', 'cancelled']:
+            return Response(
+                {'error': 'Only failed or cancelled jobs can be retried'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        Job.objects.filter(pk=job.pk, status=job.status).update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None,
+        )
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Cancel a job that has not started yet"""
+        job = self.get_object()
+
+        # Compare-and-set: a worker may claim the job at the same moment.
+        cancelled = Job.objects.filter(pk=job.pk, status='queued').update(
+            status='cancelled', finished_at=timezone.now(),
+        )
+        if not cancelled:
+            return Response(
+                {'error': 'Only queued jobs can be cancelled'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Job counts by status"""
+        counts = dict(
+            self.get_queryset().values_list('status').annotate(count=Count('id')).order_by()
+        )
+        return Response({key: counts.get(key, 0) for key, _ in Job.STATUS_CHOICES})
@@ -0,0 +1,111 @@
+"""
+The ``run_worker`` loop.
+
+One main thread polls the database, claims as many jobs as there are free
+slots and hands their ids to a thread or process pool. While jobs run the
+worker refreshes their lease; jobs left behind by a worker that died are
+returned to the queue once their lease expires. Unless started with
+``scheduler=False`` the loop also queues due periodic tasks (``jobs.scheduler``).
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import process, queue, scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    def __init__(self, concurrency=2, mode='thread', poll_interval=1.0, burst=False, scheduler=True):
+        self.concurrency = concurrency
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.scheduler = scheduler
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self.stopping = threading.Event()
+        self.processed = 0
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def _executor(self):
+        if self.mode == 'process':
+            # Spawn rather than fork: a forked child would inherit the polling
+            # loop's open database connection.
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.setup,
+            )
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job')
+
+    def _submit(self, executor, job_id):
+        target = process.execute_job if self.mode == 'process' else queue.execute_job
+        return executor.submit(target, job_id)
+
+    def run(self):
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        in_flight = {}
+        last_recovery = 0.0
+        last_schedule = 0.0
+        executor = self._executor()
+        logger.info('Worker %s started (%s x%d)', self.worker_id, self.mode, self.concurrency)
+        if self.scheduler:
+            # Schedules added in an upgrade appear without waiting for migrate.
+            scheduler.ensure_default_schedules()
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                broken = False
+                for future in [f for f in in_flight if f.done()]:
+                    job_id = in_flight.pop(future)
+                    self.processed += 1
+                    if future.exception():
+                        logger.error('Job %s crashed the pool: %s', job_id, future.exception())
+                        queue.release_job(job_id, self.worker_id, f'Worker crashed: {future.exception()}')
+                        broken = broken or isinstance(future.exception(), BrokenProcessPool)
+                if broken:
+                    executor.shutdown(wait=False)
+                    executor = self._executor()
+
+                queue.heartbeat(self.worker_id, in_flight.values())
+                if time.monotonic() - last_recovery > settings.JOB_LEASE_SECONDS / 2:
+                    queue.requeue_stale()
+                    last_recovery = time.monotonic()
+                if self.scheduler and time.monotonic() - last_schedule > settings.JOB_SCHEDULER_INTERVAL:
+                    scheduler.run_due_tasks(self.worker_id)
+                    last_schedule = time.monotonic()
+
+                claimed = queue.claim_jobs(self.worker_id, self.concurrency - len(in_flight))
+                for job_id in claimed:
+                    in_flight[self._submit(executor, job_id)] = job_id
+
+                if self.burst and not claimed and not in_flight:
+                    break
+                if not claimed:
+                    if in_flight:
+                        wait(list(in_flight), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    else:
+                        self.stopping.wait(self.poll_interval)
+        finally:
+            # Let running jobs finish; anything still queued is left for the next worker.
+            executor.shutdown(wait=True)
+            self.processed += sum(1 for f in in_flight if f.done())
+            close_old_connections()
+            logger.info('Worker %s stopped after %d jobs', self.worker_id, self.processed)
+        return self.processed
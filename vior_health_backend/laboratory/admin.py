@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TestType, LabTest, LabMeasurement
+from .models import TestType, TestPanel, LabTest, LabMeasurement
 
 
 @admin.register(TestType)
@@ -10,6 +10,15 @@ class TestTypeAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(TestPanel)
+class TestPanelAdmin(admin.ModelAdmin):
+    list_display = ['name', 'code', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['name', 'code']
+    filter_horizontal = ['test_types']
+    readonly_fields = ['created_at', 'updated_at']
+
+
 @admin.register(LabTest)
 class LabTestAdmin(admin.ModelAdmin):
     list_display = ['test_number', 'test_name', 'patient_name', 'status', 'assigned_to', 'created_at']
@@ -0,0 +1,15 @@
+"""
+Async version of ``LabTestViewSet.stats``, served when ``ASYNC_VIEWS`` is on
+(see ``analytics.async_views``).
+"""
+from analytics.cache import cached_endpoint
+from vior_health_backend.asyncviews import async_api_view, run_sync
+
+from .views import lab_stats, lab_test_scope
+
+
+@async_api_view
+@cached_endpoint('lab_stats', depends_on=('laboratory.LabTest',), scope=lab_test_scope)
+async def stats(request):
+    """Get laboratory statistics"""
+    return await run_sync(lab_stats, request.user)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from laboratory.models import LabTest
+from laboratory.reports import REPORTABLE_STATUSES, generate_report
+
+
+class Command(BaseCommand):
+    help = 'Generate PDF reports for lab tests completed in a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help='First completion date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last completion date (YYYY-MM-DD), defaults to --start')
+        parser.add_argument('--force', action='store_true', help='Regenerate existing reports too')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start'])
+        end = parse_date(options['end']) if options['end'] else start
+        if start is None or end is None:
+            raise CommandError('Dates must be YYYY-MM-DD')
+
+        queryset = LabTest.objects.filter(
+            status__in=REPORTABLE_STATUSES,
+            completed_at__date__gte=start,
+            completed_at__date__lte=end,
+        ).order_by('completed_at')
+        if not options['force']:
+            queryset = queryset.filter(report_sha256='')
+
+        started = time.perf_counter()
+        generated = failed = 0
+        for lab_test_id in queryset.values_list('id', flat=True):
+            try:
+                generate_report(lab_test_id)
+                generated += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Test {lab_test_id}: {e}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {generated} reports in {elapsed:.1f}s' + (f', {failed} failed' if failed else '')
+        ))
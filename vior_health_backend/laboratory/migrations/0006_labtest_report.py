@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0005_labtest_prescription_labtest_sale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labtest',
+            name='report_generated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='labtest',
+            name='report_sha256',
+            field=models.CharField(blank=True, editable=False, help_text='Hash of the current PDF report', max_length=64),
+        ),
+    ]
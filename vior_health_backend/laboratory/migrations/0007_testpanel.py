@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('laboratory', '0006_labtest_report'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestPanel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('code', models.CharField(help_text='Unique code for the panel', max_length=50, unique=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True, help_text='Whether this panel can be ordered')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='test_panels_created', to=settings.AUTH_USER_MODEL)),
+                ('test_types', models.ManyToManyField(related_name='panels', to='laboratory.testtype')),
+            ],
+            options={
+                'db_table': 'test_panels',
+                'ordering': ['name'],
+            },
+        ),
+    ]
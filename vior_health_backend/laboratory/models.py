@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
 from django.conf import settings
 from sales.models import Customer
+from sequences.numbering import document_number
 
 
 class TestType(models.Model):
@@ -31,6 +32,34 @@ class TestType(models.Model):
         return f"{self.name} - {self.cost}"
 
 
+class TestPanel(models.Model):
+    """
+    Test types usually ordered together, e.g. FBC + LFT + RFT
+    """
+    name = models.CharField(max_length=255, unique=True)
+    code = models.CharField(max_length=50, unique=True, help_text="Unique code for the panel")
+    description = models.TextField(blank=True, null=True)
+    test_types = models.ManyToManyField(TestType, related_name='panels')
+    is_active = models.BooleanField(default=True, help_text="Whether this panel can be ordered")
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='test_panels_created'
+    )
+    
+    class Meta:
+        db_table = 'test_panels'
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+
+
 class LabTest(models.Model):
     """
     Laboratory test requested by pharmacist or doctor
@@ -141,6 +170,10 @@ class LabTest(models.Model):
     )
     reviewed_at = models.DateTimeField(null=True, blank=True)
     
+    # PDF report (see laboratory.reports)
+    report_sha256 = models.CharField(max_length=64, blank=True, editable=False, help_text="Hash of the current PDF report")
+    report_generated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -159,10 +192,7 @@ class LabTest(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.test_number:
-            # Generate unique test number
-            from django.utils import timezone
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            self.test_number = f"LAB-{timestamp}"
+            self.test_number = document_number('LAB', using=kwargs.get('using') or DEFAULT_DB_ALIAS)
         super().save(*args, **kwargs)
 
 
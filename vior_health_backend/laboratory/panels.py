@@ -0,0 +1,71 @@
+"""
+Ordering several lab tests for one patient in one request.
+
+``order_tests`` creates one ``LabTest`` per test type with a single
+``bulk_create``: numbers are allocated together (see
+``sequences.numbering``) and technicians are picked from one grouped query
+of their open work. Unless the order names a technician, each test goes to
+whichever active lab technician has the fewest pending or in-progress tests
+at that point, so a large panel is spread across the lab.
+"""
+import heapq
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from accounts.models import User
+from analytics.cache import invalidate
+from realtime.signals import lab_tests_changed
+from sequences.numbering import document_numbers
+
+from .models import LabTest
+
+OPEN_STATUSES = ('pending', 'in_progress')
+
+# Fields of an order copied onto every test
+PATIENT_FIELDS = (
+    'customer', 'patient_name', 'patient_age', 'patient_gender', 'patient_phone',
+    'prescription', 'sale', 'description',
+)
+
+
+def technicians_by_load():
+    """A heap of ``(open tests, id)`` for active lab technicians."""
+    load = User.objects.filter(role='lab_technician', is_active=True).annotate(
+        open_tests=Count('lab_tests_assigned', filter=Q(lab_tests_assigned__status__in=OPEN_STATUSES)),
+    ).values_list('open_tests', 'id')
+    heap = list(load)
+    heapq.heapify(heap)
+    return heap
+
+
+def _assignees(count, assigned_to):
+    if assigned_to is not None:
+        return [assigned_to.pk] * count
+    heap = technicians_by_load()
+    if not heap:
+        return [None] * count
+    assignees = []
+    for _ in range(count):
+        load, technician = heapq.heappop(heap)
+        assignees.append(technician)
+        heapq.heappush(heap, (load + 1, technician))
+    return assignees
+
+
+def order_tests(test_types, data, requested_by):
+    """Create a pending ``LabTest`` per test type for the patient in ``data``."""
+    with transaction.atomic():
+        numbers = document_numbers('LAB', len(test_types))
+        assignees = _assignees(len(test_types), data.get('assigned_to'))
+        patient = {field: data[field] for field in PATIENT_FIELDS if field in data}
+        lab_tests = LabTest.objects.bulk_create([
+            LabTest(
+                test_number=number, test_type=test_type, test_name=test_type.name, cost=test_type.cost,
+                requested_by=requested_by, assigned_to_id=technician, **patient,
+            )
+            for test_type, number, technician in zip(test_types, numbers, assignees)
+        ])
+        transaction.on_commit(lambda: invalidate('laboratory.LabTest'))
+        lab_tests_changed(lab_tests, 'lab_test.created')
+    return lab_tests
@@ -0,0 +1,156 @@
+"""
+Minimal PDF writer for lab reports.
+
+Supports what the reports need and nothing more: multiple A4 pages, text in
+the standard Helvetica fonts (no embedding), lines and filled rectangles.
+Coordinates are in points from the top-left corner. Output is deterministic
+(no creation date), so identical reports hash identically.
+"""
+import zlib
+
+A4 = (595.28, 841.89)
+
+FONTS = {
+    'regular': ('F1', 'Helvetica'),
+    'bold': ('F2', 'Helvetica-Bold'),
+}
+
+# Helvetica advance widths (1/1000 em) for ASCII 32..126, from the standard AFM.
+_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+# Helvetica-Bold is slightly wider; scaling the regular metrics is close enough
+# for wrapping and truncation.
+_BOLD_FACTOR = 1.06
+
+
+def text_width(text, size, font='regular'):
+    units = sum(_WIDTHS[ord(c) - 32] if 32 <= ord(c) <= 126 else 556 for c in text)
+    if font == 'bold':
+        units *= _BOLD_FACTOR
+    return units * size / 1000
+
+
+def truncate(text, max_width, size, font='regular'):
+    if text_width(text, size, font) <= max_width:
+        return text
+    while text and text_width(text + '...', size, font) > max_width:
+        text = text[:-1]
+    return text + '...'
+
+
+def wrap(text, max_width, size, font='regular'):
+    """Split text into lines no wider than ``max_width`` points."""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        current = ''
+        for word in paragraph.split():
+            candidate = f'{current} {word}' if current else word
+            if current and text_width(candidate, size, font) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+
+def _escape(text):
+    data = str(text).encode('cp1252', 'replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _num(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.').encode()
+
+
+class PDFWriter:
+    def __init__(self, page_size=A4):
+        self.width, self.height = page_size
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.page = []
+        self.pages.append(self.page)
+        return self.page
+
+    def text(self, x, y, text, size=10, font='regular', page=None):
+        """Draw text with its baseline ``y`` points from the top."""
+        ops = self.page if page is None else page
+        name = FONTS[font][0].encode()
+        ops.append(
+            b'BT /' + name + b' ' + _num(size) + b' Tf ' + _num(x) + b' '
+            + _num(self.height - y) + b' Td (' + _escape(text) + b') Tj ET'
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0):
+        self.page.append(
+            _num(gray) + b' G ' + _num(width) + b' w ' + _num(x1) + b' ' + _num(self.height - y1)
+            + b' m ' + _num(x2) + b' ' + _num(self.height - y2) + b' l S'
+        )
+
+    def rect(self, x, y, width, height, gray=0.9):
+        """Filled rectangle whose top-left corner is at (x, y)."""
+        self.page.append(
+            _num(gray) + b' g ' + _num(x) + b' ' + _num(self.height - y - height) + b' '
+            + _num(width) + b' ' + _num(height) + b' re f 0 g'
+        )
+
+    def output(self):
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        fonts = {
+            key: add(b'<< /Type /Font /Subtype /Type1 /BaseFont /' + base.encode()
+                     + b' /Encoding /WinAnsiEncoding >>')
+            for key, (_, base) in FONTS.items()
+        }
+        font_resources = b' '.join(
+            b'/' + FONTS[key][0].encode() + b' ' + str(number).encode() + b' 0 R'
+            for key, number in fonts.items()
+        )
+
+        kids = []
+        for ops in self.pages:
+            stream = zlib.compress(b'\n'.join(ops))
+            content = add(
+                b'<< /Length ' + str(len(stream)).encode() + b' /Filter /FlateDecode >>\nstream\n'
+                + stream + b'\nendstream'
+            )
+            kids.append(add(
+                b'<< /Type /Page /Parent ' + str(pages).encode() + b' 0 R /MediaBox [0 0 '
+                + _num(self.width) + b' ' + _num(self.height) + b'] /Resources << /Font << '
+                + font_resources + b' >> >> /Contents ' + str(content).encode() + b' 0 R >>'
+            ))
+
+        objects[catalog - 1] = b'<< /Type /Catalog /Pages ' + str(pages).encode() + b' 0 R >>'
+        objects[pages - 1] = (
+            b'<< /Type /Pages /Kids [' + b' '.join(str(k).encode() + b' 0 R' for k in kids)
+            + b'] /Count ' + str(len(kids)).encode() + b' >>'
+        )
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += str(number).encode() + b' 0 obj\n' + body + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 ' + str(len(objects) + 1).encode() + b'\n0000000000 65535 f \n'
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += (
+            b'trailer\n<< /Size ' + str(len(objects) + 1).encode() + b' /Root '
+            + str(catalog).encode() + b' 0 R >>\nstartxref\n' + str(xref).encode() + b'\n%%EOF\n'
+        )
+        return bytes(out)
@@ -0,0 +1,226 @@
+"""
+Lab report PDFs.
+
+Reports are rendered with ``laboratory.pdf`` once a test is completed or
+reviewed, by a background job (``laboratory.generate_report``), and stored
+content-addressed under ``MEDIA_ROOT/lab_reports/<sha[:2]>/<sha>.pdf``. ``LabTest.report_sha256``
+points at the current file; the same hash doubles as the HTTP ETag.
+"""
+import hashlib
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from accounts.models import PharmacySettings
+from jobs.queue import enqueue
+
+from .models import LabTest
+from .pdf import PDFWriter, truncate, wrap
+
+REPORT_DIR = 'lab_reports'
+REPORTABLE_STATUSES = ('completed', 'reviewed')
+
+MARGIN = 40
+LINE = 14
+# (title, width) of the measurement table columns; widths add up to 515pt.
+COLUMNS = (('Parameter', 170), ('Result', 80), ('Unit', 70), ('Reference range', 120), ('Flag', 75))
+
+_RANGE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[-–]\s*(-?\d+(?:\.\d+)?)')
+_BOUND = re.compile(r'^\s*([<>])=?\s*(-?\d+(?:\.\d+)?)')
+
+
+def report_path(sha256):
+    return f'{REPORT_DIR}/{sha256[:2]}/{sha256}.pdf'
+
+
+def measurement_flag(measurement):
+    """'' when normal, else 'HIGH'/'LOW' when the range can be parsed, or 'ABNORMAL'."""
+    if measurement.is_normal:
+        return ''
+    try:
+        value = float(measurement.value)
+    except (TypeError, ValueError):
+        return 'ABNORMAL'
+    reference = measurement.reference_range or ''
+    match = _RANGE.match(reference)
+    if match:
+        low, high = float(match.group(1)), float(match.group(2))
+        if value > high:
+            return 'HIGH'
+        if value < low:
+            return 'LOW'
+        return 'ABNORMAL'
+    match = _BOUND.match(reference)
+    if match:
+        bound = float(match.group(2))
+        if match.group(1) == '<' and value >= bound:
+            return 'HIGH'
+        if match.group(1) == '>' and value <= bound:
+            return 'LOW'
+    return 'ABNORMAL'
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%b %d, %Y %I:%M %p') if value else '-'
+
+
+def _person(user):
+    if user is None:
+        return '-'
+    return user.get_full_name() or user.username
+
+
+class _Layout:
+    """Top-down cursor over a PDFWriter that starts new pages as needed."""
+
+    def __init__(self, writer):
+        self.pdf = writer
+        self.y = MARGIN
+        self.right = writer.width - MARGIN
+        self.bottom = writer.height - MARGIN - 20  # room for the page footer
+        self.on_new_page = None
+
+    def ensure(self, height):
+        if self.y + height > self.bottom:
+            self.pdf.new_page()
+            self.y = MARGIN
+            if self.on_new_page:
+                self.on_new_page()
+
+    def text(self, text, size=10, font='regular', x=MARGIN):
+        self.ensure(LINE)
+        self.y += LINE
+        self.pdf.text(x, self.y, text, size=size, font=font)
+
+    def paragraph(self, text, size=10):
+        for line in wrap(text, self.right - MARGIN, size):
+            self.text(line, size=size)
+
+    def rule(self):
+        self.y += 6
+        self.pdf.line(MARGIN, self.y, self.right, self.y)
+        self.y += 4
+
+
+def _table_header(layout):
+    layout.ensure(LINE + 6)
+    layout.pdf.rect(MARGIN, layout.y + 2, layout.right - MARGIN, LINE + 2)
+    layout.y += LINE
+    x = MARGIN + 4
+    for title, width in COLUMNS:
+        layout.pdf.text(x, layout.y, title, size=9, font='bold')
+        x += width
+    layout.y += 4
+
+
+def render_lab_report(lab_test, pharmacy=None):
+    """Render one lab test, with its measurements, as PDF bytes."""
+    pharmacy = pharmacy or PharmacySettings.get_settings()
+    pdf = PDFWriter()
+    layout = _Layout(pdf)
+
+    layout.text(pharmacy.pharmacy_name or 'VIOR HEALTH PHARMACY', size=16, font='bold')
+    address = ', '.join(filter(None, [
+        pharmacy.address_line1, pharmacy.address_line2, pharmacy.city, pharmacy.state_province,
+    ]))
+    if address:
+        layout.text(address, size=9)
+    contact = '   '.join(filter(None, [
+        f'Phone: {pharmacy.phone}' if pharmacy.phone else '',
+        f'Email: {pharmacy.email}' if pharmacy.email else '',
+    ]))
+    if contact:
+        layout.text(contact, size=9)
+    layout.rule()
+
+    layout.text('LABORATORY REPORT', size=13, font='bold')
+    pdf.text(layout.right - 150, layout.y, lab_test.test_number, size=10, font='bold')
+    layout.y += 4
+
+    gender = lab_test.get_patient_gender_display() if lab_test.patient_gender else '-'
+    details = [
+        ('Patient', lab_test.patient_name, 'Test', lab_test.test_name),
+        ('Age / Gender', f'{lab_test.patient_age or "-"} / {gender}', 'Test type', lab_test.test_type.name),
+        ('Phone', lab_test.patient_phone or '-', 'Requested by', _person(lab_test.requested_by)),
+        ('Requested', _format_datetime(lab_test.requested_at), 'Technician', _person(lab_test.assigned_to)),
+        ('Completed', _format_datetime(lab_test.completed_at), 'Reviewed', _format_datetime(lab_test.reviewed_at)),
+    ]
+    for left_label, left_value, right_label, right_value in details:
+        layout.text(f'{left_label}:', size=9, font='bold')
+        pdf.text(MARGIN + 80, layout.y, truncate(str(left_value), 170, 9), size=9)
+        pdf.text(MARGIN + 265, layout.y, f'{right_label}:', size=9, font='bold')
+        pdf.text(MARGIN + 345, layout.y, truncate(str(right_value), 170, 9), size=9)
+    layout.rule()
+
+    measurements = list(lab_test.measurements.all())
+    if measurements:
+        layout.text('Measurements', size=11, font='bold')
+        layout.y += 4
+        _table_header(layout)
+        layout.on_new_page = lambda: _table_header(layout)
+        for measurement in measurements:
+            flag = measurement_flag(measurement)
+            layout.ensure(LINE)
+            layout.y += LINE
+            x = MARGIN + 4
+            cells = (
+                measurement.parameter_name, measurement.value, measurement.unit,
+                measurement.reference_range or '-', flag,
+            )
+            for (title, width), value in zip(COLUMNS, cells):
+                font = 'bold' if flag and title in ('Result', 'Flag') else 'regular'
+                pdf.text(x, layout.y, truncate(str(value), width - 8, 9, font), size=9, font=font)
+                x += width
+        layout.on_new_page = None
+        layout.rule()
+
+    for title, body in (('Results', lab_test.results), ('Diagnosis', lab_test.diagnosis),
+                        ('Notes', lab_test.notes)):
+        if body:
+            layout.ensure(LINE * 3)
+            layout.text(title, size=11, font='bold')
+            layout.paragraph(body)
+            layout.y += 6
+
+    if lab_test.reviewed_by_id:
+        layout.y += 10
+        layout.text(f'Reviewed by {_person(lab_test.reviewed_by)} on '
+                    f'{_format_datetime(lab_test.reviewed_at)}', size=9)
+
+    total = len(pdf.pages)
+    for number, page in enumerate(pdf.pages, start=1):
+        pdf.text(MARGIN, pdf.height - MARGIN + 10,
+                 f'{lab_test.test_number} - Page {number} of {total}', size=8, page=page)
+    return pdf.output()
+
+
+def generate_report(lab_test_id):
+    """Render and store the report for one test. Returns the content hash."""
+    lab_test = (
+        LabTest.objects.select_related('test_type', 'requested_by', 'assigned_to', 'reviewed_by')
+        .prefetch_related('measurements').get(pk=lab_test_id)
+    )
+    data = render_lab_report(lab_test)
+    sha256 = hashlib.sha256(data).hexdigest()
+    name = report_path(sha256)
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    # update() rather than save(): the report does not change anything the
+    # dashboard caches depend on.
+    LabTest.objects.filter(pk=lab_test_id).update(
+        report_sha256=sha256, report_generated_at=timezone.now(),
+    )
+    return sha256
+
+
+def schedule_report(lab_test_id, created_by=None, priority=0):
+    """
+    Queue report generation. The job becomes visible to workers when the
+    current transaction commits; a report already waiting is not queued twice.
+    """
+    return enqueue(
+        'laboratory.generate_report', args=[lab_test_id],
+        priority=priority, created_by=created_by, unique=True,
+    )
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import TestType, LabTest, LabMeasurement
+from .models import TestType, TestPanel, LabTest, LabMeasurement
+from .panels import PATIENT_FIELDS
 from accounts.serializers import UserSerializer
 
 
@@ -13,6 +14,54 @@ class TestTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
+class TestPanelSerializer(serializers.ModelSerializer):
+    test_types = serializers.PrimaryKeyRelatedField(many=True, queryset=TestType.objects.all())
+    tests = TestTypeSerializer(source='test_types', many=True, read_only=True)
+    total_cost = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TestPanel
+        fields = [
+            'id', 'name', 'code', 'description', 'test_types', 'tests', 'total_cost',
+            'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+    
+    def get_total_cost(self, obj):
+        return str(sum(test_type.cost for test_type in obj.test_types.all()))
+
+
+class PanelOrderSerializer(serializers.ModelSerializer):
+    """A panel and/or extra test types, ordered for one patient."""
+    panel = serializers.PrimaryKeyRelatedField(
+        queryset=TestPanel.objects.filter(is_active=True).prefetch_related('test_types'), required=False,
+    )
+    test_types = serializers.ListField(child=serializers.IntegerField(), required=False)
+    
+    class Meta:
+        model = LabTest
+        fields = ['panel', 'test_types', *PATIENT_FIELDS, 'assigned_to']
+    
+    def validate_test_types(self, value):
+        # One query for the whole list, not one per id.
+        test_types = TestType.objects.filter(is_active=True).in_bulk(value)
+        missing = [pk for pk in value if pk not in test_types]
+        if missing:
+            raise serializers.ValidationError(f'Unknown or inactive test types: {missing}')
+        return [test_types[pk] for pk in value]
+    
+    def validate(self, attrs):
+        panel = attrs.get('panel')
+        ordered = [*(panel.test_types.all() if panel else []), *attrs.get('test_types', [])]
+        if panel and any(not test_type.is_active for test_type in ordered):
+            raise serializers.ValidationError({'panel': 'This panel includes inactive test types'})
+        # A test type in both the panel and the extras is done once.
+        attrs['test_types'] = list({test_type.pk: test_type for test_type in ordered}.values())
+        if not attrs['test_types']:
+            raise serializers.ValidationError('Order a panel or at least one test type')
+        return attrs
+
+
 class LabMeasurementSerializer(serializers.ModelSerializer):
     measured_by_name = serializers.CharField(source='measured_by.get_full_name', read_only=True)
     
@@ -52,9 +101,10 @@ class LabTestSerializer(serializers.ModelSerializer):
             'status', 'started_at', 'completed_at',
             'results', 'diagnosis', 'notes',
             'reviewed_by', 'reviewed_by_name', 'reviewed_at',
+            'report_sha256', 'report_generated_at',
             'measurements', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['test_number', 'requested_at', 'created_at', 'updated_at']
+        read_only_fields = ['test_number', 'requested_at', 'report_sha256', 'report_generated_at', 'created_at', 'updated_at']
 
 
 class LabTestCreateSerializer(serializers.ModelSerializer):
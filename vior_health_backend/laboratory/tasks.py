@@ -0,0 +1,8 @@
+from jobs.queue import task
+
+from . import reports
+
+
+@task('laboratory.generate_report')
+def generate_report(lab_test_id):
+    return {'sha256': reports.generate_report(lab_test_id)}
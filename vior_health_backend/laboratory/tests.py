@@ -1,3 +1,274 @@
-from django.test import TestCase
+import re
+import shutil
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from sequences.models import DocumentSequence
+
+from .models import LabMeasurement, LabTest, TestPanel, TestType
+from .reports import generate_report, measurement_flag, render_lab_report
+from .turnaround import percentile
+
+
+def page_text(pdf):
+    """Decompressed content streams, enough to assert on drawn text."""
+    streams = re.findall(rb'stream\n(.*?)\nendstream', pdf, re.S)
+    return b'\n'.join(zlib.decompress(stream) for stream in streams)
+
+
+class LabReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = User.objects.create_user('pharm', password='x', role='pharmacist')
+        test_type = TestType.objects.create(name='Blood Sugar Test', code='blood_sugar')
+        cls.lab_test = LabTest.objects.create(
+            test_type=test_type, test_name='Fasting glucose', patient_name='Jane Doe',
+            patient_age=40, patient_gender='female', requested_by=cls.pharmacist,
+        )
+        LabMeasurement.objects.create(
+            lab_test=cls.lab_test, parameter_name='Glucose', value='9.1', unit='mmol/L',
+            reference_range='3.9 - 5.6', is_normal=False,
+        )
+        LabMeasurement.objects.create(
+            lab_test=cls.lab_test, parameter_name='HbA1c', value='5.0', unit='%',
+            reference_range='< 5.7', is_normal=True,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.client = APIClient()
+        self.client.force_authenticate(self.pharmacist)
+
+    def test_render_lab_report(self):
+        pdf = render_lab_report(self.lab_test)
+
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        xref = int(re.search(rb'startxref\n(\d+)', pdf).group(1))
+        self.assertTrue(pdf[xref:].startswith(b'xref'))
+
+        text = page_text(pdf)
+        for expected in (b'LABORATORY REPORT', b'Jane Doe', b'Glucose', b'3.9 - 5.6', b'HIGH'):
+            self.assertIn(expected, text)
+        # Deterministic output is what makes content addressing work.
+        self.assertEqual(pdf, render_lab_report(self.lab_test))
+
+    def test_measurement_flag(self):
+        def flag(value, reference_range, is_normal=False):
+            return measurement_flag(LabMeasurement(
+                value=value, reference_range=reference_range, is_normal=is_normal,
+            ))
+
+        self.assertEqual(flag('9.1', '3.9 - 5.6'), 'HIGH')
+        self.assertEqual(flag('2.0', '3.9-5.6'), 'LOW')
+        self.assertEqual(flag('6.1', '< 5.7'), 'HIGH')
+        self.assertEqual(flag('positive', 'negative'), 'ABNORMAL')
+        self.assertEqual(flag('5.0', '3.9 - 5.6', is_normal=True), '')
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_report_generated_on_completion_and_served_with_etag(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            response = self.client.get(f'/api/laboratory/tests/{self.lab_test.pk}/report/')
+            self.assertEqual(response.status_code, 400)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/api/laboratory/tests/{self.lab_test.pk}/complete_test/', {})
+            self.lab_test.refresh_from_db()
+            self.assertEqual(len(self.lab_test.report_sha256), 64)
+
+            response = self.client.get(f'/api/laboratory/tests/{self.lab_test.pk}/report/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            self.assertEqual(response['ETag'], f'"{self.lab_test.report_sha256}"')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+            response = self.client.get(
+                f'/api/laboratory/tests/{self.lab_test.pk}/report/',
+                HTTP_IF_NONE_MATCH=f'"{self.lab_test.report_sha256}"',
+            )
+            self.assertEqual(response.status_code, 304)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_generate_reports_for_date_range(self):
+        LabTest.objects.filter(pk=self.lab_test.pk).update(status='completed', completed_at=timezone.now())
+        today = timezone.localdate().isoformat()
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    '/api/laboratory/tests/generate_reports/', {'start_date': today}, format='json',
+                )
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['scheduled'], 1)
+            self.lab_test.refresh_from_db()
+            self.assertEqual(self.lab_test.report_sha256, generate_report(self.lab_test.pk))
+
+
+class LabStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = User.objects.create_user('pharm', password='x', role='pharmacist')
+        cls.tech = User.objects.create_user('tech', password='x', role='lab_technician')
+        glucose = TestType.objects.create(name='Blood Sugar Test', code='blood_sugar')
+        malaria = TestType.objects.create(name='Malaria Test', code='malaria')
+        now = timezone.now()
+        # (test type, technician, minutes to start, to complete, to review)
+        for test_type, tech, wait, processing, review in [
+            (glucose, cls.tech, 10, 20, 5),
+            (glucose, cls.tech, 30, 40, None),
+            (malaria, None, 60, None, None),
+            (malaria, cls.tech, None, None, None),
+        ]:
+            requested = now - timedelta(hours=6)
+            started = requested + timedelta(minutes=wait) if wait else None
+            completed = started + timedelta(minutes=processing) if processing else None
+            reviewed = completed + timedelta(minutes=review) if review else None
+            status = 'reviewed' if reviewed else 'completed' if completed else 'in_progress' if started else 'pending'
+            lab_test = LabTest.objects.create(
+                test_type=test_type, test_name=test_type.name, patient_name='Jane Doe', requested_by=cls.pharmacist, assigned_to=tech, status=status,
+                started_at=started, completed_at=completed, reviewed_at=reviewed,
+            )
+            LabTest.objects.filter(pk=lab_test.pk).update(requested_at=requested)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.pharmacist)
+
+    def test_stats_is_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/laboratory/tests/stats/')
+        self.assertEqual(response.data, {
+            'total': 4, 'pending': 1, 'in_progress': 1, 'completed': 1, 'reviewed': 1,
+        })
+
+        self.client.force_authenticate(self.tech)
+        response = self.client.get('/api/laboratory/tests/stats/')
+        self.assertEqual(response.data['total'], 3)
+
+    def test_turnaround_percentiles(self):
+        response = self.client.get('/api/laboratory/tests/turnaround/')
+        self.assertEqual(response.status_code, 200)
+
+        glucose, malaria = response.data['by_test_type']
+        self.assertEqual((glucose['test_type'], glucose['count']), ('Blood Sugar Test', 2))
+        self.assertEqual(glucose['wait'], {'p50': 20.0, 'p90': 28.0})
+        self.assertEqual(glucose['total'], {'p50': 50.0, 'p90': 66.0})
+        self.assertEqual(glucose['review'], {'p50': 5.0, 'p90': 5.0})
+        self.assertEqual(malaria['wait'], {'p50': 60.0, 'p90': 60.0})
+        self.assertEqual(malaria['processing'], {'p50': None, 'p90': None})
+
+        [tech] = response.data['by_technician']
+        self.assertEqual((tech['technician'], tech['id'], tech['count']), ('tech', self.tech.pk, 3))
+        self.assertEqual(tech['processing'], {'p50': 30.0, 'p90': 38.0})
+
+    def test_percentile_interpolates_like_percentile_cont(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(percentile([10], 90), 10)
+        self.assertIsNone(percentile([], 50))
+
+
+class LabTestNumberingTests(TransactionTestCase):
+    """Tests run in parallel threads, so they need real commits."""
+    WORKERS = 16
+    PER_WORKER = 125
+
+    def test_parallel_creation_gets_unique_numbers(self):
+        user = User.objects.create_user('pharm', password='x', role='pharmacist')
+        test_type = TestType.objects.create(name='Malaria Test', code='malaria')
+
+        def create_tests(_):
+            try:
+                return [
+                    LabTest.objects.create(
+                        test_type=test_type, test_name='Malaria', patient_name='Asha', requested_by=user,
+                    ).test_number
+                    for _ in range(self.PER_WORKER)
+                ]
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.WORKERS) as pool:
+            numbers = [number for batch in pool.map(create_tests, range(self.WORKERS)) for number in batch]
+
+        total = self.WORKERS * self.PER_WORKER
+        self.assertEqual(len(set(numbers)), total)
+        self.assertEqual(LabTest.objects.count(), total)
+        # No number was skipped either.
+        self.assertEqual(DocumentSequence.objects.filter(series='LAB').aggregate(Sum('value'))['value__sum'], total)
+
+
+class PanelOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacist = User.objects.create_user('pharm', password='x', role='pharmacist')
+        cls.tech1 = User.objects.create_user('tech1', password='x', role='lab_technician')
+        cls.tech2 = User.objects.create_user('tech2', password='x', role='lab_technician')
+        User.objects.create_user('tech3', password='x', role='lab_technician', is_active=False)
+        cls.fbc, cls.lft, cls.rft = [
+            TestType.objects.create(name=name, code=name.lower(), cost=cost)
+            for name, cost in [('FBC', 8000), ('LFT', 15000), ('RFT', 12000)]
+        ]
+        cls.panel = TestPanel.objects.create(name='Routine', code='routine')
+        cls.panel.test_types.set([cls.fbc, cls.lft, cls.rft])
+        LabTest.objects.create(
+            test_type=cls.fbc, test_name='FBC', patient_name='Earlier', requested_by=cls.pharmacist,
+            assigned_to=cls.tech1,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.pharmacist)
+
+    def order(self, **data):
+        return self.client.post('/api/laboratory/tests/order_panel/', {
+            'patient_name': 'Asha', 'patient_age': 30, **data,
+        }, format='json')
+
+    def test_order_panel(self):
+        self.assertEqual(self.client.get('/api/laboratory/tests/stats/').data['pending'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.order(panel=self.panel.pk)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['count'], response.data['total_cost']), (3, '35000.00'))
+        tests = response.data['tests']
+        self.assertEqual(len({test['test_number'] for test in tests}), 3)
+        # Least loaded first; tech1 already had an open test.
+        self.assertEqual([test['assigned_to'] for test in tests], [self.tech2.pk, self.tech1.pk, self.tech2.pk])
+        created = LabTest.objects.filter(patient_name='Asha')
+        self.assertEqual(set(created.values_list('status', 'patient_age', 'requested_by')), {
+            ('pending', 30, self.pharmacist.pk),
+        })
+        self.assertEqual(self.client.get('/api/laboratory/tests/stats/').data['pending'], 4)
+
+    def test_queries_do_not_grow_with_panel_size(self):
+        with CaptureQueriesContext(connection) as one:
+            self.order(test_types=[self.fbc.pk])
+        with CaptureQueriesContext(connection) as three:
+            response = self.order(test_types=[self.fbc.pk, self.lft.pk, self.rft.pk], assigned_to=self.tech1.pk)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual({test['assigned_to'] for test in response.data['tests']}, {self.tech1.pk})
+        self.assertEqual(len(three), len(one))
+
+    def test_invalid_orders(self):
+        self.assertEqual(self.order().status_code, 400)
+        self.lft.is_active = False
+        self.lft.save()
+        response = self.order(panel=self.panel.pk)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('panel', response.data)
+        self.assertFalse(LabTest.objects.filter(patient_name='Asha').exists())
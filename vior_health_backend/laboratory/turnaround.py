@@ -0,0 +1,125 @@
+"""
+Turnaround-time (TAT) percentiles for lab tests.
+
+Each stage is the time between two of a test's timestamps, in minutes:
+
+    wait        requested -> started
+    processing  started   -> completed
+    review      completed -> reviewed
+    total       requested -> completed (when the result is available)
+
+On PostgreSQL the percentiles are ``PERCENTILE_CONT`` aggregates, one
+grouped query per breakdown. SQLite has no percentile aggregate, so the
+stage durations are computed in one query and interpolated the same way
+in Python.
+"""
+import math
+from collections import defaultdict
+
+from django.db import connections
+from django.db.models import Aggregate, Count, DurationField, ExpressionWrapper, F, FloatField
+from django.db.models.functions import Extract
+
+STAGES = {
+    'wait': ('requested_at', 'started_at'),
+    'processing': ('started_at', 'completed_at'),
+    'review': ('completed_at', 'reviewed_at'),
+    'total': ('requested_at', 'completed_at'),
+}
+PERCENTILES = (50, 90)
+
+# Response key: (grouping field, label field, label name in each row)
+BREAKDOWNS = {
+    'by_test_type': ('test_type_id', 'test_type__name', 'test_type'),
+    'by_technician': ('assigned_to_id', 'assigned_to__username', 'technician'),
+}
+
+
+class PercentileCont(Aggregate):
+    """PostgreSQL's ``PERCENTILE_CONT(fraction) WITHIN GROUP (ORDER BY expression)``."""
+    function = 'PERCENTILE_CONT'
+    template = '%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), **extra)
+
+
+def _duration(stage):
+    start, end = STAGES[stage]
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def percentile(values, pct):
+    """``PERCENTILE_CONT`` over sorted ``values``: linear interpolation between ranks."""
+    if not values:
+        return None
+    rank = (len(values) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _minutes(seconds):
+    return None if seconds is None else round(seconds / 60, 1)
+
+
+def _row(label_name, key, label, count, stages):
+    return {'id': key, label_name: label, 'count': count, **stages}
+
+
+def _postgres(queryset):
+    aggregates = {
+        f'{stage}_p{pct}': PercentileCont(Extract(_duration(stage), 'epoch'), pct / 100)
+        for stage in STAGES for pct in PERCENTILES
+    }
+    result = {}
+    for name, (key_field, label_field, label_name) in BREAKDOWNS.items():
+        rows = queryset.filter(**{f'{key_field}__isnull': False}).values(key_field, label_field).annotate(
+            count=Count('id'), **aggregates,
+        ).order_by(label_field)
+        result[name] = [
+            _row(label_name, row[key_field], row[label_field], row['count'], {
+                stage: {f'p{pct}': _minutes(row[f'{stage}_p{pct}']) for pct in PERCENTILES}
+                for stage in STAGES
+            })
+            for row in rows
+        ]
+    return result
+
+
+def _fallback(queryset):
+    group_fields = [field for breakdown in BREAKDOWNS.values() for field in breakdown[:2]]
+    rows = queryset.values(*group_fields, **{stage: _duration(stage) for stage in STAGES})
+
+    groups = {name: defaultdict(lambda: defaultdict(list)) for name in BREAKDOWNS}
+    labels = {name: {} for name in BREAKDOWNS}
+    counts = {name: defaultdict(int) for name in BREAKDOWNS}
+    for row in rows:
+        for name, (key_field, label_field, _) in BREAKDOWNS.items():
+            key = row[key_field]
+            if key is None:
+                continue
+            labels[name][key] = row[label_field]
+            counts[name][key] += 1
+            for stage in STAGES:
+                if row[stage] is not None:
+                    groups[name][key][stage].append(row[stage].total_seconds())
+
+    result = {}
+    for name, (_, _, label_name) in BREAKDOWNS.items():
+        result[name] = []
+        for key, label in sorted(labels[name].items(), key=lambda item: item[1]):
+            stages = {}
+            for stage in STAGES:
+                values = sorted(groups[name][key][stage])
+                stages[stage] = {f'p{pct}': _minutes(percentile(values, pct)) for pct in PERCENTILES}
+            result[name].append(_row(label_name, key, label, counts[name][key], stages))
+    return result
+
+
+def turnaround_stats(queryset):
+    """TAT percentiles (minutes) for ``queryset``, by test type and by assigned technician."""
+    queryset = queryset.order_by()
+    if connections[queryset.db].vendor == 'postgresql':
+        return _postgres(queryset)
+    return _fallback(queryset)
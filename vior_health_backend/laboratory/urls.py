@@ -1,12 +1,19 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TestTypeViewSet, LabTestViewSet, LabMeasurementViewSet
+from . import async_views
+from .views import TestTypeViewSet, TestPanelViewSet, LabTestViewSet, LabMeasurementViewSet
 
 router = DefaultRouter()
 router.register(r'test-types', TestTypeViewSet, basename='testtype')
+router.register(r'panels', TestPanelViewSet, basename='testpanel')
 router.register(r'tests', LabTestViewSet, basename='labtest')
 router.register(r'measurements', LabMeasurementViewSet, basename='labmeasurement')
 
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Ahead of the router's sync action.
+    urlpatterns.insert(0, path('tests/stats/', async_views.stats, name='labtest-stats'))
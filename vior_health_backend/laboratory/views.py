@@ -2,10 +2,42 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
 from django.utils import timezone
-from django.db.models import Q
-from .models import TestType, LabTest, LabMeasurement
-from .serializers import TestTypeSerializer, LabTestSerializer, LabTestCreateSerializer, LabMeasurementSerializer
+from django.utils.dateparse import parse_date
+from django.db.models import Count, Prefetch, Q
+from datetime import timedelta
+from .models import TestType, TestPanel, LabTest, LabMeasurement
+from .serializers import (
+    TestTypeSerializer, TestPanelSerializer, PanelOrderSerializer,
+    LabTestSerializer, LabTestCreateSerializer, LabMeasurementSerializer
+)
+from .panels import order_tests
+from .reports import REPORTABLE_STATUSES, report_path, schedule_report
+from .turnaround import turnaround_stats
+from accounts.policies import PolicyPermission, allows, scope_key, scoped
+from analytics.cache import cached_endpoint
+from sales.idempotency import idempotent
+from vior_health_backend.routers import report_grade
+
+
+def lab_test_scope(request):
+    """Cache scope matching the row filtering in LabTestViewSet.get_queryset."""
+    return scope_key(request.user, 'lab_tests')
+
+
+def lab_test_queryset(user):
+    """Lab tests ``user`` may see (see ``SCOPES['lab_tests']`` in accounts.policies)."""
+    return scoped(LabTest.objects.all(), user, 'lab_tests')
+
+
+def lab_stats(user):
+    """Test counts per status, and in total, in one grouped query."""
+    rows = lab_test_queryset(user).order_by().values_list('status').annotate(count=Count('id'))
+    counts = {status: 0 for status, _ in LabTest.STATUS_CHOICES}
+    counts.update(rows)
+    return {'total': sum(counts.values()), **counts}
 
 
 class TestTypeViewSet(viewsets.ModelViewSet):
@@ -14,13 +46,19 @@ class TestTypeViewSet(viewsets.ModelViewSet):
     """
     queryset = TestType.objects.all()
     serializer_class = TestTypeSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, PolicyPermission]
+    policy_actions = {
+        'create': ('test_types', 'manage', 'Only admin and manager can create test types'),
+        'update': ('test_types', 'manage', 'Only admin and manager can update test types'),
+        'partial_update': ('test_types', 'manage', 'Only admin and manager can update test types'),
+        'destroy': ('test_types', 'manage', 'Only admin and manager can delete test types'),
+    }
     
     def get_queryset(self):
         queryset = TestType.objects.all()
         
         # Filter active test types for non-admin users
-        if self.request.user.role not in ['admin', 'manager']:
+        if not allows(self.request.user, 'test_types', 'view_inactive'):
             queryset = queryset.filter(is_active=True)
         
         return queryset
@@ -28,59 +66,52 @@ class TestTypeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         # Save the user who created the test type
         serializer.save(created_by=self.request.user)
+
+
+class TestPanelViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet for managing test panels (admin/manager only)
+    """
+    serializer_class = TestPanelSerializer
+    permission_classes = [IsAuthenticated, PolicyPermission]
+    policy_actions = {
+        'create': ('test_types', 'manage', 'Only admin and manager can create test panels'),
+        'update': ('test_types', 'manage', 'Only admin and manager can update test panels'),
+        'partial_update': ('test_types', 'manage', 'Only admin and manager can update test panels'),
+        'destroy': ('test_types', 'manage', 'Only admin and manager can delete test panels'),
+    }
     
-    def create(self, request, *args, **kwargs):
-        # Only admin and manager can create test types
-        if request.user.role not in ['admin', 'manager']:
-            return Response(
-                {'error': 'Only admin and manager can create test types'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        return super().create(request, *args, **kwargs)
-    
-    def update(self, request, *args, **kwargs):
-        # Only admin and manager can update test types
-        if request.user.role not in ['admin', 'manager']:
-            return Response(
-                {'error': 'Only admin and manager can update test types'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        return super().update(request, *args, **kwargs)
+    def get_queryset(self):
+        queryset = TestPanel.objects.prefetch_related('test_types')
+        
+        # Filter active panels for non-admin users
+        if not allows(self.request.user, 'test_types', 'view_inactive'):
+            queryset = queryset.filter(is_active=True)
+        
+        return queryset
     
-    def destroy(self, request, *args, **kwargs):
-        # Only admin and manager can delete test types
-        if request.user.role not in ['admin', 'manager']:
-            return Response(
-                {'error': 'Only admin and manager can delete test types'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        return super().destroy(request, *args, **kwargs)
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
 
 
 class LabTestViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing laboratory tests
     """
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, PolicyPermission]
+    policy_actions = {
+        'review_test': ('lab_tests', 'review', 'Only pharmacists, managers, or admins can review tests'),
+        'generate_reports': (
+            'lab_tests', 'generate_reports', 'Only pharmacists, managers, or admins can generate reports',
+        ),
+    }
     
     def get_queryset(self):
-        user = self.request.user
-        queryset = LabTest.objects.select_related(
-            'requested_by', 'assigned_to', 'reviewed_by'
-        ).prefetch_related('measurements')
-        
-        # Filter based on user role
-        if user.role == 'lab_technician':
-            # Lab technicians see tests assigned to them
-            queryset = queryset.filter(assigned_to=user)
-        elif user.role in ['pharmacist', 'manager', 'admin']:
-            # Pharmacists, managers, and admins see all tests
-            pass
-        else:
-            # Other roles see tests they requested
-            queryset = queryset.filter(requested_by=user)
-        
-        return queryset
+        return lab_test_queryset(self.request.user).select_related(
+            'requested_by', 'assigned_to', 'reviewed_by', 'test_type', 'customer', 'prescription', 'sale'
+        ).prefetch_related(
+            Prefetch('measurements', queryset=LabMeasurement.objects.select_related('measured_by'))
+        )
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -102,6 +133,33 @@ class LabTestViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(output_serializer.data)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
     
+    @action(detail=False, methods=['post'])
+    @idempotent
+    def order_panel(self, request):
+        """Order a panel and/or ``test_types`` for one patient in one request"""
+        serializer = PanelOrderSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        lab_tests = order_tests(data['test_types'], data, request.user)
+        return Response({
+            'panel': data['panel'].pk if data.get('panel') else None,
+            'count': len(lab_tests),
+            'total_cost': str(sum(lab_test.cost for lab_test in lab_tests)),
+            'tests': [
+                {
+                    'id': lab_test.pk,
+                    'test_number': lab_test.test_number,
+                    'test_type': lab_test.test_type_id,
+                    'test_name': lab_test.test_name,
+                    'cost': str(lab_test.cost),
+                    'assigned_to': lab_test.assigned_to_id,
+                }
+                for lab_test in lab_tests
+            ],
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'])
     def start_test(self, request, pk=None):
         """Start working on a test"""
@@ -139,11 +197,13 @@ class LabTestViewSet(viewsets.ModelViewSet):
         lab_test.diagnosis = request.data.get('diagnosis', lab_test.diagnosis)
         lab_test.notes = request.data.get('notes', lab_test.notes)
         lab_test.save()
+        schedule_report(lab_test.pk, created_by=request.user)
         
         serializer = self.get_serializer(lab_test)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def mark_as_paid(self, request, pk=None):
         """Mark test as paid"""
         lab_test = self.get_object()
@@ -173,35 +233,91 @@ class LabTestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if request.user.role not in ['pharmacist', 'manager', 'admin']:
-            return Response(
-                {'error': 'Only pharmacists, managers, or admins can review tests'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         lab_test.status = 'reviewed'
         lab_test.reviewed_by = request.user
         lab_test.reviewed_at = timezone.now()
         lab_test.save()
+        schedule_report(lab_test.pk, created_by=request.user)
         
         serializer = self.get_serializer(lab_test)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def report(self, request, pk=None):
+        """Download the PDF report, or 202 while it is being generated"""
+        lab_test = self.get_object()
+        
+        if lab_test.status not in REPORTABLE_STATUSES:
+            return Response(
+                {'error': 'Report is available once the test is completed'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        sha256 = lab_test.report_sha256
+        if not sha256 or not default_storage.exists(report_path(sha256)):
+            job = schedule_report(lab_test.pk, created_by=request.user)
+            return Response({'status': 'generating', 'job': job.pk}, status=status.HTTP_202_ACCEPTED)
+        
+        etag = f'"{sha256}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = FileResponse(
+                default_storage.open(report_path(sha256), 'rb'),
+                content_type='application/pdf',
+                filename=f'{lab_test.test_number}.pdf',
+            )
+        # Reports contain patient data: only the browser may cache them, and
+        # it must revalidate (a cheap 304) in case the report was regenerated.
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    
+    @action(detail=False, methods=['post'])
+    def generate_reports(self, request):
+        """Queue reports for tests completed in a date range (pharmacist/admin)"""
+        start_date = parse_date(str(request.data.get('start_date', '')))
+        end_date = parse_date(str(request.data.get('end_date', ''))) or start_date
+        if start_date is None:
+            return Response(
+                {'error': 'start_date (YYYY-MM-DD) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = LabTest.objects.filter(
+            status__in=REPORTABLE_STATUSES,
+            completed_at__date__gte=start_date,
+            completed_at__date__lte=end_date,
+        )
+        if not request.data.get('force'):
+            queryset = queryset.filter(report_sha256='')
+        
+        # Batch reports go behind reports for tests completed right now.
+        jobs = [
+            schedule_report(lab_test_id, created_by=request.user, priority=-1)
+            for lab_test_id in queryset.values_list('id', flat=True)
+        ]
+        return Response(
+            {'scheduled': len(jobs), 'jobs': [job.pk for job in jobs]},
+            status=status.HTTP_202_ACCEPTED
+        )
+    
     @action(detail=False, methods=['get'])
+    @cached_endpoint('lab_stats', depends_on=('laboratory.LabTest',), scope=lab_test_scope)
     def stats(self, request):
         """Get laboratory statistics"""
-        user = request.user
-        queryset = self.get_queryset()
-        
-        stats = {
-            'total': queryset.count(),
-            'pending': queryset.filter(status='pending').count(),
-            'in_progress': queryset.filter(status='in_progress').count(),
-            'completed': queryset.filter(status='completed').count(),
-            'reviewed': queryset.filter(status='reviewed').count(),
-        }
-        
-        return Response(stats)
+        return Response(lab_stats(request.user))
+
+    @action(detail=False, methods=['get'])
+    @report_grade
+    @cached_endpoint('lab_turnaround', depends_on=('laboratory.LabTest',), scope=lab_test_scope)
+    def turnaround(self, request):
+        """Turnaround-time percentiles (minutes) by test type and technician, for tests requested in the last ?days=30"""
+        days = int(request.query_params.get('days', 30))
+        queryset = lab_test_queryset(request.user).filter(
+            requested_at__gte=timezone.now() - timedelta(days=days)
+        )
+        return Response({'days': days, **turnaround_stats(queryset)})
 
 
 class LabMeasurementViewSet(viewsets.ModelViewSet):
@@ -212,16 +328,10 @@ class LabMeasurementViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
         queryset = LabMeasurement.objects.select_related('lab_test', 'measured_by')
         
         # Filter based on lab test access
-        if user.role == 'lab_technician':
-            queryset = queryset.filter(lab_test__assigned_to=user)
-        elif user.role in ['pharmacist', 'manager', 'admin']:
-            pass
-        else:
-            queryset = queryset.filter(lab_test__requested_by=user)
+        queryset = scoped(queryset, self.request.user, 'lab_tests', via='lab_test__')
         
         # Filter by lab test if provided
         lab_test_id = self.request.query_params.get('lab_test')
@@ -236,3 +346,18 @@ class LabMeasurementViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(measured_by=self.request.user)
+        self._refresh_report(serializer.instance.lab_test)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        self._refresh_report(serializer.instance.lab_test)
+    
+    def perform_destroy(self, instance):
+        lab_test = instance.lab_test
+        instance.delete()
+        self._refresh_report(lab_test)
+    
+    def _refresh_report(self, lab_test):
+        # Measurements edited after completion change the report.
+        if lab_test.status in REPORTABLE_STATUSES:
+            schedule_report(lab_test.pk, created_by=self.request.user)
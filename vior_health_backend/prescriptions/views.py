@@ -4,10 +4,16 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
 from datetime import datetime
+import time
 from .models import Prescription, PrescriptionItem
 from sales.models import Customer, Sale, SaleItem
 from inventory.models import Product
 from .serializers import PrescriptionSerializer, CreatePrescriptionSerializer
+from sales.checkout import invoice_numbers
+from sequences.numbering import document_number
+from sales.idempotency import idempotency_key, idempotent
+from sales.views import checkout_failure_reason
+from vior_health_backend.metrics import CHECKOUT_DURATION, CHECKOUT_FAILURES
 
 
 class PrescriptionViewSet(viewsets.ModelViewSet):
@@ -40,22 +46,9 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         
         try:
             with transaction.atomic():
-                # Generate prescription number
-                today = datetime.now()
-                prescription_prefix = f"RX{today.strftime('%Y%m%d')}"
-                last_prescription = Prescription.objects.filter(
-                    prescription_number__startswith=prescription_prefix
-                ).order_by('-prescription_number').first()
-                
-                if last_prescription:
-                    last_number = int(last_prescription.prescription_number[-4:])
-                    prescription_number = f"{prescription_prefix}{str(last_number + 1).zfill(4)}"
-                else:
-                    prescription_number = f"{prescription_prefix}0001"
-                
                 # Create prescription
                 prescription = Prescription.objects.create(
-                    prescription_number=prescription_number,
+                    prescription_number=document_number('RX'),
                     customer_id=data['customer'],
                     doctor_name=data['doctor_name'],
                     doctor_license=data['doctor_license'],
@@ -100,6 +93,7 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=True, methods=['post'])
+    @idempotent
     def dispense(self, request, pk=None):
         prescription = self.get_object()
         
@@ -112,12 +106,14 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
         # Optional: Create a sale when dispensing
         create_sale = request.data.get('create_sale', False)
         payment_method = request.data.get('payment_method', 'cash')
+        started = time.perf_counter()
         
         try:
             with transaction.atomic():
                 # Check stock for all items
                 for item in prescription.items.all():
                     if item.product.quantity < item.quantity:
+                        CHECKOUT_FAILURES.inc(endpoint='dispense', reason='insufficient_stock')
                         return Response(
                             {'error': f'Insufficient stock for {item.product.name}'},
                             status=status.HTTP_400_BAD_REQUEST
@@ -132,22 +128,9 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
                     tax = subtotal * Decimal('0.18')  # 18% VAT
                     total = subtotal + tax
                     
-                    # Generate invoice number
-                    today = datetime.now()
-                    invoice_prefix = f"INV{today.strftime('%Y%m%d')}"
-                    last_sale = Sale.objects.filter(
-                        invoice_number__startswith=invoice_prefix
-                    ).order_by('-invoice_number').first()
-                    
-                    if last_sale:
-                        last_number = int(last_sale.invoice_number[-4:])
-                        invoice_number = f"{invoice_prefix}{str(last_number + 1).zfill(4)}"
-                    else:
-                        invoice_number = f"{invoice_prefix}0001"
-                    
                     # Create sale
                     sale = Sale.objects.create(
-                        invoice_number=invoice_number,
+                        invoice_number=invoice_numbers()[0],
                         customer=prescription.customer,
                         subtotal=subtotal,
                         tax=tax,
@@ -158,7 +141,8 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
                         change_amount=0,
                         status='completed',
                         cashier=request.user,
-                        notes=f"Prescription #{prescription.prescription_number}"
+                        notes=f"Prescription #{prescription.prescription_number}",
+                        idempotency_key=idempotency_key(request)
                     )
                     
                     # Create sale items
@@ -189,10 +173,12 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
                 if sale:
                     response_data['sale_id'] = sale.id
                     response_data['invoice_number'] = sale.invoice_number
-                
-                return Response(response_data)
+            
+            CHECKOUT_DURATION.observe(time.perf_counter() - started, endpoint='dispense')
+            return Response(response_data)
         
         except Exception as e:
+            CHECKOUT_FAILURES.inc(endpoint='dispense', reason=checkout_failure_reason(e))
             import traceback
             print("Dispense error:", str(e))
             print("Traceback:", traceback.format_exc())
@@ -0,0 +1,110 @@
+"""
+In-process publish/subscribe for the event stream.
+
+``publish`` may be called from any thread (request threads, job workers).
+Each subscriber is an open ``/api/events/`` connection with a bounded
+``asyncio.Queue`` on its event loop; events are handed over with
+``call_soon_threadsafe``. A subscriber that falls ``REALTIME_QUEUE_SIZE``
+events behind gets a single ``resync`` event instead, telling the page to
+re-fetch once.
+
+The last ``REALTIME_BACKLOG`` events are kept so a reconnecting browser
+(``Last-Event-ID``) receives what it missed. Event ids start with a token
+for this process, so ids from before a restart also lead to ``resync``.
+
+Only connections to this process see its events: run one ASGI process.
+"""
+import asyncio
+import threading
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+BOOT = uuid.uuid4().hex[:8]
+
+
+@dataclass(frozen=True)
+class Event:
+    id: str
+    topic: str
+    type: str
+    data: dict = field(hash=False)
+
+
+RESYNC = Event(id='', topic='', type='resync', data={})
+
+
+class Subscription:
+    def __init__(self, accepts, size):
+        self.accepts = accepts
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=size)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def deliver(self, event):
+        if self.accepts(event):
+            self.loop.call_soon_threadsafe(self._put, event)
+
+
+class Broker:
+    def __init__(self, backlog=None, queue_size=None):
+        self.queue_size = queue_size or settings.REALTIME_QUEUE_SIZE
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=backlog or settings.REALTIME_BACKLOG)
+        self._counter = 0
+
+    def publish(self, topic, type, data):
+        with self._lock:
+            self._counter += 1
+            event = Event(id=f'{BOOT}-{self._counter}', topic=topic, type=type, data=data)
+            self._backlog.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Its event loop has closed; the connection is gone.
+                self.unsubscribe(subscription)
+        return event
+
+    def _missed(self, last_event_id):
+        boot, _, number = last_event_id.partition('-')
+        if boot != BOOT or not number.isdigit():
+            return [RESYNC]
+        number = int(number)
+        missed = [event for event in self._backlog if int(event.id.rsplit('-', 1)[1]) > number]
+        if number < self._counter and (not missed or missed[0].id != f'{BOOT}-{number + 1}'):
+            return [RESYNC]
+        return missed
+
+    def subscribe(self, accepts, last_event_id=None):
+        """Subscribe the running event loop. Call from async code."""
+        subscription = Subscription(accepts, self.queue_size)
+        with self._lock:
+            if last_event_id:
+                for event in self._missed(last_event_id):
+                    if event is RESYNC or accepts(event):
+                        subscription._put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = Broker()
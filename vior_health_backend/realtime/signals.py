@@ -0,0 +1,110 @@
+"""
+Model changes published to the event stream, once their transaction commits.
+
+Bulk writes send no signals; code that writes sales, lab tests or stock with
+``bulk_create()``/``update()`` calls ``sales_changed``/``lab_tests_changed``/
+``stock_changed`` itself.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from inventory.models import Product
+from laboratory.models import LabTest
+from prescriptions.models import Prescription
+from sales.models import Sale
+
+from .broker import broker
+
+
+def _publish_on_commit(topic, type, data):
+    transaction.on_commit(lambda: broker.publish(topic, type, data))
+
+
+def _verb(created):
+    return 'created' if created else 'updated'
+
+
+def _sale_data(sale):
+    return {
+        'id': sale.pk,
+        'invoice_number': sale.invoice_number,
+        'total': str(sale.total),
+        'status': sale.status,
+        'payment_method': sale.payment_method,
+        'cashier': sale.cashier_id,
+        'created_at': sale.created_at.isoformat(),
+    }
+
+
+def sale_saved(sender, instance, created, **kwargs):
+    _publish_on_commit('sale', f'sale.{_verb(created)}', _sale_data(instance))
+
+
+def sales_changed(sales, type='sale.updated'):
+    """Publish sales written with ``bulk_create()`` or ``update()``, once committed."""
+    for sale in sales:
+        _publish_on_commit('sale', type, _sale_data(sale))
+
+
+def _lab_test_data(lab_test):
+    return {
+        'id': lab_test.pk,
+        'test_number': lab_test.test_number,
+        'test_name': lab_test.test_name,
+        'patient_name': lab_test.patient_name,
+        'status': lab_test.status,
+        'paid': lab_test.paid,
+        'requested_by': lab_test.requested_by_id,
+        'assigned_to': lab_test.assigned_to_id,
+    }
+
+
+def lab_test_saved(sender, instance, created, **kwargs):
+    _publish_on_commit('lab_test', f'lab_test.{_verb(created)}', _lab_test_data(instance))
+
+
+def lab_tests_changed(lab_tests, type='lab_test.updated'):
+    """Publish lab tests written with ``bulk_create()`` or ``update()``, once committed."""
+    for lab_test in lab_tests:
+        _publish_on_commit('lab_test', type, _lab_test_data(lab_test))
+
+
+def prescription_saved(sender, instance, created, **kwargs):
+    _publish_on_commit('prescription', f'prescription.{_verb(created)}', {
+        'id': instance.pk,
+        'prescription_number': instance.prescription_number,
+        'customer': instance.customer_id,
+        'status': instance.status,
+        'dispensed_by': instance.dispensed_by_id,
+    })
+
+
+def _stock_data(product):
+    return {
+        'id': product['id'],
+        'name': product['name'],
+        'quantity': product['quantity'],
+        'reorder_level': product['reorder_level'],
+        'low_stock': product['quantity'] <= product['reorder_level'],
+    }
+
+
+def product_saved(sender, instance, created, **kwargs):
+    _publish_on_commit('product', 'product.stock', _stock_data({
+        'id': instance.pk, 'name': instance.name,
+        'quantity': instance.quantity, 'reorder_level': instance.reorder_level,
+    }))
+
+
+def stock_changed(product_ids):
+    """Publish current stock of ``product_ids`` after a bulk update, once committed."""
+    def publish():
+        for product in Product.objects.filter(pk__in=product_ids).values('id', 'name', 'quantity', 'reorder_level'):
+            broker.publish('product', 'product.stock', _stock_data(product))
+    transaction.on_commit(publish)
+
+
+post_save.connect(sale_saved, sender=Sale, dispatch_uid='realtime-sale')
+post_save.connect(lab_test_saved, sender=LabTest, dispatch_uid='realtime-lab-test')
+post_save.connect(prescription_saved, sender=Prescription, dispatch_uid='realtime-prescription')
+post_save.connect(product_saved, sender=Product, dispatch_uid='realtime-product')
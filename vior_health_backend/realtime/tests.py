@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from laboratory.models import LabTest, TestType
+from sales.models import Sale
+
+from .broker import RESYNC, Broker, broker
+from .views import event_filter
+
+
+class BrokerTests(SimpleTestCase):
+    async def test_publish_from_other_threads(self):
+        hub = Broker(backlog=10, queue_size=10)
+        subscription = hub.subscribe(lambda event: event.topic == 'sale')
+        publishers = [
+            threading.Thread(target=hub.publish, args=(topic, f'{topic}.created', {'n': n}))
+            for n, topic in enumerate(['sale', 'product', 'sale'])
+        ]
+        for thread in publishers:
+            thread.start()
+        for thread in publishers:
+            thread.join()
+
+        received = [await asyncio.wait_for(subscription.queue.get(), 1) for _ in range(2)]
+        self.assertEqual(sorted(event.data['n'] for event in received), [0, 2])
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_slow_subscriber_gets_resync(self):
+        hub = Broker(backlog=10, queue_size=2)
+        subscription = hub.subscribe(lambda event: True)
+        for n in range(3):
+            hub.publish('sale', 'sale.created', {'n': n})
+        await asyncio.sleep(0)
+        self.assertIs(subscription.queue.get_nowait(), RESYNC)
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_reconnect_replays_missed_events(self):
+        hub = Broker(backlog=3, queue_size=10)
+        first = hub.publish('sale', 'sale.created', {'n': 1})
+        hub.publish('sale', 'sale.created', {'n': 2})
+        hub.publish('sale', 'sale.created', {'n': 3})
+
+        subscription = hub.subscribe(lambda event: True, last_event_id=first.id)
+        self.assertEqual([subscription.queue.get_nowait().data['n'] for _ in range(2)], [2, 3])
+
+        # Too far behind for the backlog, or from before a restart.
+        for n in range(4, 7):
+            hub.publish('sale', 'sale.created', {'n': n})
+        self.assertIs(hub.subscribe(lambda event: True, last_event_id=first.id).queue.get_nowait(), RESYNC)
+        self.assertIs(hub.subscribe(lambda event: True, last_event_id='old-5').queue.get_nowait(), RESYNC)
+
+
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager3', password='x', role='manager')
+        cls.cashier = User.objects.create_user('cashier4', password='x', role='cashier')
+        cls.technician = User.objects.create_user('tech1', password='x', role='lab_technician')
+        cls.other_technician = User.objects.create_user('tech2', password='x', role='lab_technician')
+        cls.test_type = TestType.objects.create(name='Malaria', code='malaria')
+
+    def test_role_filtering(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for number, assigned in enumerate((self.technician, self.other_technician)):
+                LabTest.objects.create(
+                    test_number=f'LAB-SSE-{number}', test_type=self.test_type, test_name='Malaria', patient_name='Asha',
+                    requested_by=self.cashier, assigned_to=assigned,
+                )
+        hub_events = [event for event in broker._backlog if event.topic == 'lab_test'][-2:]
+        sale = broker.publish('sale', 'sale.created', {'id': 1})
+
+        def visible(user, topics=None):
+            accepts = event_filter(user, topics)
+            return [event for event in hub_events + [sale] if accepts(event)]
+
+        self.assertEqual(len(visible(self.manager)), 3)
+        self.assertEqual(visible(self.manager, ['sale']), [sale])
+        self.assertEqual(len(visible(self.cashier)), 3)
+        self.assertEqual(visible(self.technician), [hub_events[0]])
+        self.assertEqual(visible(User(role='cashier', pk=999)), [sale])
+
+    async def test_stream(self):
+        token = str(AccessToken.for_user(self.manager))
+        self.assertEqual((await self.async_client.get('/api/events/')).status_code, 401)
+
+        response = await self.async_client.get('/api/events/', {'token': token, 'topics': 'sale'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+
+        def record_sale():
+            with self.captureOnCommitCallbacks(execute=True):
+                Sale.objects.create(
+                    invoice_number='INV-SSE', subtotal=Decimal('10.00'), total=Decimal('10.00'),
+                    payment_method='cash', amount_paid=Decimal('10.00'), cashier=self.cashier,
+                )
+        await sync_to_async(record_sale)()
+
+        chunk = (await asyncio.wait_for(anext(stream), 2)).decode()
+        self.assertIn('event: sale.created', chunk)
+        self.assertIn('"invoice_number": "INV-SSE"', chunk)
+        await stream.aclose()
+
+    def test_needs_asgi(self):
+        self.assertEqual(self.client.get('/api/events/').status_code, 501)
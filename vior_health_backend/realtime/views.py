@@ -0,0 +1,96 @@
+"""
+``GET /api/events/``: Server-Sent Events for dashboards and worklists.
+
+Needs the ASGI server (see README). ``EventSource`` cannot send headers, so
+the JWT access token may be passed as ``?token=``. ``?topics=sale,product``
+narrows the stream; lab technicians only get lab tests assigned to them,
+other roles follow the same rules as ``LabTestViewSet.get_queryset`` (the
+``lab_tests`` scope in ``accounts.policies``).
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from accounts.authentication import ClaimsJWTAuthentication
+from accounts.policies import ALL, SCOPE_FIELDS, scope_for
+
+from .broker import RESYNC, broker
+
+TOPICS = ('sale', 'lab_test', 'prescription', 'product')
+ROLE_TOPICS = {
+    'lab_technician': ('lab_test',),
+}
+
+
+def _authenticate(request):
+    authentication = ClaimsJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def event_filter(user, topics=None):
+    """Which events ``user`` may receive, as a predicate over ``Event``."""
+    allowed = set(ROLE_TOPICS.get(user.role, TOPICS))
+    if topics:
+        allowed &= set(topics)
+    lab_scope = scope_for(user, 'lab_tests')
+    lab_field = None if lab_scope == ALL else SCOPE_FIELDS['lab_tests'][lab_scope]
+
+    def accepts(event):
+        if event.topic not in allowed:
+            return False
+        if event.topic == 'lab_test' and lab_field is not None:
+            return event.data[lab_field] == user.pk
+        return True
+    return accepts
+
+
+def format_event(event):
+    if event is RESYNC:
+        return 'event: resync\ndata: {}\n\n'
+    return f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+
+
+async def _stream(subscription):
+    try:
+        yield f'retry: {settings.REALTIME_RETRY_MS}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.REALTIME_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies and the browser from closing an idle stream.
+                yield ': keep-alive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def events(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream needs the ASGI server'}, status=501)
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'}, status=401)
+
+    topics = [topic for topic in request.GET.get('topics', '').split(',') if topic]
+    subscription = broker.subscribe(
+        event_filter(user, topics),
+        last_event_id=request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'),
+    )
+    response = StreamingHttpResponse(_stream(subscription), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
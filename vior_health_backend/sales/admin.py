@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Sale, SaleItem
+from .models import ArchivedSale, ArchivedSaleItem, Customer, Sale, SaleItem
 
 
 @admin.register(Customer)
@@ -45,3 +45,22 @@ class SaleItemAdmin(admin.ModelAdmin):
     list_display = ('sale', 'product', 'quantity', 'unit_price', 'discount', 'total')
     search_fields = ('sale__invoice_number', 'product__name')
     ordering = ('-sale__created_at',)
+
+
+class ArchivedSaleItemInline(admin.TabularInline):
+    model = ArchivedSaleItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('product', 'quantity', 'unit_price', 'discount', 'total', 'archived_at')
+
+
+@admin.register(ArchivedSale)
+class ArchivedSaleAdmin(admin.ModelAdmin):
+    list_display = ('invoice_number', 'customer', 'total', 'payment_method', 'status', 'created_at', 'archived_at')
+    list_filter = ('status', 'payment_method')
+    search_fields = ('invoice_number', 'customer__name')
+    ordering = ('-created_at',)
+    inlines = [ArchivedSaleItemInline]
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,92 @@
+"""
+Archiving of old sales and stock movements.
+
+Closed sales (and their items) and stock movements from before the first day
+of the month ``months`` months ago move to ``sales_archive``,
+``sale_items_archive`` and ``stock_movements_archive`` in batches, each
+batch in its own short transaction so checkout is never held up for long.
+
+Before anything moves, the daily sales rollups for those days are rebuilt and
+marked ``archived``. From then on they are frozen and carry the totals that
+dashboards and charts report for the archived period.
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.cache import invalidate
+from analytics.models import DailySalesRollup
+from analytics.rollups import rebuild_sales_rollups
+from inventory.models import ArchivedStockMovement, StockMovement
+from vior_health_backend.archive import move_rows
+
+from .models import ArchivedSale, ArchivedSaleItem, Sale, SaleItem
+
+CLOSED_STATUSES = ('completed', 'cancelled', 'refunded')
+# Dashboards compare this month with last month straight from the sales table.
+MIN_MONTHS = 3
+
+
+def archive_cutoff(months, today=None):
+    """First day of the month ``months`` months before ``today``."""
+    today = today or timezone.localdate()
+    month = today.month - months
+    return today.replace(year=today.year + (month - 1) // 12, month=(month - 1) % 12 + 1, day=1)
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def archivable_sales(cutoff):
+    # Sales a lab test points at stay hot: the reference must keep resolving.
+    return Sale.objects.filter(
+        created_at__lt=_start_of(cutoff), status__in=CLOSED_STATUSES, lab_tests__isnull=True,
+    )
+
+
+def archivable_movements(cutoff):
+    return StockMovement.objects.filter(created_at__lt=_start_of(cutoff))
+
+
+def _batches(queryset, batch_size):
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+
+
+def archive(months, batch_size=500, pause=0.0, log=None):
+    """Archive everything older than ``months`` months. Returns counts per table."""
+    if months < MIN_MONTHS:
+        raise ValueError(f'Sales from the last {MIN_MONTHS} months must stay in the sales table')
+    cutoff = archive_cutoff(months)
+    log = log or (lambda message: None)
+
+    # Freeze the totals first, so reports stay exact while rows move.
+    rebuild_sales_rollups(end_date=cutoff - timedelta(days=1))
+    DailySalesRollup.objects.filter(date__lt=cutoff, archived=False).update(archived=True)
+
+    counts = {'sales': 0, 'sale_items': 0, 'stock_movements': 0}
+    for ids in _batches(archivable_sales(cutoff), batch_size):
+        with transaction.atomic():
+            # Sales before items: archived items point at archived sales.
+            # Foreign keys are checked at commit, when both moves are done.
+            move_rows(Sale, ArchivedSale, 'id', ids)
+            counts['sale_items'] += move_rows(SaleItem, ArchivedSaleItem, 'sale_id', ids)
+            counts['sales'] += len(ids)
+        log(f'{counts["sales"]} sales archived')
+        time.sleep(pause)
+
+    for ids in _batches(archivable_movements(cutoff), batch_size):
+        with transaction.atomic():
+            counts['stock_movements'] += move_rows(StockMovement, ArchivedStockMovement, 'id', ids)
+        log(f'{counts["stock_movements"]} stock movements archived')
+        time.sleep(pause)
+
+    # Raw moves send no signals.
+    invalidate('sales.Sale', 'analytics.DailySalesRollup')
+    return counts
@@ -0,0 +1,15 @@
+"""
+Async version of ``SaleViewSet.statistics``, served when ``ASYNC_VIEWS`` is
+on (see ``analytics.async_views``).
+"""
+from vior_health_backend.asyncviews import async_api_view, gather_queries
+from vior_health_backend.routers import report_grade
+
+from .views import statistics_payload, statistics_queries
+
+
+@async_api_view
+@report_grade
+async def statistics(request):
+    days = int(request.query_params.get('days', 30))
+    return statistics_payload(await gather_queries(**statistics_queries(days)))
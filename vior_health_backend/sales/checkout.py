@@ -0,0 +1,220 @@
+"""
+Sale creation shared by ``create_sale`` and the offline ``sync`` endpoint.
+
+``sync_sales`` applies a batch of sales a till recorded while offline. The
+whole batch is one transaction and a fixed number of queries: products,
+customers and already-synced client ids are read once, and sales, items and
+stock levels are written in bulk. Each sale's ``client_id`` becomes its
+``idempotency_key``, so resending a batch after a dropped connection reports
+the earlier sales as duplicates, archived ones included. Keys are per
+cashier, like the ``Idempotency-Key`` header of ``create_sale``, and a
+cashier's syncs run one at a time (their user row is locked), so concurrent
+retries of a batch cannot both insert it.
+
+Stock that ran out while the till was offline is handled by the stock policy:
+
+- ``allow_negative``: the sale is recorded as it happened, stock may go below
+  zero, and the sale is flagged with ``stock_conflict`` for review.
+- ``reject_line``: lines the stock cannot cover are left out (and reported);
+  the rest of the sale is recorded and flagged. A sale with no line left is
+  rejected.
+
+A synced sale belongs to the day the till recorded it: its ``created_at``
+is set to ``recorded_at``, so dashboards, rollups and archiving count it on
+that day rather than the day it reached the server. Rollups of closed days
+that gain sales are rebuilt. Days already archived are frozen, so a sale
+recorded on one of them keeps the sync time instead.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from accounts.models import User
+from analytics.cache import invalidate
+from analytics.models import DailySalesRollup
+from analytics.rollups import rebuild_sales_rollups
+from inventory.models import Product
+from realtime.signals import sales_changed, stock_changed
+from sequences.numbering import document_numbers
+
+from .models import ArchivedSale, Customer, Sale, SaleItem
+
+STOCK_POLICIES = ('allow_negative', 'reject_line')
+
+
+def invoice_numbers(count=1):
+    """The next ``count`` invoice numbers for today (``INVYYYYmmddNNNN``)."""
+    return document_numbers('INV', count)
+
+
+def sale_line(product, item_data):
+    """An unsaved ``SaleItem`` for one requested line, priced like ``create_sale``."""
+    quantity = int(item_data['quantity'])
+    unit_price = Decimal(str(item_data.get('unit_price', product.unit_price)))
+    discount = Decimal(str(item_data.get('discount', 0)))
+    return SaleItem(
+        product=product, quantity=quantity, unit_price=unit_price,
+        discount=discount, total=(unit_price * quantity) - discount,
+    )
+
+
+def build_sale(lines, data, cashier, invoice_number, **fields):
+    """An unsaved ``Sale`` with totals computed from ``lines``."""
+    subtotal = sum((line.total for line in lines), Decimal('0.00'))
+    tax = data.get('tax', Decimal('0.00'))
+    discount = data.get('discount', Decimal('0.00'))
+    total = subtotal + tax - discount
+    amount_paid = data['amount_paid']
+    return Sale(
+        invoice_number=invoice_number,
+        customer_id=data.get('customer'),
+        subtotal=subtotal,
+        tax=tax,
+        discount=discount,
+        total=total,
+        payment_method=data['payment_method'],
+        amount_paid=amount_paid,
+        change_amount=amount_paid - total if amount_paid >= total else Decimal('0.00'),
+        status='completed',
+        notes=data.get('notes', ''),
+        cashier=cashier,
+        **fields
+    )
+
+
+def _plan_sale(data, products, customers, stock):
+    """
+    Lines to record for one offline sale, checked against the running
+    ``stock`` levels of this batch. Returns ``(lines, rejected, conflict)``;
+    ``rejected`` holds ``{'product', 'quantity', 'error'}`` per dropped line.
+    """
+    if data.get('customer') and data['customer'] not in customers:
+        raise ValueError('Customer not found')
+    lines, rejected, conflict = [], [], False
+    for item_data in data['items']:
+        product = products.get(item_data['product'])
+        if product is None:
+            raise ValueError(f"Product {item_data['product']} not found")
+        line = sale_line(product, item_data)
+        if stock[product.pk] < line.quantity:
+            conflict = True
+            if data['stock_policy'] == 'reject_line':
+                rejected.append({
+                    'product': product.pk, 'quantity': line.quantity,
+                    'error': f'Insufficient stock for {product.name}',
+                })
+                continue
+        stock[product.pk] -= line.quantity
+        lines.append(line)
+    return lines, rejected, conflict
+
+
+def _backdate(sales):
+    """
+    Move ``created_at`` of just-created ``sales`` to their ``recorded_at``,
+    except onto archived days. Returns the closed days that gained sales.
+    """
+    days = {sale.pk: timezone.localdate(sale.recorded_at) for sale in sales}
+    frozen = set(DailySalesRollup.objects.filter(
+        date__in=set(days.values()), archived=True,
+    ).values_list('date', flat=True))
+    moved = [sale for sale in sales if days[sale.pk] not in frozen]
+    if not moved:
+        return set()
+    Sale.objects.filter(pk__in=[sale.pk for sale in moved]).update(created_at=Case(
+        *(When(pk=sale.pk, then=Value(sale.recorded_at)) for sale in moved),
+    ))
+    for sale in moved:
+        sale.created_at = sale.recorded_at
+    today = timezone.localdate()
+    return {days[sale.pk] for sale in moved if days[sale.pk] < today}
+
+
+def sync_sales(sales, cashier, stock_policy):
+    """
+    Record a batch of validated offline sales (``SyncSaleSerializer`` data).
+    Returns ``{client_id: result}`` where ``result['status']`` is ``created``,
+    ``duplicate`` or ``rejected``.
+    """
+    results = {}
+    client_ids = [sale['client_id'] for sale in sales]
+    product_ids = {item['product'] for sale in sales for item in sale['items']}
+
+    with transaction.atomic():
+        # One sync per cashier at a time: a retry sent while the first try is
+        # still running waits here, then finds its sales and reports them as
+        # duplicates instead of failing on the unique constraint.
+        User.objects.select_for_update().filter(pk=cashier.pk).values_list('pk', flat=True).get()
+        existing = {
+            sale.idempotency_key: sale
+            for model in (Sale, ArchivedSale)
+            for sale in model.objects.filter(cashier=cashier, idempotency_key__in=client_ids)
+            .only('id', 'invoice_number', 'idempotency_key')
+        }
+        products = Product.objects.select_for_update().in_bulk(product_ids)
+        customers = set(Customer.objects.filter(
+            pk__in=[sale['customer'] for sale in sales if sale.get('customer')],
+        ).values_list('pk', flat=True))
+        stock = {pk: product.quantity for pk, product in products.items()}
+
+        planned = []
+        for data in sorted(sales, key=lambda sale: sale['recorded_at']):
+            client_id = data['client_id']
+            if client_id in results:
+                continue  # Sent twice in this batch: the first one counts.
+            if client_id in existing:
+                original = existing[client_id]
+                results[client_id] = {
+                    'status': 'duplicate', 'sale_id': original.pk, 'invoice_number': original.invoice_number,
+                }
+                continue
+            try:
+                lines, rejected, conflict = _plan_sale(
+                    dict(data, stock_policy=stock_policy), products, customers, stock,
+                )
+            except ValueError as e:
+                results[client_id] = {'status': 'rejected', 'error': str(e)}
+                continue
+            if not lines:
+                results[client_id] = {'status': 'rejected', 'error': 'No line could be fulfilled', 'rejected_lines': rejected}
+                continue
+            results[client_id] = {'status': 'created', 'rejected_lines': rejected}
+            planned.append((data, lines, conflict))
+
+        if not planned:
+            return results
+
+        numbers = invoice_numbers(len(planned))
+        new_sales = [
+            build_sale(
+                lines, data, cashier, invoice_number,
+                idempotency_key=data['client_id'],
+                recorded_at=min(data['recorded_at'], timezone.now()),
+                stock_conflict=conflict,
+            )
+            for (data, lines, conflict), invoice_number in zip(planned, numbers)
+        ]
+        Sale.objects.bulk_create(new_sales)
+        backdated = _backdate(new_sales)
+
+        items, sold = [], Counter()
+        for sale, (data, lines, conflict) in zip(new_sales, planned):
+            results[data['client_id']].update(sale_id=sale.pk, invoice_number=sale.invoice_number)
+            for line in lines:
+                line.sale = sale
+                items.append(line)
+                sold[line.product_id] += line.quantity
+        SaleItem.objects.bulk_create(items, batch_size=500)
+        Product.objects.filter(pk__in=sold).update(quantity=F('quantity') - Case(
+            *(When(pk=pk, then=Value(quantity)) for pk, quantity in sold.items()),
+        ))
+        if backdated:
+            rebuild_sales_rollups(min(backdated), max(backdated))
+        # Bulk writes send no post_save signals.
+        transaction.on_commit(lambda: invalidate('sales.Sale', 'inventory.Product'))
+        sales_changed(new_sales, 'sale.created')
+        stock_changed(list(sold))
+    return results
@@ -0,0 +1,241 @@
+"""
+ESC/POS receipt rendering for 80 mm thermal printers.
+
+Receipts follow the layout of ``ThermalReceipt.jsx`` but are produced as raw
+printer bytes, so the POS can write them straight to the printer instead of
+going through a browser print dialog. The header and footer only depend on
+``PharmacySettings``; they are compiled once per settings revision and reused
+for every receipt.
+"""
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.conf import settings as django_settings
+from django.utils import timezone
+
+from accounts.models import PharmacySettings
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@'
+CODEPAGE_PC437 = ESC + b't\x00'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+SIZE_NORMAL = GS + b'!\x00'
+SIZE_DOUBLE = GS + b'!\x11'
+SIZE_TALL = GS + b'!\x01'
+FEED_AND_CUT = GS + b'V\x42\x04'
+
+DEFAULT_WIDTH = 48  # Font A characters per line on 80 mm paper
+ENCODING = 'cp437'
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+def _columns(left, right, width):
+    """Left text and right-aligned text on one line, truncating the left side."""
+    room = width - len(right) - 1
+    if len(left) > room:
+        left = left[:max(room, 0)]
+    return f'{left}{" " * (width - len(left) - len(right))}{right}'
+
+
+class _Writer:
+    def __init__(self, width):
+        self.width = width
+        self.parts = []
+
+    def raw(self, data):
+        self.parts.append(data)
+
+    def line(self, text=''):
+        self.parts.append(text.encode(ENCODING, 'replace') + b'\n')
+
+    def lines(self, text):
+        for line in text.splitlines():
+            self.line(line.strip()[:self.width])
+
+    def columns(self, left, right):
+        self.line(_columns(left, right, self.width))
+
+    def rule(self, char='-'):
+        self.line(char * self.width)
+
+    def bytes(self):
+        return b''.join(self.parts)
+
+
+def _compile_header(pharmacy, width):
+    out = _Writer(width)
+    out.raw(INIT + CODEPAGE_PC437 + ALIGN_CENTER + BOLD_ON + SIZE_DOUBLE)
+    out.line((pharmacy.pharmacy_name or 'VIOR HEALTH PHARMACY')[:width // 2])
+    out.raw(SIZE_NORMAL + BOLD_OFF)
+    if pharmacy.business_registration_number:
+        out.line(f'Reg No: {pharmacy.business_registration_number}')
+    if pharmacy.tax_id:
+        out.line(f'TIN: {pharmacy.tax_id}')
+    for value in (pharmacy.address_line1, pharmacy.address_line2):
+        if value:
+            out.line(value[:width])
+    if pharmacy.city or pharmacy.state_province:
+        place = ', '.join(filter(None, [pharmacy.city, pharmacy.state_province]))
+        out.line(f'{place} {pharmacy.postal_code or ""}'.strip()[:width])
+    if pharmacy.country:
+        out.line(pharmacy.country)
+    out.rule()
+    if pharmacy.phone:
+        out.line(f'Phone: {pharmacy.phone}')
+    if pharmacy.email:
+        out.line(f'Email: {pharmacy.email}'[:width])
+    if pharmacy.website:
+        out.line(f'Web: {pharmacy.website}'[:width])
+    if pharmacy.receipt_header:
+        out.rule('=')
+        out.raw(BOLD_ON)
+        out.lines(pharmacy.receipt_header)
+        out.raw(BOLD_OFF)
+        out.rule('=')
+    out.raw(ALIGN_LEFT)
+    return out.bytes()
+
+
+def _compile_footer(pharmacy, width):
+    out = _Writer(width)
+    out.raw(ALIGN_CENTER)
+    out.rule()
+    out.raw(BOLD_ON)
+    out.lines(pharmacy.receipt_footer or 'THANK YOU FOR YOUR PURCHASE!')
+    out.raw(BOLD_OFF)
+    if pharmacy.business_hours:
+        out.line()
+        out.line('Business Hours')
+        out.lines(pharmacy.business_hours)
+    out.line()
+    out.line('Powered by VIOR Health')
+    out.raw(ALIGN_LEFT + FEED_AND_CUT)
+    return out.bytes()
+
+
+def compiled_segments(pharmacy, width=DEFAULT_WIDTH):
+    """Return ``(header, footer)`` bytes, compiled once per settings revision."""
+    key = (pharmacy.pk, pharmacy.updated_at, width)
+    segments = _segments.get(key)
+    if segments is None:
+        segments = (_compile_header(pharmacy, width), _compile_footer(pharmacy, width))
+        with _segments_lock:
+            # Older revisions are never requested again.
+            _segments.clear()
+            _segments[key] = segments
+    return segments
+
+
+def _render_body(sale, symbol, width):
+    def money(amount):
+        return f'{symbol} {amount:.2f}'
+
+    out = _Writer(width)
+    out.raw(ALIGN_CENTER + BOLD_ON)
+    out.line('SALES RECEIPT')
+    out.raw(BOLD_OFF + ALIGN_LEFT)
+    out.columns('Invoice No', sale.invoice_number)
+    out.columns('Date & Time', timezone.localtime(sale.created_at).strftime('%b %d, %Y %I:%M %p'))
+    if sale.customer_id:
+        out.columns('Customer', sale.customer.name)
+    out.columns('Cashier', sale.cashier.username if sale.cashier_id else 'N/A')
+    out.columns('Payment', sale.payment_method.upper())
+    out.rule()
+
+    out.raw(BOLD_ON)
+    out.line('ITEMS PURCHASED')
+    out.raw(BOLD_OFF)
+    for item in sale.items.all():
+        out.line(item.product.name[:width])
+        out.columns(f'  {item.quantity} x {money(item.unit_price)}', money(item.total))
+        if item.discount > 0:
+            out.line(f'  Discount Applied: -{money(item.discount)}')
+    out.rule()
+
+    out.columns('Subtotal', money(sale.subtotal))
+    if sale.discount > 0:
+        out.columns('Discount', f'-{money(sale.discount)}')
+    if sale.tax > 0:
+        out.columns('Tax (VAT)', money(sale.tax))
+    out.raw(BOLD_ON + SIZE_TALL)
+    out.columns('GRAND TOTAL', money(sale.total))
+    out.raw(SIZE_NORMAL + BOLD_OFF)
+    out.columns('Amount Paid', money(sale.amount_paid))
+    if sale.change_amount > 0:
+        out.columns('Change', money(sale.change_amount))
+
+    if sale.notes:
+        out.rule()
+        out.line('Special Notes')
+        out.lines(sale.notes)
+    return out.bytes()
+
+
+def render_receipt(sale, pharmacy=None, width=DEFAULT_WIDTH):
+    """
+    Render one sale as ESC/POS bytes.
+
+    ``sale`` should come with ``customer``, ``cashier`` and ``items__product``
+    loaded (see ``sales.views.receipt_queryset``), otherwise each item costs
+    a query.
+    """
+    pharmacy = pharmacy or PharmacySettings.get_settings()
+    header, footer = compiled_segments(pharmacy, width)
+    symbol = pharmacy.currency_symbol or 'TSH'
+    return header + _render_body(sale, symbol, width) + footer
+
+
+def render_receipts(sales, pharmacy=None, width=DEFAULT_WIDTH):
+    """Render several sales as one byte stream, each ending with a cut."""
+    pharmacy = pharmacy or PharmacySettings.get_settings()
+    return b''.join(render_receipt(sale, pharmacy, width) for sale in sales)
+
+
+class FilePrinter:
+    """Append receipts to a file or printer device such as ``/dev/usb/lp0``."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, data):
+        with open(self.path, 'ab') as fh:
+            fh.write(data)
+
+
+class NetworkPrinter:
+    """Send receipts to a network printer's raw port (usually 9100)."""
+
+    def __init__(self, host, port=9100, timeout=5):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def send(self, data):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as conn:
+            conn.sendall(data)
+
+
+def get_printer(url=None):
+    """
+    Build the printer named by ``RECEIPT_PRINTER``.
+
+    Accepts ``tcp://host[:port]``, ``file:///dev/usb/lp0`` or a plain path.
+    Returns None when no printer is configured.
+    """
+    url = url if url is not None else getattr(django_settings, 'RECEIPT_PRINTER', '')
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'tcp':
+        return NetworkPrinter(parsed.hostname, parsed.port or 9100)
+    if parsed.scheme == 'file':
+        return FilePrinter(parsed.path)
+    return FilePrinter(url)
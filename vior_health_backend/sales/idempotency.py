@@ -0,0 +1,103 @@
+"""
+Safe retries for POST endpoints that move money or stock.
+
+A client sends a fresh ``Idempotency-Key`` header (a UUID) with each
+operation and the same key when it retries it, e.g. after a timeout on a
+flaky connection. The first successful response is stored in
+``IdempotencyKey`` in the same transaction as the work itself. A retry is
+answered from that row with one indexed lookup, without running the view
+again, and carries an ``Idempotent-Replayed: true`` header.
+
+- Keys are per user. Reusing a key for a different request body or URL is
+  refused with 422.
+- Only 2xx responses are stored. After a validation error nothing changed,
+  so a retry with the same key runs normally.
+- A concurrent retry waits for the original's transaction and then replays
+  its response (the unique ``(user, key)`` constraint serialises them).
+- Rows older than ``IDEMPOTENCY_KEY_TTL_DAYS`` are deleted by the
+  ``purge-idempotency-keys`` schedule.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_key(request):
+    return request.headers.get(HEADER) or None
+
+
+def request_hash(request):
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _replay(record, fingerprint):
+    if record.request_hash != fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_func):
+    """Make a viewset action replay its response for a repeated ``Idempotency-Key``."""
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = idempotency_key(request)
+        if key is None:
+            return view_func(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fingerprint = request_hash(request)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is not None:
+            return _replay(record, fingerprint)
+
+        with transaction.atomic():
+            record, created = IdempotencyKey.objects.get_or_create(
+                user=request.user, key=key,
+                defaults={
+                    'endpoint': f'{request.method} {request.path}'[:255],
+                    'request_hash': fingerprint, 'status_code': 0, 'response': {},
+                },
+            )
+            if not created:
+                # A concurrent request with this key committed first.
+                return _replay(record, fingerprint)
+
+            response = view_func(self, request, *args, **kwargs)
+            if isinstance(response, Response) and status.is_success(response.status_code):
+                record.status_code = response.status_code
+                record.response = response.data
+                record.save(update_fields=['status_code', 'response'])
+            else:
+                record.delete()
+        return response
+    return wrapper
+
+
+def purge_idempotency_keys(older_than_days=None):
+    """Delete stored responses past their retention. Returns the row count."""
+    days = settings.IDEMPOTENCY_KEY_TTL_DAYS if older_than_days is None else older_than_days
+    deleted, _ = IdempotencyKey.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
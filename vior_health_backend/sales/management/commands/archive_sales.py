@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.archive import MIN_MONTHS, archivable_movements, archivable_sales, archive, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move closed sales and stock movements older than N months to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=settings.ARCHIVE_AFTER_MONTHS,
+                            help='Keep this many whole months (plus the current one) hot')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Seconds to wait between batches, leaving room for checkout writes')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        if options['months'] < MIN_MONTHS:
+            raise CommandError(f'--months must be at least {MIN_MONTHS}')
+
+        cutoff = archive_cutoff(options['months'])
+        if options['dry_run']:
+            self.stdout.write(
+                f'Before {cutoff}: {archivable_sales(cutoff).count()} sales, '
+                f'{archivable_movements(cutoff).count()} stock movements'
+            )
+            return
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        counts = archive(options['months'], batch_size=options['batch_size'], pause=options['pause'], log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {counts["sales"]} sales ({counts["sale_items"]} items) and '
+            f'{counts["stock_movements"]} stock movements from before {cutoff}'
+        ))
@@ -0,0 +1,292 @@
+import json
+import logging
+import multiprocessing
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventory.models import Product
+from prescriptions.models import Prescription
+
+LOCK_ERRORS = re.compile(r'database is locked|lock timeout|could not obtain lock|deadlock', re.I)
+INVOICE_COLLISION = re.compile(r'invoice_number|duplicate key', re.I)
+SERVER_DB_TIME = re.compile(r'db;dur=([\d.]+)')
+
+
+class TestClientTransport:
+    """Send requests in-process through the Django test client."""
+
+    def __init__(self, token):
+        from django.test import Client
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def post(self, path, payload):
+        response = self.client.post(f'/api{path}', payload, content_type='application/json')
+        return response.status_code, response.content.decode(errors='replace'), response.get('Server-Timing', '')
+
+
+class HttpTransport:
+    """Send requests to a running server."""
+
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def post(self, path, payload):
+        request = urllib.request.Request(
+            f'{self.base_url}{path}',
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.token}'},
+            method='POST',
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, response.read().decode(errors='replace'), response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read().decode(errors='replace'), exc.headers.get('Server-Timing', '')
+        except (urllib.error.URLError, OSError) as exc:
+            return 0, str(exc), ''
+
+
+def run_worker(config):
+    """Post carts until the deadline or request budget runs out; return samples."""
+    rng = random.Random(config['seed'])
+    if config['url']:
+        transport = HttpTransport(config['url'], config['token'])
+    else:
+        transport = TestClientTransport(config['token'])
+
+    prescriptions = list(config['prescriptions'])
+    samples = []
+    deadline = time.monotonic() + config['duration'] if config['duration'] else None
+    sent = 0
+    try:
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if deadline is None and sent >= config['requests']:
+                break
+            sent += 1
+
+            if prescriptions and rng.random() < config['dispense_ratio']:
+                endpoint = 'dispense'
+                path = f'/prescriptions/prescriptions/{prescriptions.pop()}/dispense/'
+                payload = {'create_sale': True, 'payment_method': 'cash'}
+            else:
+                endpoint = 'create_sale'
+                path = '/sales/sales/create_sale/'
+                items = rng.sample(config['products'], k=min(rng.randint(1, config['max_items']), len(config['products'])))
+                payload = {
+                    'items': [{'product': product_id, 'quantity': rng.randint(1, 3)} for product_id in items],
+                    'payment_method': rng.choice(['cash', 'mobile', 'card']),
+                    'amount_paid': '10000000.00',
+                }
+
+            started = time.perf_counter()
+            status, body, server_timing = transport.post(path, payload)
+            elapsed = time.perf_counter() - started
+            db_time = SERVER_DB_TIME.search(server_timing)
+            samples.append({
+                'endpoint': endpoint,
+                'status': status,
+                'latency': elapsed,
+                'db_ms': float(db_time.group(1)) if db_time else None,
+                'error': body[:300] if status >= 400 or status == 0 else '',
+            })
+    finally:
+        if not config['url']:
+            connections.close_all()
+    return samples
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = 'Concurrent checkout load test against create_sale and dispense'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent tills')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--url', default='', help='Base API URL of a running server, e.g. http://127.0.0.1:8000/api. '
+                                                      'Without it requests go through the in-process test client.')
+        parser.add_argument('--username', default='', help='Login for --url mode (defaults to a local token for the first admin)')
+        parser.add_argument('--password', default='')
+        parser.add_argument('--duration', type=float, default=0, help='Seconds to run (overrides --requests)')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per worker')
+        parser.add_argument('--dispense-ratio', type=float, default=0.1)
+        parser.add_argument('--product-pool', type=int, default=50,
+                            help='Carts draw from this many products; smaller pools mean more row contention')
+        parser.add_argument('--max-items', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true')
+        parser.add_argument('--allow-writes', action='store_true',
+                            help='Needed without --url: in-process tills write real sales, stock changes and '
+                                 'dispensed prescriptions to the configured database')
+
+    def handle(self, *args, **options):
+        if not options['url'] and not options['allow_writes']:
+            # Nothing is rolled back: the tills commit like real ones.
+            raise CommandError(
+                f'In-process mode writes real sales to {connections["default"].settings_dict["NAME"]}. '
+                'Point DB_NAME at a copy or a benchmark database and pass --allow-writes.'
+            )
+        if options['verbosity'] < 2:
+            # Every rejected cart would otherwise log a 'Bad Request' line.
+            logging.getLogger('django.request').setLevel(logging.ERROR)
+            logging.getLogger('vior_health.requests').setLevel(logging.ERROR)
+
+        products = list(
+            Product.objects.filter(is_active=True, quantity__gt=0)
+            .order_by('id').values_list('id', flat=True)[:options['product_pool']]
+        )
+        if not products:
+            raise CommandError('No products in stock. Seed data first (manage.py seed_benchmark).')
+
+        token = self.get_token(options)
+        # Stock that was already negative (earlier runs, allow_negative
+        # offline syncs) is not this run's oversell.
+        already_negative = set(Product.objects.filter(quantity__lt=0).values_list('id', flat=True))
+        workers = options['workers']
+        pending = list(
+            Prescription.objects.filter(status='pending').order_by('id').values_list('id', flat=True)
+        )
+        configs = [{
+            'url': options['url'],
+            'token': token,
+            'seed': options['seed'] + index,
+            'products': products,
+            # Each worker dispenses its own prescriptions; tills never race
+            # for the same one.
+            'prescriptions': pending[index::workers],
+            'dispense_ratio': options['dispense_ratio'],
+            'max_items': options['max_items'],
+            'duration': options['duration'],
+            'requests': options['requests'],
+        } for index in range(workers)]
+
+        started = time.perf_counter()
+        if options['mode'] == 'process':
+            connections.close_all()  # never share a connection across fork
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                samples = [s for chunk in pool.map(run_worker, configs) for s in chunk]
+        else:
+            results = [None] * workers
+
+            def target(index):
+                results[index] = run_worker(configs[index])
+
+            threads = [threading.Thread(target=target, args=(i,)) for i in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            samples = [s for chunk in results if chunk for s in chunk]
+        wall_time = time.perf_counter() - started
+
+        report = self.build_report(samples, wall_time, workers, already_negative)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+    def get_token(self, options):
+        if options['url'] and options['username']:
+            request = urllib.request.Request(
+                f'{options["url"].rstrip("/")}/accounts/login/',
+                data=json.dumps({'username': options['username'], 'password': options['password']}).encode(),
+                headers={'Content-Type': 'application/json'},
+                method='POST',
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    return json.loads(response.read())['access']
+            except urllib.error.URLError as exc:
+                raise CommandError(f'Login failed: {exc}')
+
+        from accounts.authentication import tokens_for
+        from accounts.models import User
+
+        user = User.objects.filter(role='admin', is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError('No active admin user to run the load test as')
+        return str(tokens_for(user).access_token)
+
+    def build_report(self, samples, wall_time, workers, already_negative=()):
+        oversold = list(
+            Product.objects.filter(quantity__lt=0).exclude(pk__in=already_negative)
+            .values('id', 'name', 'quantity')
+        )
+        report = {
+            'workers': workers,
+            'wall_time_s': round(wall_time, 2),
+            'endpoints': {},
+            'oversold_products': oversold,
+            'already_negative': len(already_negative),
+        }
+        for endpoint in sorted({s['endpoint'] for s in samples}):
+            rows = [s for s in samples if s['endpoint'] == endpoint]
+            ok = [s for s in rows if 200 <= s['status'] < 300]
+            errors = [s['error'] for s in rows if s['error']]
+            latencies = [s['latency'] * 1000 for s in ok]
+            db_times = [s['db_ms'] for s in ok if s['db_ms'] is not None]
+            failures = Counter(
+                'lock' if LOCK_ERRORS.search(e)
+                else 'invoice_collision' if INVOICE_COLLISION.search(e)
+                else 'insufficient_stock' if 'Insufficient stock' in e
+                else 'other'
+                for e in errors
+            )
+            report['endpoints'][endpoint] = {
+                'requests': len(rows),
+                'succeeded': len(ok),
+                'throughput_per_s': round(len(ok) / wall_time, 2) if wall_time else 0,
+                'p50_ms': round(statistics.median(latencies), 2) if latencies else 0,
+                'p95_ms': round(_percentile(latencies, 95), 2),
+                'p99_ms': round(_percentile(latencies, 99), 2),
+                'server_db_p95_ms': round(_percentile(db_times, 95), 2),
+                'lock_errors': failures['lock'],
+                'invoice_collisions': failures['invoice_collision'],
+                'insufficient_stock': failures['insufficient_stock'],
+                'other_errors': failures['other'],
+                'sample_errors': list(dict.fromkeys(errors))[:3],
+            }
+        return report
+
+    def print_report(self, report):
+        self.stdout.write(f'{report["workers"]} workers, {report["wall_time_s"]}s\n')
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            self.stdout.write(
+                f'  {stats["succeeded"]}/{stats["requests"]} ok, {stats["throughput_per_s"]}/s\n'
+                f'  latency p50 {stats["p50_ms"]}ms  p95 {stats["p95_ms"]}ms  p99 {stats["p99_ms"]}ms\n'
+                f'  server db time p95 {stats["server_db_p95_ms"]}ms (includes lock waits)\n'
+                f'  lock errors {stats["lock_errors"]}, invoice collisions {stats["invoice_collisions"]}, '
+                f'insufficient stock {stats["insufficient_stock"]}, other {stats["other_errors"]}'
+            )
+            for error in stats['sample_errors']:
+                self.stdout.write(f'    e.g. {error[:160]}')
+
+        if report['oversold_products']:
+            self.stdout.write(self.style.ERROR(
+                f'\nOVERSELL: {len(report["oversold_products"])} products went negative during the run'
+            ))
+            for product in report['oversold_products'][:10]:
+                self.stdout.write(f'  #{product["id"]} {product["name"]}: {product["quantity"]}')
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNo oversell (no product went negative during the run)'))
+        if report['already_negative']:
+            self.stdout.write(f'({report["already_negative"]} products were already negative before the run)')
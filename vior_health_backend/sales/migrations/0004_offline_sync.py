@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedsale',
+            name='recorded_at',
+            field=models.DateTimeField(blank=True, help_text='Till time of a sale recorded offline', null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedsale',
+            name='stock_conflict',
+            field=models.BooleanField(default=False, help_text='Sold offline without enough stock on record'),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='recorded_at',
+            field=models.DateTimeField(blank=True, help_text='Till time of a sale recorded offline', null=True),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='stock_conflict',
+            field=models.BooleanField(default=False, help_text='Sold offline without enough stock on record'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_offline_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedsale',
+            name='refunded_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='archivedsaleitem',
+            name='refunded_quantity',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='sale',
+            name='refunded_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='saleitem',
+            name='refunded_quantity',
+            field=models.IntegerField(default=0),
+        ),
+    ]
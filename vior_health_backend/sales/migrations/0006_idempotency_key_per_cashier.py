@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_refunds'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedsale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='sale',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='archivedsale',
+            constraint=models.UniqueConstraint(fields=('cashier', 'idempotency_key'), name='unique_archived_sale_idempotency_key_per_cashier'),
+        ),
+        migrations.AddConstraint(
+            model_name='sale',
+            constraint=models.UniqueConstraint(fields=('cashier', 'idempotency_key'), name='unique_sale_idempotency_key_per_cashier'),
+        ),
+    ]
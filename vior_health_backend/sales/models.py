@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
 from inventory.models import Product
 
 class Customer(models.Model):
@@ -39,18 +40,28 @@ class Sale(models.Model):
     tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    refunded_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS)
     amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
     change_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
     notes = models.TextField(blank=True)
     cashier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='sales')
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    recorded_at = models.DateTimeField(null=True, blank=True, help_text='Till time of a sale recorded offline')
+    stock_conflict = models.BooleanField(default=False, help_text='Sold offline without enough stock on record')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'sales'
         ordering = ['-created_at']
+        constraints = [
+            # Keys are chosen by each client, so they only need to be unique per cashier.
+            models.UniqueConstraint(
+                fields=['cashier', 'idempotency_key'], name='unique_sale_idempotency_key_per_cashier',
+            ),
+        ]
     
     def __str__(self):
         return f"Sale #{self.invoice_number}"
@@ -62,9 +73,90 @@ class SaleItem(models.Model):
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
+    refunded_quantity = models.IntegerField(default=0)
     
     class Meta:
         db_table = 'sale_items'
     
     def __str__(self):
         return f"{self.product.name} x {self.quantity}"
+
+
+class ArchivedSale(models.Model):
+    """
+    Closed sale moved out of the hot ``sales`` table by ``manage.py archive_sales``.
+    Keeps the original id
+    """
+    id = models.BigIntegerField(primary_key=True)
+    invoice_number = models.CharField(max_length=50, unique=True)
+    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    tax = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    refunded_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=20, choices=Sale.PAYMENT_METHODS)
+    amount_paid = models.DecimalField(max_digits=10, decimal_places=2)
+    change_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=Sale.STATUS_CHOICES)
+    notes = models.TextField(blank=True)
+    cashier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    recorded_at = models.DateTimeField(null=True, blank=True, help_text='Till time of a sale recorded offline')
+    stock_conflict = models.BooleanField(default=False, help_text='Sold offline without enough stock on record')
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sales_archive'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cashier', 'idempotency_key'], name='unique_archived_sale_idempotency_key_per_cashier',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Sale #{self.invoice_number} (archived)"
+
+
+class ArchivedSaleItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sale = models.ForeignKey(ArchivedSale, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='+')
+    quantity = models.IntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    refunded_quantity = models.IntegerField(default=0)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sale_items_archive'
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a POST made with an ``Idempotency-Key`` header, so a
+    retried request gets the same answer instead of running again
+    """
+    key = models.CharField(max_length=255)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.endpoint})"
@@ -0,0 +1,161 @@
+"""
+Voids and refunds.
+
+Both return stock with ``F()`` updates (one ``UPDATE`` for all products),
+write ``return`` stock movements in bulk and adjust the day's
+``DailySalesRollup`` in place, so reports stay right without a rebuild.
+Reports that read sale items directly (top products) count only completed
+sales and net out ``refunded_quantity`` and ``refunded_share``.
+
+- ``void_sale`` cancels a completed sale that has no refunds: everything goes
+  back to stock and the sale stops counting (status ``cancelled``).
+- ``refund_sale`` refunds some units of some lines, or everything left. The
+  refunded money comes off ``Sale.total`` and is added to
+  ``Sale.refunded_amount``; ``SaleItem.refunded_quantity`` counts the units.
+  When every unit has been refunded the status becomes ``refunded``.
+
+A line's refund is its ``total`` shared out per unit, so refunding a line in
+several steps adds up to exactly its total.
+"""
+from collections import Counter
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from analytics.cache import invalidate
+from analytics.models import DailySalesRollup
+from inventory.models import Product, StockMovement
+from realtime.signals import sales_changed, stock_changed
+
+from .models import Sale, SaleItem
+
+CENT = Decimal('0.01')
+
+
+class RefundError(Exception):
+    pass
+
+
+def _share(item, units):
+    """Money for the first ``units`` units of ``item``."""
+    return (item.total * units / item.quantity).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def refunded_share(item):
+    """Money refunded so far on ``item``: its refunds add up to exactly this."""
+    return _share(item, item.refunded_quantity)
+
+
+def _return_stock(sale, returns, user, reason):
+    """Put ``{item: units}`` back on the shelf. Returns ``(amount, units)``."""
+    amount, units, restock = Decimal('0.00'), 0, Counter()
+    for item, quantity in returns.items():
+        updated = SaleItem.objects.filter(
+            pk=item.pk, refunded_quantity__lte=F('quantity') - quantity,
+        ).update(refunded_quantity=F('refunded_quantity') + quantity)
+        if not updated:
+            raise RefundError(f'Cannot return {quantity} more of {item.product.name}')
+        amount += _share(item, item.refunded_quantity + quantity) - _share(item, item.refunded_quantity)
+        units += quantity
+        restock[item.product_id] += quantity
+
+    Product.objects.filter(pk__in=restock).update(quantity=F('quantity') + Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in restock.items()),
+    ))
+    stock_changed(list(restock))
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            product_id=item.product_id, movement_type='return', quantity=quantity,
+            reference_number=sale.invoice_number, notes=reason, created_by=user,
+        )
+        for item, quantity in returns.items()
+    ])
+    return amount, units
+
+
+def _adjust_rollup(sale, revenue, items, closed):
+    """Take a refund off the rollup of the sale's day (only closed days have one)."""
+    changes = {
+        'revenue': F('revenue') - revenue,
+        'items_sold': F('items_sold') - items,
+        'updated_at': timezone.now(),
+    }
+    if closed:
+        changes.update(
+            tax=F('tax') - sale.tax, discount=F('discount') - sale.discount, sales_count=F('sales_count') - 1,
+        )
+    DailySalesRollup.objects.filter(date=timezone.localdate(sale.created_at)).update(**changes)
+
+
+def _finish(sale, amount, units, units_left, status, reason):
+    """Update the sale and its day's rollup. ``units_left`` is what was unrefunded before this change."""
+    closed = status != 'completed'
+    refunded_amount = amount if status != 'cancelled' else Decimal('0.00')
+    # A sale leaving 'completed' drops out of the totals with whatever it had left.
+    revenue = sale.total if closed else amount
+    Sale.objects.filter(pk=sale.pk).update(
+        status=status,
+        total=F('total') - refunded_amount,
+        refunded_amount=F('refunded_amount') + refunded_amount,
+        notes=f'{sale.notes}\n{reason}'.strip() if reason else sale.notes,
+        updated_at=timezone.now(),
+    )
+    _adjust_rollup(sale, revenue, units_left if closed else units, closed)
+    # F() updates and bulk inserts send no post_save signals.
+    transaction.on_commit(lambda: invalidate('sales.Sale', 'inventory.Product', 'analytics.DailySalesRollup'))
+    sale.refresh_from_db()
+    sales_changed([sale])
+    return sale
+
+
+def _locked(sale):
+    sale = Sale.objects.select_for_update().get(pk=sale.pk)
+    if sale.status != 'completed':
+        raise RefundError(f'Sale is {sale.status}')
+    return sale, list(sale.items.select_related('product'))
+
+
+def void_sale(sale, user, reason=''):
+    """Cancel a completed sale and return all of its stock."""
+    with transaction.atomic():
+        sale, items = _locked(sale)
+        if any(item.refunded_quantity for item in items):
+            raise RefundError('Sale has refunds; refund the remaining items instead')
+        returns = {item: item.quantity for item in items}
+        amount, units = _return_stock(sale, returns, user, reason or f'Void {sale.invoice_number}')
+        return _finish(sale, amount, units, units, 'cancelled', reason)
+
+
+def refund_sale(sale, user, lines=None, reason=''):
+    """
+    Refund ``lines`` (``{sale_item_id: units}``), or every unit not yet
+    refunded when ``lines`` is empty. Returns the sale and the amount refunded.
+    """
+    with transaction.atomic():
+        sale, items = _locked(sale)
+        by_id = {item.pk: item for item in items}
+        if lines:
+            unknown = set(lines) - set(by_id)
+            if unknown:
+                raise RefundError(f'Items {sorted(unknown)} are not part of this sale')
+            if any(quantity <= 0 for quantity in lines.values()):
+                raise RefundError('Refund quantities must be positive')
+            returns = {by_id[pk]: quantity for pk, quantity in lines.items()}
+        else:
+            returns = {
+                item: item.quantity - item.refunded_quantity
+                for item in items if item.quantity > item.refunded_quantity
+            }
+        if not returns:
+            raise RefundError('Nothing left to refund')
+
+        units_left = sum(item.quantity - item.refunded_quantity for item in items)
+        amount, units = _return_stock(sale, returns, user, reason or f'Refund {sale.invoice_number}')
+        if units == units_left:
+            # The last units take whatever is left of the total (sale-level tax included).
+            amount = sale.total
+        amount = min(amount, sale.total)
+        status = 'refunded' if units == units_left else 'completed'
+        return _finish(sale, amount, units, units_left, status, reason), amount
@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Customer, Sale, SaleItem
+from .checkout import STOCK_POLICIES
+from .models import ArchivedSale, Customer, Sale, SaleItem
 
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -13,19 +15,29 @@ class SaleItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = SaleItem
-        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'discount', 'total']
-        read_only_fields = ['total']
+        fields = ['id', 'product', 'product_name', 'quantity', 'unit_price', 'discount', 'total', 'refunded_quantity']
+        read_only_fields = ['total', 'refunded_quantity']
 
 
 class SaleSerializer(serializers.ModelSerializer):
     items = SaleItemSerializer(many=True, read_only=True)
     customer_name = serializers.CharField(source='customer.name', read_only=True)
     cashier_name = serializers.CharField(source='cashier.username', read_only=True)
+    archived = serializers.SerializerMethodField()
 
     class Meta:
         model = Sale
         fields = '__all__'
-        read_only_fields = ['invoice_number', 'created_at', 'updated_at']
+        read_only_fields = ['invoice_number', 'refunded_amount', 'recorded_at', 'created_at', 'updated_at']
+
+    def get_archived(self, obj):
+        return isinstance(obj, ArchivedSale)
+
+    def validate_status(self, value):
+        # Cancelling or refunding has to return stock; only the actions do that.
+        if self.instance is not None and value != self.instance.status:
+            raise serializers.ValidationError("Use the void or refund action to change a sale's status")
+        return value
 
 
 class CreateSaleSerializer(serializers.Serializer):
@@ -49,3 +61,50 @@ class CreateSaleSerializer(serializers.Serializer):
                 raise serializers.ValidationError("Each item must have product and quantity")
         
         return value
+
+
+class SyncSaleItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    discount = serializers.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+
+class SyncSaleSerializer(CreateSaleSerializer):
+    """One sale recorded by a till while offline"""
+    client_id = serializers.CharField(max_length=255)
+    recorded_at = serializers.DateTimeField()
+    items = SyncSaleItemSerializer(many=True, allow_empty=False)
+
+
+class SyncSalesSerializer(serializers.Serializer):
+    sales = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    stock_policy = serializers.ChoiceField(choices=STOCK_POLICIES, required=False)
+
+    def validate_sales(self, value):
+        if len(value) > settings.OFFLINE_SYNC_MAX_BATCH:
+            raise serializers.ValidationError(
+                f"At most {settings.OFFLINE_SYNC_MAX_BATCH} sales per batch"
+            )
+        return value
+
+
+class RefundLineSerializer(serializers.Serializer):
+    item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class RefundSerializer(serializers.Serializer):
+    items = RefundLineSerializer(many=True, required=False)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class PrintReceiptsSerializer(serializers.Serializer):
+    """Receipts to print: ``sales`` (ids) or a ``date`` of completed sales"""
+    sales = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False)
+    date = serializers.DateField(required=False, input_formats=['%Y-%m-%d'])
+
+    def validate(self, attrs):
+        if not attrs.get('sales') and not attrs.get('date'):
+            raise serializers.ValidationError('Provide sales or date')
+        return attrs
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+from jobs.queue import task
+
+from . import archive, idempotency
+
+
+@task('sales.archive', max_attempts=1)
+def archive_old_records(months=None):
+    return archive.archive(months or settings.ARCHIVE_AFTER_MONTHS)
+
+
+@task('sales.purge_idempotency_keys')
+def purge_idempotency_keys(older_than_days=None):
+    return idempotency.purge_idempotency_keys(older_than_days)
@@ -1,3 +1,518 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import PharmacySettings, User
+from analytics.models import DailySalesRollup
+from analytics.rollups import rebuild_sales_rollups
+from analytics.views import top_products_data
+from inventory.models import ArchivedStockMovement, Category, Product, StockMovement
+from laboratory.models import LabTest, TestType
+
+from . import escpos
+from .archive import archive, archive_cutoff
+from .checkout import invoice_numbers
+from .idempotency import purge_idempotency_keys
+from .management.commands.loadtest_checkout import Command as LoadtestCommand
+from .models import ArchivedSale, ArchivedSaleItem, IdempotencyKey, Sale, SaleItem
+from .views import receipt_queryset
+
+
+class EscposReceiptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.pharmacy = PharmacySettings.objects.create(
+            pk=1, pharmacy_name='Test Pharmacy', phone='0700', email='shop@example.com',
+            address_line1='1 Main St', city='Arusha', state_province='AR', postal_code='100',
+            receipt_header='Open on Sundays', receipt_footer='Get well soon', currency_symbol='TSH',
+        )
+        cls.user = User.objects.create_user('cashier1', password='x', role='cashier')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Paracetamol 500mg', category=category, sku='P-1', barcode='111',
+            unit_price=Decimal('500.00'), cost_price=Decimal('300.00'), quantity=100,
+        )
+        cls.sale = cls._sale('INV-1')
+        cls.other_sale = cls._sale('INV-2')
+
+    @classmethod
+    def _sale(cls, invoice):
+        sale = Sale.objects.create(
+            invoice_number=invoice, subtotal=Decimal('1000.00'), total=Decimal('1000.00'),
+            payment_method='cash', amount_paid=Decimal('1500.00'), change_amount=Decimal('500.00'),
+            cashier=cls.user,
+        )
+        SaleItem.objects.create(
+            sale=sale, product=cls.product, quantity=2,
+            unit_price=Decimal('500.00'), total=Decimal('1000.00'),
+        )
+        return sale
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_render_receipt(self):
+        sale = receipt_queryset().get(pk=self.sale.pk)
+        data = escpos.render_receipt(sale, self.pharmacy)
+
+        self.assertTrue(data.startswith(escpos.INIT))
+        self.assertTrue(data.endswith(escpos.FEED_AND_CUT))
+        for text in (b'Test Pharmacy', b'Open on Sundays', b'INV-1', b'Paracetamol 500mg',
+                     b'TSH 1000.00', b'Get well soon'):
+            self.assertIn(text, data)
+        self.assertLess(len(data), 4096)
+
+    def test_header_compiled_once_per_settings_revision(self):
+        header, footer = escpos.compiled_segments(self.pharmacy)
+        self.assertIs(escpos.compiled_segments(self.pharmacy)[0], header)
+
+        self.pharmacy.receipt_header = 'New header'
+        self.pharmacy.save()
+        new_header, _ = escpos.compiled_segments(self.pharmacy)
+        self.assertIsNot(new_header, header)
+        self.assertIn(b'New header', new_header)
+
+    def test_escpos_endpoint(self):
+        response = self.client.get(f'/api/sales/sales/{self.sale.pk}/escpos/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertIn(b'INV-1', response.content)
+
+    def test_escpos_batch_endpoint(self):
+        response = self.client.get('/api/sales/sales/escpos_batch/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.count(escpos.FEED_AND_CUT), 2)
+
+        response = self.client.get('/api/sales/sales/escpos_batch/?date=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+    def test_print_receipts_to_file_printer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'printer.bin')
+            with override_settings(RECEIPT_PRINTER=f'file://{path}'):
+                response = self.client.post(
+                    '/api/sales/sales/print_receipts/', {'sales': [self.sale.pk]}, format='json',
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['printed'], 1)
+
+                today = timezone.localdate(self.sale.created_at).isoformat()
+                response = self.client.post(
+                    '/api/sales/sales/print_receipts/', {'date': today}, format='json',
+                )
+                self.assertEqual(response.data['printed'], 2)
+
+            with open(path, 'rb') as fh:
+                printed = fh.read()
+        self.assertEqual(printed.count(escpos.FEED_AND_CUT), 3)
+        self.assertEqual(printed.count(b'INV-1'), 2)
+
+    @override_settings(RECEIPT_PRINTER='file:///dev/null')
+    def test_print_receipts_rejects_bad_input(self):
+        for body in ({'sales': 'abc'}, {'sales': ['x', 1]}, {'sales': []}, {'date': '01/02/2026'}, {}):
+            with self.subTest(body=body):
+                response = self.client.post('/api/sales/sales/print_receipts/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+
+    @override_settings(RECEIPT_PRINTER='')
+    def test_print_receipts_without_printer(self):
+        response = self.client.post('/api/sales/sales/print_receipts/', {'date': '2024-01-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('manager1', password='x', role='manager')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Ibuprofen', category=category, sku='I-1', barcode='222',
+            unit_price=Decimal('200.00'), cost_price=Decimal('100.00'), quantity=100,
+        )
+        old = timezone.now() - timedelta(days=200)
+        cls.old_sales = [cls._sale(f'OLD-{i}', old) for i in range(3)]
+        cls.pending = cls._sale('OLD-PENDING', old, status='pending')
+        cls.lab_sale = cls._sale('OLD-LAB', old)
+        LabTest.objects.create(
+            test_type=TestType.objects.create(name='Malaria', code='malaria'), test_name='Malaria',
+            patient_name='John', requested_by=cls.user, sale=cls.lab_sale,
+        )
+        cls.recent = cls._sale('NEW-1', timezone.now())
+
+        StockMovement.objects.create(product=cls.product, movement_type='in', quantity=50, created_by=cls.user)
+        old_movement = StockMovement.objects.create(
+            product=cls.product, movement_type='in', quantity=10, created_by=cls.user,
+        )
+        StockMovement.objects.filter(pk=old_movement.pk).update(created_at=old)
+
+    @classmethod
+    def _sale(cls, invoice, created_at, status='completed'):
+        sale = Sale.objects.create(
+            invoice_number=invoice, subtotal=Decimal('400.00'), total=Decimal('400.00'),
+            payment_method='cash', amount_paid=Decimal('400.00'), cashier=cls.user, status=status,
+        )
+        SaleItem.objects.create(
+            sale=sale, product=cls.product, quantity=2, unit_price=Decimal('200.00'), total=Decimal('400.00'),
+        )
+        Sale.objects.filter(pk=sale.pk).update(created_at=created_at)
+        return sale
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archive_cutoff(self):
+        self.assertEqual(archive_cutoff(3, today=date(2026, 2, 15)), date(2025, 11, 1))
+        self.assertEqual(archive_cutoff(12, today=date(2026, 12, 31)), date(2025, 12, 1))
+
+    def test_archive_moves_closed_sales_and_keeps_totals(self):
+        before = self.client.get('/api/analytics/dashboard-stats/').data
+        self.assertEqual(top_products_data(10)[0]['total_quantity'], 10)
+
+        counts = archive(months=3)
+
+        self.assertEqual(counts, {'sales': 3, 'sale_items': 3, 'stock_movements': 1})
+        self.assertEqual(
+            set(Sale.objects.values_list('invoice_number', flat=True)), {'OLD-PENDING', 'OLD-LAB', 'NEW-1'},
+        )
+        self.assertEqual(ArchivedSale.objects.count(), 3)
+        self.assertEqual(ArchivedSaleItem.objects.filter(sale__in=[s.pk for s in self.old_sales]).count(), 3)
+        self.assertEqual(ArchivedStockMovement.objects.count(), 1)
+
+        cache.clear()
+        after = self.client.get('/api/analytics/dashboard-stats/').data
+        self.assertEqual(after['total_revenue'], before['total_revenue'])
+        self.assertEqual(after['total_sales'], before['total_sales'])
+        self.assertEqual(top_products_data(10), [{
+            'product__id': self.product.pk, 'product__name': 'Ibuprofen',
+            'total_quantity': 10, 'total_revenue': Decimal('2000.00'),
+        }])
+        # Running again moves nothing and leaves the frozen totals alone.
+        self.assertEqual(archive(months=3), {'sales': 0, 'sale_items': 0, 'stock_movements': 0})
+
+    def test_include_archived(self):
+        archive(months=3)
+
+        response = self.client.get('/api/sales/sales/')
+        self.assertEqual(response.data['count'], 3)
+
+        response = self.client.get('/api/sales/sales/', {'include_archived': 'true'})
+        self.assertEqual(response.data['count'], 6)
+        results = response.data['results']
+        self.assertEqual(results[0]['invoice_number'], 'NEW-1')
+        self.assertEqual([sale['archived'] for sale in results], [False] * 3 + [True] * 3)
+
+        old = self.old_sales[0]
+        self.assertEqual(self.client.get(f'/api/sales/sales/{old.pk}/').status_code, 404)
+        response = self.client.get(f'/api/sales/sales/{old.pk}/', {'include_archived': 'true'})
+        self.assertEqual(response.data['invoice_number'], old.invoice_number)
+        self.assertEqual(response.data['items'][0]['product_name'], 'Ibuprofen')
+
+        response = self.client.get('/api/inventory/stock-movements/', {'include_archived': 'true'})
+        self.assertEqual([m['archived'] for m in response.data['results']], [False, True])
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cashier2', password='x', role='cashier')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Amoxicillin', category=category, sku='A-1', barcode='333',
+            unit_price=Decimal('300.00'), cost_price=Decimal('150.00'), quantity=10,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, key, quantity=2):
+        return self.client.post('/api/sales/sales/create_sale/', {
+            'items': [{'product': self.product.pk, 'quantity': quantity}],
+            'payment_method': 'cash', 'amount_paid': '1000.00',
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_original_sale(self):
+        first = self.checkout('key-1')
+        self.assertEqual(first.status_code, 201)
+
+        with self.assertNumQueries(1):
+            retry = self.checkout('key-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Sale.objects.get().idempotency_key, 'key-1')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 8)
+
+        self.assertEqual(self.checkout('key-1', quantity=3).status_code, 422)
+        self.assertEqual(self.checkout('key-2').status_code, 201)
+        self.assertEqual(Sale.objects.count(), 2)
+
+    def test_failures_are_not_stored(self):
+        self.assertEqual(self.checkout('key-1', quantity=50).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        Product.objects.filter(pk=self.product.pk).update(quantity=100)
+        self.assertEqual(self.checkout('key-1', quantity=50).status_code, 201)
+
+    def test_sale_key_outlives_stored_response(self):
+        first = self.checkout('key-1')
+        self.assertEqual(purge_idempotency_keys(older_than_days=0), 1)
+
+        retry = self.checkout('key-1')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_keys_are_per_cashier(self):
+        first = self.checkout('key-1')
+        self.client.force_authenticate(User.objects.create_user('cashier3', password='x', role='cashier'))
+        second = self.checkout('key-1')
+
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Sale.objects.filter(idempotency_key='key-1').count(), 2)
+
+    def test_update_stock(self):
+        url = f'/api/inventory/products/{self.product.pk}/update_stock/'
+        body = {'movement_type': 'in', 'quantity': 5}
+        for _ in range(2):
+            response = self.client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY='delivery-7')
+            self.assertEqual(response.data['quantity'], 15)
+        self.assertEqual(StockMovement.objects.filter(product=self.product).count(), 1)
+
+
+class OfflineSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('till1', password='x', role='cashier')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='ORS Sachet', category=category, sku='O-1', barcode='444',
+            unit_price=Decimal('100.00'), cost_price=Decimal('50.00'), quantity=5,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def offline_sale(self, client_id, quantity, minutes_ago):
+        return {
+            'client_id': client_id,
+            'recorded_at': (timezone.now() - timedelta(minutes=minutes_ago)).isoformat(),
+            'items': [{'product': self.product.pk, 'quantity': quantity}],
+            'payment_method': 'cash', 'amount_paid': '1000.00',
+        }
+
+    def sync(self, sales, **extra):
+        return self.client.post('/api/sales/sales/sync/', {'sales': sales, **extra}, format='json')
+
+    def test_batch_allow_negative(self):
+        sales = [self.offline_sale(f'till1-{i}', 2, minutes_ago=10 - i) for i in range(4)]
+        sales.append({'client_id': 'till1-bad', 'items': []})
+        response = self.sync(sales)
+
+        self.assertEqual((response.data['created'], response.data['rejected']), (4, 1))
+        results = response.data['results']
+        self.assertEqual(results['till1-bad']['status'], 'rejected')
+        # Invoice numbers follow the till's order and continue the day's sequence.
+        numbers = [results[f'till1-{i}']['invoice_number'] for i in range(4)]
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(invoice_numbers()[0][-4:], '0005')
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, -3)
+        flagged = Sale.objects.filter(stock_conflict=True).values_list('idempotency_key', flat=True)
+        self.assertEqual(sorted(flagged), ['till1-2', 'till1-3'])
+        self.assertEqual(SaleItem.objects.count(), 4)
+
+        # Resending after a lost response creates nothing new.
+        again = self.sync(sales[:4])
+        self.assertEqual(again.data['duplicates'], 4)
+        self.assertEqual(again.data['results']['till1-0']['sale_id'], results['till1-0']['sale_id'])
+        self.assertEqual(Sale.objects.count(), 4)
+
+    def test_reject_line_policy(self):
+        other = Product.objects.create(
+            name='Zinc', category=self.product.category, sku='Z-1', barcode='555',
+            unit_price=Decimal('50.00'), cost_price=Decimal('20.00'), quantity=10,
+        )
+        first = self.offline_sale('a', 4, minutes_ago=5)
+        second = self.offline_sale('b', 3, minutes_ago=1)
+        second['items'].append({'product': other.pk, 'quantity': 2})
+        response = self.sync([second, first], stock_policy='reject_line')
+
+        results = response.data['results']
+        self.assertEqual(results['a']['rejected_lines'], [])
+        self.assertEqual(results['b']['rejected_lines'][0]['product'], self.product.pk)
+        sale = Sale.objects.get(idempotency_key='b')
+        self.assertTrue(sale.stock_conflict)
+        self.assertEqual(sale.total, Decimal('100.00'))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 1)
+
+    def test_other_tills_keys_are_not_duplicates(self):
+        other = User.objects.create_user('till2', password='x', role='cashier')
+        self.client.force_authenticate(other)
+        self.sync([self.offline_sale('shared-1', 1, minutes_ago=5)])
+
+        self.client.force_authenticate(self.user)
+        response = self.sync([self.offline_sale('shared-1', 1, minutes_ago=3)])
+        self.assertEqual(response.data['results']['shared-1']['status'], 'created')
+        self.assertEqual(Sale.objects.filter(idempotency_key='shared-1').count(), 2)
+
+    def test_archived_sales_are_still_duplicates(self):
+        old_sale = self.offline_sale('old-1', 1, minutes_ago=200 * 24 * 60)
+        self.sync([old_sale])
+        archive(months=3)
+        self.assertTrue(ArchivedSale.objects.filter(idempotency_key='old-1').exists())
+
+        response = self.sync([old_sale])
+        self.assertEqual(response.data['results']['old-1']['status'], 'duplicate')
+        self.assertFalse(Sale.objects.filter(idempotency_key='old-1').exists())
+
+    def test_sales_count_on_the_day_they_were_recorded(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        rebuild_sales_rollups(yesterday, yesterday)
+        minutes_ago = (timezone.localtime() - timezone.localtime().replace(hour=0, minute=0)).seconds // 60 + 60
+        self.sync([self.offline_sale('late-1', 2, minutes_ago=minutes_ago)])
+
+        sale = Sale.objects.get(idempotency_key='late-1')
+        self.assertEqual(sale.created_at, sale.recorded_at)
+        self.assertEqual(timezone.localdate(sale.created_at), yesterday)
+        rollup = DailySalesRollup.objects.get(date=yesterday)
+        self.assertEqual((rollup.sales_count, rollup.revenue, rollup.items_sold), (1, Decimal('200.00'), 2))
+
+    def test_archived_days_stay_frozen(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailySalesRollup.objects.create(date=yesterday, archived=True)
+        minutes_ago = (timezone.localtime() - timezone.localtime().replace(hour=0, minute=0)).seconds // 60 + 60
+        self.sync([self.offline_sale('late-2', 1, minutes_ago=minutes_ago)])
+
+        sale = Sale.objects.get(idempotency_key='late-2')
+        self.assertEqual(timezone.localdate(sale.created_at), timezone.localdate())
+        self.assertEqual(DailySalesRollup.objects.get(date=yesterday).sales_count, 0)
+
+
+class LoadtestCheckoutTests(TestCase):
+    def test_in_process_mode_needs_allow_writes(self):
+        with self.assertRaisesMessage(CommandError, '--allow-writes'):
+            call_command('loadtest_checkout', requests=1)
+
+    def test_oversell_ignores_stock_that_was_already_negative(self):
+        category = Category.objects.create(name='General')
+        old, new = (
+            Product.objects.create(
+                name=name, category=category, sku=name, barcode=name,
+                unit_price=Decimal('10.00'), cost_price=Decimal('5.00'), quantity=-2,
+            )
+            for name in ('old', 'new')
+        )
+        report = LoadtestCommand().build_report([], wall_time=1, workers=1, already_negative={old.pk})
+        self.assertEqual([product['id'] for product in report['oversold_products']], [new.pk])
+        self.assertEqual(report['already_negative'], 1)
+
+
+class RefundTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager2', password='x', role='manager')
+        cls.cashier = User.objects.create_user('cashier3', password='x', role='cashier')
+        category = Category.objects.create(name='General')
+        cls.product = Product.objects.create(
+            name='Cetirizine', category=category, sku='C-1', barcode='666',
+            unit_price=Decimal('100.00'), cost_price=Decimal('50.00'), quantity=50,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        # Yesterday's sale: 3 units at 100 plus 54 tax.
+        self.sale = Sale.objects.create(
+            invoice_number='INV-R1', subtotal=Decimal('300.00'), tax=Decimal('54.00'), total=Decimal('354.00'),
+            payment_method='cash', amount_paid=Decimal('354.00'), cashier=self.cashier,
+        )
+        self.item = SaleItem.objects.create(
+            sale=self.sale, product=self.product, quantity=3, unit_price=Decimal('100.00'), total=Decimal('300.00'),
+        )
+        Sale.objects.filter(pk=self.sale.pk).update(created_at=timezone.now() - timedelta(days=1))
+        rebuild_sales_rollups()
+
+    def assertRollupMatchesRebuild(self):
+        rollup = DailySalesRollup.objects.values('revenue', 'tax', 'sales_count', 'items_sold').get()
+        rebuild_sales_rollups()
+        self.assertEqual(rollup, DailySalesRollup.objects.values('revenue', 'tax', 'sales_count', 'items_sold').get())
+        return rollup
+
+    def refund(self, **body):
+        return self.client.post(f'/api/sales/sales/{self.sale.pk}/refund/', body, format='json')
+
+    def test_partial_then_full_refund(self):
+        response = self.refund(items=[{'item': self.item.pk, 'quantity': 1}], reason='Wrong strength')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['refund_amount'], Decimal('100.00'))
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['total'], '254.00')
+        self.assertEqual(response.data['items'][0]['refunded_quantity'], 1)
+        self.assertEqual(self.assertRollupMatchesRebuild()['items_sold'], 2)
+
+        response = self.refund()
+        self.assertEqual(response.data['status'], 'refunded')
+        self.assertEqual(response.data['refunded_amount'], '354.00')
+        self.assertEqual(self.assertRollupMatchesRebuild()['sales_count'], 0)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 53)
+        movements = StockMovement.objects.filter(movement_type='return', reference_number='INV-R1')
+        self.assertEqual(sorted(movements.values_list('quantity', flat=True)), [1, 2])
+        self.assertEqual(self.refund().status_code, 400)
+
+    def test_top_products_leave_out_refunds(self):
+        self.refund(items=[{'item': self.item.pk, 'quantity': 1}])
+        [row] = top_products_data(10)
+        self.assertEqual((row['total_quantity'], row['total_revenue']), (2, Decimal('200.00')))
+
+        self.refund()
+        self.assertEqual(top_products_data(10), [])
+
+    def test_unknown_sale_is_404(self):
+        for pk in ('abc', '999999'):
+            with self.subTest(pk=pk):
+                self.assertEqual(self.client.post(f'/api/sales/sales/{pk}/refund/').status_code, 404)
+                self.assertEqual(self.client.post(f'/api/sales/sales/{pk}/void/').status_code, 404)
+
+    def test_refund_more_than_sold(self):
+        response = self.refund(items=[{'item': self.item.pk, 'quantity': 4}])
+        self.assertEqual(response.status_code, 400)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.refunded_quantity, 0)
+
+    def test_void(self):
+        response = self.client.post(f'/api/sales/sales/{self.sale.pk}/void/')
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(response.data['total'], '354.00')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 53)
+        self.assertEqual(self.assertRollupMatchesRebuild()['revenue'], Decimal('0.00'))
+
+    def test_permissions_and_status_updates(self):
+        self.client.force_authenticate(self.cashier)
+        self.assertEqual(self.refund().status_code, 403)
+        response = self.client.patch(f'/api/sales/sales/{self.sale.pk}/', {'status': 'cancelled'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_archived_sale_cannot_be_refunded(self):
+        Sale.objects.filter(pk=self.sale.pk).update(created_at=timezone.now() - timedelta(days=200))
+        archive(months=3)
+        self.assertEqual(self.refund().status_code, 400)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import CustomerViewSet, SaleViewSet
 
 router = DefaultRouter()
@@ -9,3 +11,7 @@ router.register(r'sales', SaleViewSet)
 urlpatterns = [
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Ahead of the router's sync action.
+    urlpatterns.insert(0, path('sales/statistics/', async_views.statistics, name='sale-statistics'))
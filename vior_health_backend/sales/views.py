@@ -2,13 +2,93 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
 from django.db.models import Sum, Count
-from django.db import transaction
+from django.db import transaction, IntegrityError
+from collections import Counter
 from decimal import Decimal
-from datetime import datetime
-from .models import Customer, Sale, SaleItem
+from datetime import datetime, timedelta
+import time
+from .models import ArchivedSale, Customer, Sale, SaleItem
 from inventory.models import Product
-from .serializers import CustomerSerializer, SaleSerializer, CreateSaleSerializer
+from .serializers import (
+    CustomerSerializer, SaleSerializer, CreateSaleSerializer, RefundSerializer,
+    SyncSaleSerializer, SyncSalesSerializer, PrintReceiptsSerializer
+)
+from . import escpos
+from .checkout import build_sale, invoice_numbers, sale_line, sync_sales
+from .idempotency import idempotency_key, idempotent
+from .refunds import RefundError, refund_sale, void_sale
+from accounts.policies import PolicyPermission
+from vior_health_backend.archive import IncludeArchivedMixin
+from vior_health_backend.routers import report_grade
+from vior_health_backend.metrics import CHECKOUT_DURATION, CHECKOUT_FAILURES
+
+
+def checkout_failure_reason(exc):
+    """Classify a checkout exception for the checkout_failures_total metric."""
+    if isinstance(exc, IntegrityError) and 'invoice_number' in str(exc):
+        return 'invoice_collision'
+    return 'error'
+
+
+def receipt_queryset():
+    """Sales with everything a printed receipt needs, in three queries."""
+    return Sale.objects.select_related('customer', 'cashier').prefetch_related('items__product')
+
+
+PAYMENT_METHODS = ['cash', 'card', 'mobile']
+
+
+def statistics_queries(days):
+    """The independent queries behind ``SaleViewSet.statistics``, by name."""
+    today = datetime.now().date()
+    # Completed sales of the last ``days`` days (default 30)
+    start_date = today - timedelta(days=days)
+    sales = Sale.objects.filter(
+        status='completed', 
+        created_at__date__gte=start_date,
+        created_at__date__lte=today
+    )
+    return {
+        'totals': lambda: sales.aggregate(total_revenue=Sum('total'), total_sales=Count('id')),
+        # Count unique customers
+        'customers': lambda: sales.values('customer').distinct().count(),
+        # Payment methods breakdown, one grouped query
+        'payment_methods': lambda: list(
+            sales.filter(payment_method__in=PAYMENT_METHODS).order_by()
+            .values('payment_method').annotate(total=Sum('total'), count=Count('id'))
+        ),
+    }
+
+
+def statistics_payload(results):
+    total_revenue = results['totals']['total_revenue'] or 0
+    total_sales = results['totals']['total_sales'] or 0
+    
+    # Calculate average sale value
+    average_sale_value = total_revenue / total_sales if total_sales > 0 else 0
+
+    payment_methods = {method: {'total': 0, 'count': 0} for method in PAYMENT_METHODS}
+    for row in results['payment_methods']:
+        payment_methods[row['payment_method']] = {'total': row['total'] or 0, 'count': row['count']}
+    
+    return {
+        'total_revenue': float(total_revenue),
+        'total_sales': total_sales,
+        'average_sale_value': float(average_sale_value),
+        'total_customers': results['customers'],
+        'payment_methods': payment_methods
+    }
+
+
+def escpos_response(data, filename):
+    response = HttpResponse(data, content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 
 class CustomerViewSet(viewsets.ModelViewSet):
@@ -28,13 +108,17 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(IncludeArchivedMixin, viewsets.ModelViewSet):
     queryset = Sale.objects.select_related('customer', 'cashier').prefetch_related('items').all()
+    archive_queryset = ArchivedSale.objects.select_related('customer', 'cashier').prefetch_related('items__product')
     serializer_class = SaleSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, PolicyPermission]
+    policy_actions = {
+        'void': ('sales', 'refund', 'Only pharmacists, managers, or admins can void or refund sales'),
+        'refund': ('sales', 'refund', 'Only pharmacists, managers, or admins can void or refund sales'),
+    }
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
+    def filter_rows(self, queryset):
         status_filter = self.request.query_params.get('status', None)
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
@@ -51,6 +135,7 @@ class SaleViewSet(viewsets.ModelViewSet):
         return queryset.order_by('-created_at')
 
     @action(detail=False, methods=['post'])
+    @idempotent
     def create_sale(self, request):
         serializer = CreateSaleSerializer(data=request.data)
         
@@ -58,104 +143,186 @@ class SaleViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
+        key = idempotency_key(request)
+        if key:
+            # The stored response may have been purged; the sale itself keeps the key.
+            existing = Sale.objects.filter(idempotency_key=key, cashier=request.user).first()
+            if existing:
+                return Response(SaleSerializer(existing).data, status=status.HTTP_201_CREATED)
+        started = time.perf_counter()
         
         try:
             with transaction.atomic():
-                # Calculate totals
-                subtotal = Decimal('0.00')
-                sale_items_data = []
-                
+                lines = []
                 for item_data in data['items']:
                     product = Product.objects.select_for_update().get(id=item_data['product'])
-                    quantity = item_data['quantity']
+                    line = sale_line(product, item_data)
                     
                     # Check stock
-                    if product.quantity < quantity:
+                    if product.quantity < line.quantity:
+                        CHECKOUT_FAILURES.inc(endpoint='create_sale', reason='insufficient_stock')
                         return Response(
                             {'error': f'Insufficient stock for {product.name}'},
                             status=status.HTTP_400_BAD_REQUEST
                         )
-                    
-                    unit_price = item_data.get('unit_price', product.unit_price)
-                    discount = Decimal(item_data.get('discount', 0))
-                    item_total = (unit_price * quantity) - discount
-                    subtotal += item_total
-                    
-                    sale_items_data.append({
-                        'product': product,
-                        'quantity': quantity,
-                        'unit_price': unit_price,
-                        'discount': discount,
-                        'total': item_total
-                    })
-                
-                # Create sale
-                tax = data.get('tax', Decimal('0.00'))
-                discount = data.get('discount', Decimal('0.00'))
-                total = subtotal + tax - discount
-                amount_paid = data['amount_paid']
-                change_amount = amount_paid - total if amount_paid >= total else Decimal('0.00')
-                
-                # Generate invoice number
-                today = datetime.now()
-                invoice_prefix = f"INV{today.strftime('%Y%m%d')}"
-                last_sale = Sale.objects.filter(
-                    invoice_number__startswith=invoice_prefix
-                ).order_by('-invoice_number').first()
+                    lines.append(line)
                 
-                if last_sale:
-                    last_number = int(last_sale.invoice_number[-4:])
-                    invoice_number = f"{invoice_prefix}{str(last_number + 1).zfill(4)}"
-                else:
-                    invoice_number = f"{invoice_prefix}0001"
-                
-                sale = Sale.objects.create(
-                    invoice_number=invoice_number,
-                    customer_id=data.get('customer'),
-                    subtotal=subtotal,
-                    tax=tax,
-                    discount=discount,
-                    total=total,
-                    payment_method=data['payment_method'],
-                    amount_paid=amount_paid,
-                    change_amount=change_amount,
-                    status='completed',
-                    notes=data.get('notes', ''),
-                    cashier=request.user
-                )
+                sale = build_sale(lines, data, request.user, invoice_numbers()[0], idempotency_key=key)
+                sale.save()
                 
                 # Create sale items and update stock
-                for item_data in sale_items_data:
-                    SaleItem.objects.create(
-                        sale=sale,
-                        product=item_data['product'],
-                        quantity=item_data['quantity'],
-                        unit_price=item_data['unit_price'],
-                        discount=item_data['discount'],
-                        total=item_data['total']
-                    )
+                for line in lines:
+                    line.sale = sale
+                    line.save()
                     
-                    # Update product stock
-                    product = item_data['product']
-                    product.quantity -= item_data['quantity']
+                    product = line.product
+                    product.quantity -= line.quantity
                     product.save()
-                
-                return Response(
-                    SaleSerializer(sale).data,
-                    status=status.HTTP_201_CREATED
-                )
+            
+            CHECKOUT_DURATION.observe(time.perf_counter() - started, endpoint='create_sale')
+            return Response(
+                SaleSerializer(sale).data,
+                status=status.HTTP_201_CREATED
+            )
         
         except Product.DoesNotExist:
+            CHECKOUT_FAILURES.inc(endpoint='create_sale', reason='product_not_found')
             return Response(
                 {'error': 'Product not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         except Exception as e:
+            CHECKOUT_FAILURES.inc(endpoint='create_sale', reason=checkout_failure_reason(e))
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False, methods=['post'])
+    def sync(self, request):
+        """Apply a batch of sales a till recorded while offline (see sales.checkout)."""
+        serializer = SyncSalesSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        started = time.perf_counter()
+        results, valid = {}, []
+        for index, sale_data in enumerate(serializer.validated_data['sales']):
+            sale = SyncSaleSerializer(data=sale_data)
+            if sale.is_valid():
+                valid.append(sale.validated_data)
+            else:
+                client_id = str(sale_data.get('client_id') or f'#{index}')
+                results[client_id] = {'status': 'rejected', 'errors': sale.errors}
+
+        stock_policy = serializer.validated_data.get('stock_policy', settings.OFFLINE_STOCK_POLICY)
+        if valid:
+            results.update(sync_sales(valid, request.user, stock_policy))
+        CHECKOUT_DURATION.observe(time.perf_counter() - started, endpoint='sync')
+
+        counts = Counter(result['status'] for result in results.values())
+        return Response({
+            'results': results,
+            'created': counts['created'],
+            'duplicates': counts['duplicate'],
+            'rejected': counts['rejected'],
+        })
+
+    def _refundable_sale(self, request, pk):
+        """The sale to void/refund, or an error Response."""
+        # A non-numeric id would make the lookups raise ValueError (a 500).
+        if not str(pk).isdigit():
+            return Response({'error': 'Sale not found'}, status=status.HTTP_404_NOT_FOUND)
+        sale = Sale.objects.filter(pk=pk).first()
+        if sale is None:
+            if ArchivedSale.objects.filter(pk=pk).exists():
+                return Response(
+                    {'error': 'Archived sales cannot be voided or refunded'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response({'error': 'Sale not found'}, status=status.HTTP_404_NOT_FOUND)
+        return sale
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def void(self, request, pk=None):
+        """Cancel a completed sale and put its stock back."""
+        sale = self._refundable_sale(request, pk)
+        if isinstance(sale, Response):
+            return sale
+        try:
+            sale = void_sale(sale, request.user, request.data.get('reason', ''))
+        except RefundError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(SaleSerializer(sale).data)
+
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def refund(self, request, pk=None):
+        """Refund some lines (``items: [{item, quantity}]``) or, without items, the whole sale."""
+        sale = self._refundable_sale(request, pk)
+        if isinstance(sale, Response):
+            return sale
+        serializer = RefundSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = Counter()
+        for line in serializer.validated_data.get('items', []):
+            lines[line['item']] += line['quantity']
+        try:
+            sale, amount = refund_sale(sale, request.user, lines, serializer.validated_data['reason'])
+        except RefundError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**SaleSerializer(sale).data, 'refund_amount': amount})
+
+    @action(detail=True, methods=['get'])
+    def escpos(self, request, pk=None):
+        """Raw ESC/POS bytes for one receipt."""
+        sale = get_object_or_404(receipt_queryset(), pk=pk)
+        data = escpos.render_receipt(sale, width=settings.RECEIPT_WIDTH)
+        return escpos_response(data, f'{sale.invoice_number}.bin')
+
+    @action(detail=False, methods=['get'])
+    def escpos_batch(self, request):
+        """All receipts of one day (?date=YYYY-MM-DD, default today) as one stream."""
+        date = request.query_params.get('date')
+        day = parse_date(date) if date else datetime.now().date()
+        if day is None:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        sales = receipt_queryset().filter(created_at__date=day, status='completed').order_by('created_at')
+        data = escpos.render_receipts(sales, width=settings.RECEIPT_WIDTH)
+        return escpos_response(data, f'receipts-{day.isoformat()}.bin')
+
+    @action(detail=False, methods=['post'])
+    def print_receipts(self, request):
+        """
+        Send receipts to the RECEIPT_PRINTER. Body: ``{"sales": [ids]}`` or
+        ``{"date": "YYYY-MM-DD"}`` to reprint a day's completed sales.
+        """
+        printer = escpos.get_printer()
+        if printer is None:
+            return Response({'error': 'No receipt printer configured'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PrintReceiptsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        sales = receipt_queryset().order_by('created_at')
+        if data.get('sales'):
+            sales = sales.filter(pk__in=data['sales'])
+        else:
+            sales = sales.filter(created_at__date=data['date'], status='completed')
+
+        sales = list(sales)
+        try:
+            printer.send(escpos.render_receipts(sales, width=settings.RECEIPT_WIDTH))
+        except OSError as e:
+            return Response({'error': f'Printer unavailable: {e}'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'printed': len(sales)})
+
     @action(detail=False, methods=['get'])
     def today_sales(self, request):
         today = datetime.now().date()
@@ -173,52 +340,8 @@ class SaleViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=False, methods=['get'])
+    @report_grade
     def statistics(self, request):
-        from datetime import timedelta
-        today = datetime.now().date()
-        
-        # Calculate date range based on days parameter (default 30)
         days = int(request.query_params.get('days', 30))
-        start_date = today - timedelta(days=days)
-        
-        # Filter completed sales within date range
-        sales = self.queryset.filter(
-            status='completed', 
-            created_at__date__gte=start_date,
-            created_at__date__lte=today
-        )
-        
-        # Calculate statistics
-        stats = sales.aggregate(
-            total_revenue=Sum('total'),
-            total_sales=Count('id')
-        )
-        
-        total_revenue = stats['total_revenue'] or 0
-        total_sales = stats['total_sales'] or 0
-        
-        # Calculate average sale value
-        average_sale_value = total_revenue / total_sales if total_sales > 0 else 0
-        
-        # Count unique customers
-        total_customers = sales.values('customer').distinct().count()
-        
-        # Payment methods breakdown
-        payment_methods = {}
-        for method in ['cash', 'card', 'mobile']:
-            method_sales = sales.filter(payment_method=method).aggregate(
-                total=Sum('total'),
-                count=Count('id')
-            )
-            payment_methods[method] = {
-                'total': method_sales['total'] or 0,
-                'count': method_sales['count'] or 0
-            }
-        
-        return Response({
-            'total_revenue': float(total_revenue),
-            'total_sales': total_sales,
-            'average_sale_value': float(average_sale_value),
-            'total_customers': total_customers,
-            'payment_methods': payment_methods
-        })
+        results = {name: query() for name, query in statistics_queries(days).items()}
+        return Response(statistics_payload(results))
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import DocumentSequence
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ['series', 'period', 'value']
+    list_filter = ['series']
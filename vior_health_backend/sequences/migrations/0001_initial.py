@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=20)),
+                ('period', models.CharField(blank=True, help_text='e.g. 20250131 for daily numbering', max_length=20)),
+                ('value', models.PositiveBigIntegerField(default=0, help_text='Last number allocated')),
+            ],
+            options={
+                'db_table': 'document_sequences',
+                'ordering': ['series', '-period'],
+                'constraints': [models.UniqueConstraint(fields=('series', 'period'), name='unique_document_sequence')],
+            },
+        ),
+    ]
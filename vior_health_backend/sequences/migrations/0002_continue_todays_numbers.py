@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def continue_todays_numbers(apps, schema_editor):
+    """Start today's INV/RX counters after the numbers already issued today."""
+    DocumentSequence = apps.get_model('sequences', 'DocumentSequence')
+    period = timezone.localdate().strftime('%Y%m%d')
+    for series, model, field in [
+        ('INV', apps.get_model('sales', 'Sale'), 'invoice_number'),
+        ('RX', apps.get_model('prescriptions', 'Prescription'), 'prescription_number'),
+    ]:
+        last = model.objects.filter(**{f'{field}__startswith': f'{series}{period}'}).order_by(
+            f'-{field}'
+        ).values_list(field, flat=True).first()
+        if last and last[-4:].isdigit():
+            DocumentSequence.objects.update_or_create(
+                series=series, period=period, defaults={'value': int(last[-4:])},
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sequences', '0001_initial'),
+        ('sales', '0005_refunds'),
+        ('prescriptions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(continue_todays_numbers, migrations.RunPython.noop),
+    ]
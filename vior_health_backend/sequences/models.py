@@ -0,0 +1,21 @@
+from django.db import models
+
+
+class DocumentSequence(models.Model):
+    """
+    Last number handed out in a document series (``LAB``, ``INV``, ``RX``)
+    for one period, usually a day. See ``sequences.numbering``.
+    """
+    series = models.CharField(max_length=20)
+    period = models.CharField(max_length=20, blank=True, help_text="e.g. 20250131 for daily numbering")
+    value = models.PositiveBigIntegerField(default=0, help_text="Last number allocated")
+
+    class Meta:
+        db_table = 'document_sequences'
+        ordering = ['series', '-period']
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'period'], name='unique_document_sequence'),
+        ]
+
+    def __str__(self):
+        return f"{self.series} {self.period}: {self.value}"
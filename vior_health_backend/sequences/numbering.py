@@ -0,0 +1,55 @@
+"""
+Document numbers (lab tests, invoices, prescriptions) from per-day counters.
+
+``allocate`` reserves numbers with one statement::
+
+    INSERT ... ON CONFLICT (series, period) DO UPDATE SET value = value + n RETURNING value
+
+The database serializes concurrent callers on the counter row, so two
+requests in the same second get different numbers without reading the
+highest existing number first. Inside a transaction the row stays locked
+until commit, and a rollback gives the numbers back. Outside one, a number
+is used up even if the document is never saved. Needs PostgreSQL or SQLite
+3.35+ (for ``RETURNING``).
+"""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .models import DocumentSequence
+
+# Series name: format of its numbers, filled with the day and the counter
+SERIES = {
+    'LAB': 'LAB-{period}{number:04d}',
+    'INV': 'INV{period}{number:04d}',
+    'RX': 'RX{period}{number:04d}',
+}
+
+
+def allocate(series, period='', count=1, using=DEFAULT_DB_ALIAS):
+    """Reserve ``count`` consecutive numbers of ``series`` in ``period``; returns the last one."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    table = quote(DocumentSequence._meta.db_table)
+    series_column, period_column, value_column = (
+        quote(DocumentSequence._meta.get_field(name).column) for name in ('series', 'period', 'value')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({series_column}, {period_column}, {value_column}) VALUES (%s, %s, %s) '
+            f'ON CONFLICT ({series_column}, {period_column}) '
+            f'DO UPDATE SET {value_column} = {table}.{value_column} + excluded.{value_column} '
+            f'RETURNING {value_column}',
+            [series, period, count],
+        )
+        return cursor.fetchone()[0]
+
+
+def document_numbers(series, count=1, using=DEFAULT_DB_ALIAS):
+    """The next ``count`` numbers of ``series`` for today, e.g. ``INV202501310001``."""
+    period = timezone.localdate().strftime('%Y%m%d')
+    last = allocate(series, period, count, using)
+    return [SERIES[series].format(period=period, number=number) for number in range(last - count + 1, last + 1)]
+
+
+def document_number(series, using=DEFAULT_DB_ALIAS):
+    return document_numbers(series, using=using)[0]
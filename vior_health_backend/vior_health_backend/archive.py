@@ -0,0 +1,108 @@
+"""
+Cold storage for old rows.
+
+``move_rows`` copies rows into an archive table with the same columns (plus
+``archived_at``) and deletes them from the hot table, in the caller's
+transaction. ``IncludeArchivedMixin`` lets a viewset serve archived rows as
+well when the request has ``?include_archived=true``: lists return hot rows
+first, then archived ones, through one paginated ``ChainedQuerySet``.
+"""
+from itertools import chain
+
+from django.db import connection
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+
+def move_rows(source, target, column, values):
+    """Move rows of ``source`` whose ``column`` is in ``values`` into ``target``. Returns the row count."""
+    if not values:
+        return 0
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in source._meta.concrete_fields)
+    placeholders = ', '.join(['%s'] * len(values))
+    where = f'WHERE {quote(column)} IN ({placeholders})'
+    archived_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(target._meta.db_table)} ({columns}, {quote("archived_at")}) '
+            f'SELECT {columns}, %s FROM {quote(source._meta.db_table)} {where}',
+            [archived_at, *values],
+        )
+        cursor.execute(f'DELETE FROM {quote(source._meta.db_table)} {where}', list(values))
+        return cursor.rowcount
+
+
+class ChainedQuerySet:
+    """
+    Read-only concatenation of querysets, enough for Django's Paginator:
+    ``count()``, slicing and iteration. Each slice queries only the parts it covers.
+    """
+    ordered = True
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return chain.from_iterable(self.querysets)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return list(self[index:index + 1])[0]
+        start, stop = index.start or 0, index.stop
+        rows = []
+        offset = 0
+        for queryset, count in zip(self.querysets, self.counts()):
+            if stop is not None and stop <= offset:
+                break
+            low = max(start - offset, 0)
+            high = count if stop is None else min(stop - offset, count)
+            if low < high:
+                rows.extend(queryset[low:high])
+            offset += count
+        return rows
+
+
+def include_archived(request):
+    return request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+class IncludeArchivedMixin:
+    """
+    For viewsets over a model with an archive table. Subclasses set
+    ``archive_queryset`` and put their query-parameter filtering in
+    ``filter_rows`` so it applies to both tables.
+    """
+    archive_queryset = None
+
+    def filter_rows(self, queryset):
+        return queryset
+
+    def get_queryset(self):
+        queryset = self.filter_rows(super().get_queryset())
+        if self.action == 'list' and include_archived(self.request):
+            return ChainedQuerySet(queryset, self.filter_rows(self.archive_queryset.all()))
+        return queryset
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            if self.action != 'retrieve' or not include_archived(self.request):
+                raise
+        obj = get_object_or_404(self.filter_rows(self.archive_queryset.all()), pk=self.kwargs['pk'])
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,97 @@
+"""
+Helpers for the async (ASGI) versions of the read-heavy endpoints.
+
+Django's async ORM methods (``acount()``, ``aaggregate()``...) all hop onto
+the request's single thread-sensitive thread, so gathering them still runs
+the queries one after another. ``gather_queries`` instead runs each
+independent query function on a small dedicated pool
+(``ASYNC_QUERY_THREADS``) where every thread has its own database
+connection, so a dashboard's aggregates overlap. With
+``ASYNC_PARALLEL_QUERIES=False`` (tests, or SQLite setups that would rather
+not open extra connections) they run in turn on the thread-sensitive thread.
+
+``async_api_view`` gives a coroutine view what ``@api_view`` +
+``IsAuthenticated`` give the sync ones: DRF authentication, a ``Request``
+with ``query_params``, and JSON rendering with DRF's encoder. The view
+returns plain data or an ``HttpResponse``.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial, wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import profiling
+
+_executor = None
+
+
+def _query_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_QUERY_THREADS, thread_name_prefix='async-query',
+        )
+    return _executor
+
+
+def _in_worker(func, args, kwargs):
+    # Pool threads live across requests: drop connections past CONN_MAX_AGE
+    # or broken, like the request_started/finished signals do for sync views.
+    close_old_connections()
+    try:
+        profile = profiling.current_profile()
+        with profiling.track_queries(profile) if profile is not None else ExitStack():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run blocking ``func`` (ORM, cache) off the event loop."""
+    if settings.ASYNC_PARALLEL_QUERIES:
+        return await sync_to_async(
+            partial(_in_worker, func, args, kwargs), thread_sensitive=False, executor=_query_executor(),
+        )()
+    return await sync_to_async(func)(*args, **kwargs)
+
+
+async def gather_queries(**queries):
+    """Run independent query functions concurrently. Returns ``{name: result}``."""
+    results = await asyncio.gather(*(run_sync(query) for query in queries.values()))
+    return dict(zip(queries, results))
+
+
+def _authenticate(request):
+    return request.user
+
+
+def async_api_view(view_func):
+    """Authenticated GET endpoint written as a coroutine."""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        request = Request(request, authenticators=[
+            authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ])
+        try:
+            user = await run_sync(_authenticate, request)
+        except APIException as e:
+            return JsonResponse({'detail': e.detail}, status=e.status_code, encoder=JSONEncoder)
+        if not (user and user.is_authenticated):
+            return JsonResponse({'detail': NotAuthenticated.default_detail}, status=401, encoder=JSONEncoder)
+
+        result = await view_func(request, *args, **kwargs)
+        if isinstance(result, HttpResponse):
+            return result
+        return JsonResponse(result, encoder=JSONEncoder, safe=False)
+    return wrapper
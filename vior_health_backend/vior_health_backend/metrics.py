@@ -0,0 +1,284 @@
+"""
+In-process Prometheus-style metrics.
+
+Counters and histograms live in plain dictionaries guarded by a lock, so
+recording a sample costs a dict update. Under a multi-worker server set
+``METRICS_MULTIPROC_DIR``: every worker then writes its samples to
+``<dir>/metrics_<pid>.json`` (at most once per ``METRICS_FLUSH_SECONDS``)
+and the worker answering the scrape merges all files.
+
+Gauges that describe database state (queue depths, low stock) are not
+tracked in-process; they are computed by collector callbacks at scrape time.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_registry = {}
+_collectors = []
+_last_flush = 0.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+        with _lock:
+            _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        _maybe_flush()
+
+    @staticmethod
+    def merge(into, samples):
+        for key, value in samples.items():
+            into[key] = into.get(key, 0) + value
+
+    def render(self, samples):
+        for key, value in sorted(samples.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                # [per-bucket counts..., +Inf count, sum]
+                sample = self.samples[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            sample[index] += 1
+            sample[-1] += value
+        _maybe_flush()
+
+    @staticmethod
+    def merge(into, samples):
+        for key, value in samples.items():
+            if key in into:
+                into[key] = [a + b for a, b in zip(into[key], value)]
+            else:
+                into[key] = list(value)
+
+    def render(self, samples):
+        for key, sample in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), sample[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', bound)])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {sample[-1]}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+def register_collector(func):
+    """Register ``func() -> [(name, type, help, [(labels_dict, value), ...])]``."""
+    _collectors.append(func)
+    return func
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: {json.dumps(key): value for key, value in metric.samples.items()}
+            for name, metric in _registry.items()
+        }
+
+
+def flush():
+    """Write this process's samples to the shared directory."""
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'metrics_{os.getpid()}.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(_snapshot(), fh)
+    os.replace(tmp_path, path)
+
+
+def _maybe_flush():
+    global _last_flush
+    if not _multiproc_dir():
+        return
+    now = time.monotonic()
+    if now - _last_flush < getattr(settings, 'METRICS_FLUSH_SECONDS', 1):
+        return
+    _last_flush = now
+    flush()
+
+
+def _merged_samples():
+    own = _snapshot()
+    directory = _multiproc_dir()
+    if not directory or not os.path.isdir(directory):
+        snapshots = [own]
+    else:
+        own_file = f'metrics_{os.getpid()}.json'
+        snapshots = [own]
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == own_file:
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+
+    merged = {name: {} for name in _registry}
+    for snapshot in snapshots:
+        for name, samples in snapshot.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            metric.merge(merged[name], {tuple(json.loads(k)): v for k, v in samples.items()})
+    return merged
+
+
+def render_latest():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    merged = _merged_samples()
+    for name, metric in sorted(_registry.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.render(merged[name]))
+
+    for collector in _collectors:
+        for name, kind, documentation, samples in collector(merged):
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                labelnames = tuple(labels)
+                lines.append(f'{name}{_format_labels(labelnames, tuple(labels.values()))} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+# Request metrics (recorded by RequestProfilingMiddleware)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ['route', 'method'],
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by route and status code.', ['route', 'method', 'status'],
+)
+DB_QUERIES = Counter(
+    'db_queries_total', 'SQL queries executed while serving a route.', ['route'],
+)
+
+# Checkout metrics (sales.create_sale and prescriptions.dispense)
+CHECKOUT_DURATION = Histogram(
+    'checkout_duration_seconds', 'Time to complete a checkout.', ['endpoint'],
+)
+CHECKOUT_FAILURES = Counter(
+    'checkout_failures_total', 'Failed checkouts by reason.', ['endpoint', 'reason'],
+)
+
+# Cache effectiveness
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache name and result (hit/miss).', ['cache', 'result'],
+)
+
+# Background jobs (jobs.queue)
+JOB_DURATION = Histogram(
+    'job_duration_seconds', 'Time spent running a background job.', ['task'],
+)
+JOBS = Counter(
+    'jobs_total', 'Finished job attempts by task and outcome (succeeded/retried/failed).', ['task', 'status'],
+)
+
+
+def record_request(route, method, status, duration, queries):
+    REQUEST_LATENCY.observe(duration, route=route, method=method)
+    REQUESTS.inc(route=route, method=method, status=status)
+    if queries:
+        DB_QUERIES.inc(queries, route=route)
+
+
+@register_collector
+def _cache_hit_ratio(merged):
+    totals = {}
+    for (cache, result), value in merged.get(CACHE_REQUESTS.name, {}).items():
+        totals.setdefault(cache, {'hit': 0, 'miss': 0})[result] = value
+    samples = [
+        ({'cache': cache}, counts['hit'] / (counts['hit'] + counts['miss']))
+        for cache, counts in sorted(totals.items())
+        if counts['hit'] + counts['miss']
+    ]
+    return [('cache_hit_ratio', 'gauge', 'Cache hits / lookups since start.', samples)]
+
+
+@register_collector
+def _queue_depths(merged):
+    from django.db.models import Count, F
+    from inventory.models import Product
+    from jobs.models import Job
+    from laboratory.models import LabTest
+    from prescriptions.models import Prescription
+
+    pending_prescriptions = Prescription.objects.filter(status='pending').count()
+    lab_counts = dict(
+        LabTest.objects.filter(status__in=['pending', 'in_progress'])
+        .values_list('status').annotate(count=Count('id')).order_by()
+    )
+    low_stock = Product.objects.filter(
+        is_active=True, quantity__lte=F('reorder_level'),
+    ).count()
+    job_counts = dict(
+        Job.objects.filter(status__in=['queued', 'running'])
+        .values_list('status').annotate(count=Count('id')).order_by()
+    )
+
+    return [
+        ('prescriptions_pending', 'gauge', 'Prescriptions waiting to be dispensed.',
+         [({}, pending_prescriptions)]),
+        ('lab_tests_queued', 'gauge', 'Lab tests not yet completed, by status.',
+         [({'status': s}, lab_counts.get(s, 0)) for s in ('pending', 'in_progress')]),
+        ('products_low_stock', 'gauge', 'Active products at or below their reorder level.',
+         [({}, low_stock)]),
+        ('jobs_queued', 'gauge', 'Background jobs waiting or running, by status.',
+         [({'status': s}, job_counts.get(s, 0)) for s in ('queued', 'running')]),
+    ]
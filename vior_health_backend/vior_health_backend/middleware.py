@@ -0,0 +1,181 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import metrics, profiling
+from .routers import pin_to_primary, reset_routing_state
+
+logger = logging.getLogger('vior_health.requests')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_PIN_COOKIE = 'vh_pin_primary'
+
+
+class ReplicaPinningMiddleware:
+    """
+    Keep read-your-writes requests on the primary database.
+
+    Unsafe requests never touch the replica. After a successful write the
+    client gets a short-lived cookie so its follow-up reads (e.g. reloading a
+    report right after a sale) also skip the possibly lagging replica. Clients
+    that do not keep cookies can send ``X-Read-Primary: 1`` instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.route(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        self.route(request)
+        return self.pin(request, await self.get_response(request))
+
+    def route(self, request):
+        reset_routing_state()
+
+        if (
+            request.method not in SAFE_METHODS
+            or request.COOKIES.get(PRIMARY_PIN_COOKIE)
+            or request.headers.get('X-Read-Primary')
+        ):
+            pin_to_primary()
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RequestProfilingMiddleware:
+    """
+    Record SQL count, DB time, serializer time and view time per request.
+
+    The figures are returned in a ``Server-Timing`` header and logged as one
+    JSON line per request on ``vior_health.requests``. Requests over
+    ``REQUEST_QUERY_BUDGET`` queries or ``REQUEST_LATENCY_BUDGET_MS`` are
+    logged as warnings, flagged ``over_budget`` and with their most repeated
+    and slowest SQL in the same line.
+
+    Keep this first in MIDDLEWARE so the total covers the whole stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_PROFILING', True)
+        self.query_budget = getattr(settings, 'REQUEST_QUERY_BUDGET', 50)
+        self.latency_budget_ms = getattr(settings, 'REQUEST_LATENCY_BUDGET_MS', 500)
+        self.capture_limit = getattr(settings, 'REQUEST_PROFILING_CAPTURE_SQL', 200)
+        if self.enabled:
+            profiling.install_serializer_timing()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile(capture_limit=self.capture_limit)
+        with ExitStack() as stack:
+            stack.enter_context(profiling.activate(profile))
+            stack.enter_context(profiling.track_queries(profile))
+            response = self.get_response(request)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+
+        profile = profiling.RequestProfile(capture_limit=self.capture_limit)
+        with ExitStack() as stack:
+            stack.enter_context(profiling.activate(profile))
+            # Set by aprocess_view when the view is sync.
+            request._profile_queries = stack
+            response = await self.get_response(request)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        if profile.view_started is not None:
+            profile.view_time = time.perf_counter() - profile.view_started
+        request.profile = profile
+        response['Server-Timing'] = profile.server_timing()
+        self.log(request, response, profile)
+
+        match = request.resolver_match
+        metrics.record_request(
+            route=match.view_name if match else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            duration=profile.total_time,
+            queries=profile.query_count,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = profiling.current_profile()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        profile = profiling.current_profile()
+        if profile is None:
+            return
+        profile.view_started = time.perf_counter()
+        if not iscoroutinefunction(view_func):
+            # A sync view runs on the request's thread-sensitive thread, with
+            # that thread's connections; async views count theirs in
+            # asyncviews.run_sync.
+            stack = await sync_to_async(profiling.track_queries)(profile)
+            request._profile_queries.push(stack)
+
+    def log(self, request, response, profile):
+        match = request.resolver_match
+        total_ms = profile.total_time * 1000
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': profile.query_count,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'serializer_ms': round(profile.serializer_time * 1000, 2),
+            'view_ms': round(profile.view_time * 1000, 2),
+            'total_ms': round(total_ms, 2),
+        }
+
+        over_budget = (
+            profile.query_count > self.query_budget
+            or total_ms > self.latency_budget_ms
+        )
+        if over_budget:
+            # Still one line, so log shippers keep it as one structured record.
+            record['over_budget'] = True
+            record['repeated_sql'] = profile.repeated_queries()
+            record['slowest_sql'] = profile.slowest_queries()
+            logger.warning(json.dumps(record, default=str))
+        else:
+            logger.info(json.dumps(record))
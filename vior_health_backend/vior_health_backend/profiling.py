@@ -0,0 +1,129 @@
+"""
+Per-request query and timing instrumentation.
+
+``RequestProfile`` collects SQL count/time and serializer time for the request
+currently being handled. It is stored in a context variable so code deep in a
+view can add spans without having the request passed around.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+
+_NUMBERS = re.compile(r"\b\d+\b|'[^']*'")
+
+
+def normalize_sql(sql):
+    """Collapse literals so repeated N+1 queries group under one statement."""
+    return _NUMBERS.sub('?', sql)
+
+
+class RequestProfile:
+    def __init__(self, capture_limit=200):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.view_started = None
+        self.view_time = 0.0
+        self.capture_limit = capture_limit
+        self.queries = []
+        self._serializer_depth = 0
+        # Async views run queries for one request on several threads.
+        self._lock = threading.Lock()
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.query_count += 1
+                self.db_time += duration
+                if len(self.queries) < self.capture_limit:
+                    self.queries.append((sql, duration))
+
+    def repeated_queries(self, limit=5):
+        """Most repeated statements, the usual signature of an N+1."""
+        counts = Counter(normalize_sql(sql) for sql, _ in self.queries)
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in counts.most_common(limit) if count > 1
+        ]
+
+    def slowest_queries(self, limit=5):
+        ranked = sorted(self.queries, key=lambda q: q[1], reverse=True)[:limit]
+        return [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in ranked]
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+
+def current_profile():
+    return _current_profile.get()
+
+
+@contextmanager
+def activate(profile):
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def track_queries(profile):
+    """Count the queries on this thread's connections into ``profile`` until closed."""
+    stack = ExitStack()
+    for connection in connections.all(initialized_only=False):
+        stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+    return stack
+
+
+def _timed_data(original):
+    def data(self):
+        profile = _current_profile.get()
+        if profile is None:
+            return original(self)
+        # Nested serializers (and Serializer.data calling BaseSerializer.data)
+        # are only counted once, at the outermost level.
+        profile._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            profile._serializer_depth -= 1
+            if profile._serializer_depth == 0:
+                profile.serializer_time += time.perf_counter() - start
+    return property(data)
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """Time ``serializer.data`` for every DRF serializer while profiling."""
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = _timed_data(cls.data.fget)
+    _serializer_timing_installed = True
@@ -0,0 +1,95 @@
+"""
+Database routing for report-grade reads.
+
+Views wrapped with ``report_grade`` send their reads to the alias named by
+``REPORT_DB_ALIAS`` (a read replica). Everything else, every write, and any
+read that follows a write in the same request stays on ``default``.
+"""
+import contextvars
+import logging
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+_report_reads = contextvars.ContextVar('report_reads', default=False)
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+
+# Monotonic timestamp until which the replica is considered unreachable.
+_replica_down_until = 0.0
+
+
+def report_grade(view_func):
+    """Mark a view (or viewset action) as a read-only reporting endpoint."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            token = _report_reads.set(True)
+            try:
+                return await view_func(*args, **kwargs)
+            finally:
+                _report_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        token = _report_reads.set(True)
+        try:
+            return view_func(*args, **kwargs)
+        finally:
+            _report_reads.reset(token)
+    return wrapper
+
+
+def pin_to_primary():
+    """Send every remaining read of the current request to the primary."""
+    _pinned_to_primary.set(True)
+
+
+def reset_routing_state():
+    """Clear per-request routing flags (threads are reused across requests)."""
+    _report_reads.set(False)
+    _pinned_to_primary.set(False)
+
+
+def _replica_alias():
+    alias = getattr(settings, 'REPORT_DB_ALIAS', DEFAULT_DB_ALIAS)
+    if alias == DEFAULT_DB_ALIAS or alias not in settings.DATABASES:
+        return DEFAULT_DB_ALIAS
+
+    global _replica_down_until
+    if time.monotonic() < _replica_down_until:
+        return DEFAULT_DB_ALIAS
+    try:
+        connections[alias].ensure_connection()
+    except OperationalError:
+        retry = getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+        _replica_down_until = time.monotonic() + retry
+        logger.warning('Read replica %r unreachable, using primary for %ss', alias, retry)
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+class ReportReadRouter:
+    """Route report-grade reads to the replica, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if _report_reads.get() and not _pinned_to_primary.get():
+            return _replica_alias()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Read-your-writes: once a request writes, it stops using the replica.
+        _pinned_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
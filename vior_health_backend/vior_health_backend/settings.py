@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 from datetime import timedelta
+from decouple import config
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,9 +55,13 @@ INSTALLED_APPS = [
     'analytics',
     'expenses',
     'laboratory',
+    'jobs',
+    'realtime',
+    'sequences',
 ]
 
 MIDDLEWARE = [
+    'vior_health_backend.middleware.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -63,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'vior_health_backend.middleware.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'vior_health_backend.urls'
@@ -88,12 +96,116 @@ WSGI_APPLICATION = 'vior_health_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite stays the default for the desktop build. Set DB_ENGINE=postgresql
+# (see .env.example) for multi-till deployments that outgrow a single writer.
+
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='vior_health'),
+            'USER': config('DB_USER', default='vior_health'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Persistent connections: reuse a connection across requests
+            # instead of paying the connect/auth cost on every API call.
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
+            # Behind a transaction-pooling PgBouncer, server-side cursors
+            # cannot survive between transactions.
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_PGBOUNCER', default=False, cast=bool),
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+                # Abort runaway report queries and stuck row locks instead of
+                # letting them hold a till's checkout hostage.
+                'options': '-c statement_timeout={} -c lock_timeout={}'.format(
+                    config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int),
+                    config('DB_LOCK_TIMEOUT_MS', default=5000, cast=int),
+                ),
+            },
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # WAL lets readers proceed while a checkout is writing;
+                # IMMEDIATE takes the write lock up front so concurrent
+                # checkouts queue on busy_timeout instead of failing.
+                # journal_mode=WAL is stored in the file; the checked-in
+                # db.sqlite3 is already in WAL mode, so connecting leaves it
+                # untouched.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': config('DB_BUSY_TIMEOUT', default=20, cast=int),
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                ),
+            },
+            # A file rather than the in-memory default: with shared-cache
+            # memory databases, tests that write from several threads get
+            # "table is locked" instead of waiting on busy_timeout.
+            'TEST': {'NAME': str(BASE_DIR / 'test_db.sqlite3')},
+        }
+    }
+
+# Optional streaming replica for report-grade reads (analytics, statistics,
+# summaries). Reads fall back to the primary when it is not configured or
+# unreachable; see vior_health_backend/routers.py.
+if DB_ENGINE == 'postgresql' and config('DB_REPLICA_HOST', default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': config('DB_REPLICA_HOST'),
+        'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['vior_health_backend.routers.ReportReadRouter']
+REPORT_DB_ALIAS = config('REPORT_DB_ALIAS', default='replica')
+REPLICA_RETRY_SECONDS = config('REPLICA_RETRY_SECONDS', default=30, cast=int)
+# How long a client's reads stay on the primary after it writes.
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+
+# Cache
+# In-process LRU by default. Each worker process then has its own copy and
+# only sees invalidations from writes it served itself (the TTL bounds the
+# staleness). Multi-worker deployments should share a file or database cache
+# (run `python manage.py createcachetable` for the database backend).
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        }
+    }
+elif CACHE_BACKEND == 'db':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': config('CACHE_LOCATION', default='cache_table'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=1000, cast=int)},
+        }
+    }
+
+# Upper bound on how long a cached dashboard/statistics payload may be served.
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=60, cast=int)
+# Same bound for the cached PharmacySettings row (receipt header, footer, name).
+PHARMACY_SETTINGS_CACHE_TTL = config('PHARMACY_SETTINGS_CACHE_TTL', default=60, cast=int)
 
 
 # Password validation
@@ -147,11 +259,12 @@ AUTH_USER_MODEL = 'accounts.User'
 # CORS Settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -167,4 +280,101 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# Access tokens carry the user's role and flags (accounts/authentication.py).
+# Each process re-checks a user's token version at most this often, so a
+# revoked token may be accepted by another process for up to that long.
+AUTH_CLAIMS_RECHECK_SECONDS = config('AUTH_CLAIMS_RECHECK_SECONDS', default=60, cast=int)
+AUTH_CLAIMS_CACHE_SIZE = config('AUTH_CLAIMS_CACHE_SIZE', default=4096, cast=int)
+
+# Request profiling (Server-Timing headers and per-request log lines)
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=True, cast=bool)
+REQUEST_QUERY_BUDGET = config('REQUEST_QUERY_BUDGET', default=50, cast=int)
+REQUEST_LATENCY_BUDGET_MS = config('REQUEST_LATENCY_BUDGET_MS', default=500, cast=int)
+
+# Prometheus metrics (/api/metrics/). Without a token only localhost may
+# scrape. Point METRICS_MULTIPROC_DIR at a directory shared by all workers
+# (and empty it on deploy) when running more than one server process.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+METRICS_MULTIPROC_DIR = config('METRICS_MULTIPROC_DIR', default='') or None
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=1, cast=int)
+
+# ESC/POS receipt printer: tcp://host:9100, file:///dev/usb/lp0 or a path.
+RECEIPT_PRINTER = config('RECEIPT_PRINTER', default='')
+RECEIPT_WIDTH = config('RECEIPT_WIDTH', default=48, cast=int)
+
+# Background jobs (manage.py run_worker). JOBS_RUN_INLINE runs each job in
+# the enqueuing process after commit, for setups without a worker.
+JOBS_RUN_INLINE = config('JOBS_RUN_INLINE', default=False, cast=bool)
+JOB_WORKER_CONCURRENCY = config('JOB_WORKER_CONCURRENCY', default=2, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=10, cast=int)
+JOB_RETRY_BACKOFF_MAX = config('JOB_RETRY_BACKOFF_MAX', default=3600, cast=int)
+JOB_LEASE_SECONDS = config('JOB_LEASE_SECONDS', default=300, cast=int)
+# How often each worker checks for due periodic tasks (jobs.ScheduledTask)
+JOB_SCHEDULER_INTERVAL = config('JOB_SCHEDULER_INTERVAL', default=30, cast=int)
+
+# Online SQLite backups (manage.py backup / restore, and the backup-database
+# schedule). BACKUP_DIR defaults to a backups/ folder next to the database.
+BACKUP_DIR = config('BACKUP_DIR', default='')
+BACKUP_PAGES_PER_STEP = config('BACKUP_PAGES_PER_STEP', default=1024, cast=int)
+BACKUP_STEP_SLEEP = config('BACKUP_STEP_SLEEP', default=0.0, cast=float)
+BACKUP_KEEP_LAST = config('BACKUP_KEEP_LAST', default=8, cast=int)
+BACKUP_KEEP_DAILY = config('BACKUP_KEEP_DAILY', default=14, cast=int)
+BACKUP_KEEP_WEEKLY = config('BACKUP_KEEP_WEEKLY', default=8, cast=int)
+BACKUP_KEEP_MONTHLY = config('BACKUP_KEEP_MONTHLY', default=12, cast=int)
+
+# manage.py archive_sales: closed sales and stock movements older than this
+# many whole months move to the *_archive tables.
+ARCHIVE_AFTER_MONTHS = config('ARCHIVE_AFTER_MONTHS', default=12, cast=int)
+
+# Stored responses for requests sent with an Idempotency-Key header are kept
+# this long, so a till can safely retry a checkout within that window.
+IDEMPOTENCY_KEY_TTL_DAYS = config('IDEMPOTENCY_KEY_TTL_DAYS', default=7, cast=int)
+
+# POST /api/sales/sales/sync/ (offline tills). OFFLINE_STOCK_POLICY is
+# allow_negative (record the sale, flag it) or reject_line.
+OFFLINE_STOCK_POLICY = config('OFFLINE_STOCK_POLICY', default='allow_negative')
+OFFLINE_SYNC_MAX_BATCH = config('OFFLINE_SYNC_MAX_BATCH', default=500, cast=int)
+
+# Server-Sent Events at /api/events/ (ASGI only). A connection that falls
+# REALTIME_QUEUE_SIZE events behind is told to re-fetch; the last
+# REALTIME_BACKLOG events are replayed to reconnecting browsers.
+REALTIME_QUEUE_SIZE = config('REALTIME_QUEUE_SIZE', default=256, cast=int)
+REALTIME_BACKLOG = config('REALTIME_BACKLOG', default=500, cast=int)
+REALTIME_HEARTBEAT_SECONDS = config('REALTIME_HEARTBEAT_SECONDS', default=20, cast=int)
+REALTIME_RETRY_MS = config('REALTIME_RETRY_MS', default=3000, cast=int)
+
+# Async versions of the analytics and statistics endpoints (ASGI only, see
+# README). Their independent queries run on ASYNC_QUERY_THREADS threads, each
+# with its own database connection; ASYNC_PARALLEL_QUERIES=False runs them in
+# turn instead.
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+ASYNC_PARALLEL_QUERIES = config('ASYNC_PARALLEL_QUERIES', default=True, cast=bool)
+ASYNC_QUERY_THREADS = config('ASYNC_QUERY_THREADS', default=8, cast=int)
+
+# One JSON line per request at INFO, over-budget ones (with their SQL) at
+# WARNING. Test runs only print the warnings.
+TESTING = 'test' in sys.argv[1:2]
+REQUEST_LOG_LEVEL = config('REQUEST_LOG_LEVEL', default='WARNING' if TESTING else 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'vior_health.requests': {
+            'handlers': ['console'],
+            'level': REQUEST_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
 }
@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,6 +29,9 @@ urlpatterns = [
     path('api/analytics/', include('analytics.urls')),
     path('api/expenses/', include('expenses.urls')),
     path('api/laboratory/', include('laboratory.urls')),
+    path('api/jobs/', include('jobs.urls')),
+    path('api/events/', include('realtime.urls')),
+    path('api/metrics/', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,31 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from . import metrics as metrics_registry
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+@require_GET
+def metrics(request):
+    """
+    Prometheus scrape endpoint.
+
+    With ``METRICS_TOKEN`` set, scrapers must send ``Authorization: Bearer
+    <token>``. Without it, only loopback clients may scrape.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden('Invalid metrics token')
+    elif request.META.get('REMOTE_ADDR') not in LOOPBACK_ADDRESSES:
+        return HttpResponseForbidden('Metrics are only served to localhost')
+
+    return HttpResponse(
+        metrics_registry.render_latest(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )